@@ -0,0 +1,122 @@
+import re, time, threading, logging
+from collections import OrderedDict
+from typing import Optional
+log = logging.getLogger("borgo")
+
+_PUNCT_RE = re.compile(r"[^\w\s]+")
+# nur Füllwörter; Fragewörter bleiben im Schlüssel ("wo" und "wann" sind verschiedene Fragen)
+_STOPWORDS = frozenset("""
+    a an and are bei bitte das dem den der die do does du ein eine einen es for gibt hier
+    ich ihr im in is ist it kann man mit of the to um und wir zu
+""".split())
+_QUESTION_WORDS = frozenset("""
+    wo wohin woher wann wie wieviel wieso warum weshalb was welche welcher welches wer
+    where when how what which who why
+""".split())
+
+def normalize_question(text: str) -> str:
+    """'Wann ist der Check-out?' → 'wann checkout' (Kleinschreibung, Satzzeichen und Füllwörter raus, Reihenfolge bleibt)."""
+    t = _PUNCT_RE.sub("", (text or "").lower())
+    return " ".join(w for w in t.split() if w not in _STOPWORDS)
+
+def exact_question(text: str) -> str:
+    """Nur Groß-/Kleinschreibung, Satzzeichen und Leerraum vereinheitlicht (Schlüssel für Single-Flight)."""
+    return " ".join(_PUNCT_RE.sub(" ", (text or "").casefold()).split())
+
+def question_word(key: str) -> str:
+    """Erstes Fragewort eines normalisierten Schlüssels ('' wenn keins)."""
+    return next((w for w in key.split() if w in _QUESTION_WORDS), "")
+
+def _trigrams(key: str) -> frozenset:
+    s = f" {key} "
+    return frozenset(s[i:i + 3] for i in range(len(s) - 2))
+
+class AnswerCache:
+    """
+    Antwort-Cache zwischen FIXED-Lookup und LLM.
+    Schlüssel ist (generation, normalisierte Frage); optional findet eine
+    Ähnlichkeitsstufe (Trigramm-Jaccard ≥ `similarity`, 0 = aus) auch Umformulierungen
+    derselben Generation mit demselben Fragewort. LRU mit TTL und Speicherobergrenze.
+    `generation` ist ein Tupel, dessen erstes Element den Bereich nennt (FIXED-Datei
+    eines Tenants); taucht für einen Bereich eine neue Generation auf (FIXED-Inhalt,
+    Modell), werden nur dessen alte Einträge verworfen – andere Tenants behalten ihre.
+    """
+    def __init__(self, maxsize=256, ttl=6*3600, max_bytes=1_000_000, similarity=0.0):
+        self.maxsize, self.ttl, self.max_bytes, self.similarity = maxsize, ttl, max_bytes, similarity
+        self._data = OrderedDict()   # (generation, key) -> (answer, ts, size, trigrams, fragewort)
+        self._bytes = 0
+        self._current = {}           # Bereich -> aktuelle Generation
+        self._lock = threading.Lock()
+        self.hits = self.similar_hits = self.misses = self.evictions = 0
+
+    def _check_generation(self, generation):
+        scope = generation[0]
+        old = self._current.get(scope)
+        if old == generation:
+            return
+        self._current[scope] = generation
+        if old is None:
+            return
+        stale = [k for k in self._data if k[0] == old]
+        for k in stale:
+            self._drop(k)
+        if stale:
+            log.info(f"[CACHE] invalidiert ({len(stale)} Einträge, {scope})")
+
+    def _drop(self, key):
+        entry = self._data.pop(key)
+        self._bytes -= entry[2]
+
+    def get(self, question: str, generation) -> Optional[str]:
+        norm = normalize_question(question)
+        if not norm:
+            return None
+        key = (generation, norm)
+        now = time.monotonic()
+        with self._lock:
+            self._check_generation(generation)
+            entry = self._data.get(key)
+            if entry is not None and now - entry[1] > self.ttl:
+                self._drop(key)
+                entry = None
+            if entry is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if self.similarity > 0:
+                grams, qword, best, best_key = _trigrams(norm), question_word(norm), self.similarity, None
+                for k, (_, ts, _, g, qw) in self._data.items():
+                    if k[0] != generation or qw != qword or now - ts > self.ttl:
+                        continue
+                    score = len(grams & g) / len(grams | g)
+                    if score >= best:
+                        best, best_key = score, k
+                if best_key is not None:
+                    self._data.move_to_end(best_key)
+                    self.similar_hits += 1
+                    log.debug("[CACHE] ähnlich %r ~ %r (%.2f)", norm, best_key[1], best)
+                    return self._data[best_key][0]
+            self.misses += 1
+            return None
+
+    def put(self, question: str, answer: str, generation):
+        norm = normalize_question(question)
+        if not norm or not answer:
+            return
+        key = (generation, norm)
+        size = len(norm.encode("utf-8")) + len(answer.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._check_generation(generation)
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (answer, time.monotonic(), size, _trigrams(norm), question_word(norm))
+            self._bytes += size
+            while len(self._data) > self.maxsize or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def stats(self):
+        return {"size": len(self._data), "bytes": self._bytes, "hits": self.hits,
+                "similar_hits": self.similar_hits, "misses": self.misses, "evictions": self.evictions}
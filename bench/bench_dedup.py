@@ -0,0 +1,55 @@
+"""
+Benchmark: SQLiteDedupStore – Inserts und Lookups pro Sekunde.
+
+    PYTHONPATH=. python3 bench/bench_dedup.py [--n 1000000] [--db /tmp/dedup-bench.sqlite3]
+"""
+import argparse
+import os
+import random
+import time
+
+from dedup_store import SQLiteDedupStore
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=1_000_000)
+    ap.add_argument("--lookups", type=int, default=200_000)
+    ap.add_argument("--db", default="/tmp/dedup-bench.sqlite3")
+    args = ap.parse_args()
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(args.db + suffix):
+            os.unlink(args.db + suffix)
+    store = SQLiteDedupStore(args.db, ttl=24*3600, maxrows=args.n)
+    ids = [f"+49157{i:08d}:{1700000000000 + i}" for i in range(args.n)]
+
+    t0 = time.perf_counter()
+    for mid in ids:
+        store.add(mid)
+    store.flush()
+    t_ins = time.perf_counter() - t0
+
+    rnd = random.Random(1)
+    old = [ids[rnd.randrange(args.n - 10_000)] for _ in range(args.lookups)]   # nicht mehr im Hot-Cache
+    recent = [ids[-1 - rnd.randrange(1000)] for _ in range(args.lookups)]
+    missing = [f"+49000{i:08d}:0" for i in range(args.lookups)]
+
+    def rate(keys, expect):
+        t = time.perf_counter()
+        for k in keys:
+            assert (k in store) is expect
+        return len(keys) / (time.perf_counter() - t)
+
+    r_old, r_recent, r_miss = rate(old, True), rate(recent, True), rate(missing, False)
+    size = sum(os.path.getsize(args.db + s) for s in ("", "-wal") if os.path.exists(args.db + s))
+    store.close()
+
+    print(f"IDs:                {args.n:,}")
+    print(f"Inserts/s:          {args.n / t_ins:,.0f}")
+    print(f"Lookups/s (Disk):   {r_old:,.0f}")
+    print(f"Lookups/s (Hot):    {r_recent:,.0f}")
+    print(f"Lookups/s (Miss):   {r_miss:,.0f}")
+    print(f"DB-Größe:           {size / 1e6:.1f} MB")
+
+if __name__ == "__main__":
+    main()
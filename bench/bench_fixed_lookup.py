@@ -0,0 +1,54 @@
+"""
+Micro-Benchmark: FIXED-Lookup (naiver Substring-Scan vs. Aho-Corasick)
+bei 50 / 500 / 5.000 Keys.
+
+    PYTHONPATH=. python3 bench/bench_fixed_lookup.py
+"""
+import random
+import string
+import time
+
+from fixed_responses import KeywordAutomaton
+
+MESSAGES = [
+    "wie ist das wlan passwort in der villa?",
+    "wann ist check-out und wo kommt der müll hin",
+    "gibt es eine bäckerei oder einen supermarkt in der nähe",
+    "hallo zusammen, wer kommt heute abend mit zum strand",
+    "der geschirrspüler in casa gabriello piept die ganze zeit",
+]
+
+def make_keys(n, rnd):
+    keys = set()
+    while len(keys) < n:
+        keys.add("".join(rnd.choice(string.ascii_lowercase) for _ in range(rnd.randint(4, 12))))
+    return ["wlan", "müll", "strand", "supermarkt"] + sorted(keys)
+
+def naive(keys, text):
+    for k in keys:
+        if k in text:
+            return k
+    return None
+
+def bench(fn, rounds):
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for m in MESSAGES:
+            fn(m)
+    return (time.perf_counter() - t0) / (rounds * len(MESSAGES)) * 1e6
+
+def main():
+    rnd = random.Random(42)
+    print(f"{'keys':>6} {'build ms':>9} {'naiv µs':>9} {'automat µs':>11}")
+    for n in (50, 500, 5000):
+        keys = make_keys(n, rnd)
+        t0 = time.perf_counter()
+        ac = KeywordAutomaton(keys)
+        build = (time.perf_counter() - t0) * 1e3
+        rounds = max(20, 20000 // n)
+        t_naive = bench(lambda m: naive(keys, m), rounds)
+        t_ac = bench(ac.search, 2000)
+        print(f"{n:>6} {build:>9.1f} {t_naive:>9.2f} {t_ac:>11.2f}")
+
+if __name__ == "__main__":
+    main()
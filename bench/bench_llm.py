@@ -0,0 +1,48 @@
+"""
+Benchmark: Time-to-first-token und Gesamtlatenz – Ollama-HTTP-Client
+(Keep-Alive, Streaming) vs. `ollama run`-Prozess pro Frage, beide gegen
+bench/fake_ollama.py.
+
+    PYTHONPATH=. python3 bench/bench_llm.py [--n 10]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+FAKE = Path(__file__).with_name("fake_ollama.py")
+
+def summary(name, ttft, total):
+    print(f"{name:<8} ttft p50={statistics.median(ttft)*1e3:7.0f} ms   total p50={statistics.median(total)*1e3:7.0f} ms"
+          f"   total max={max(total)*1e3:7.0f} ms")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=10)
+    ap.add_argument("--max-tokens", type=int, default=300)
+    args = ap.parse_args()
+
+    sys.path.insert(0, str(FAKE.parent))
+    from fake_ollama import make_server
+    from config import Config
+    import local_llm_interface as llm
+
+    _, url = make_server()
+    client = llm.OllamaClient(url)
+    ttft, total = [], []
+    for i in range(args.n):
+        g = client.generate(llm.compose_prompt(f"frage {i}"), "fake", max_tokens=args.max_tokens)
+        ttft.append(g.ttft); total.append(g.total)
+    summary("http", ttft, total)
+
+    Config.OLLAMA_BIN = f"{sys.executable} {FAKE}"
+    total = []
+    for i in range(args.n):
+        t = time.perf_counter()
+        llm.generate_ollama_cli(f"frage {i}", "fake", max_tokens=args.max_tokens)
+        total.append(time.perf_counter() - t)
+    summary("cli", total, total)   # ohne Streaming: erstes Token = ganze Antwort
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: Decode-Stufe des Empfangs auf einem gemischten Strom (Quittungen,
+Tipp-Indikatoren, fremde Gruppen, Plaudern, eigene syncMessages, Trigger-Fragen)
+– vollständiges json.loads + extract_text_and_gid für jede Zeile vs. Byte-Vorfilter
+(envelopes.EnvelopeFilter) und Decode nur der durchgelassenen Zeilen. Prüft dabei,
+dass der Vorfilter keine relevante Nachricht verwirft.
+
+    PYTHONPATH=. python3 bench/bench_prefilter.py [--n 20000] [--rounds 5]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).parent
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=20000)
+    ap.add_argument("--rounds", type=int, default=5)
+    args = ap.parse_args()
+
+    sys.path.insert(0, str(HERE))
+    from replay import make_stream, NUMBER, GROUP
+    os.environ.update({"SIGNAL_NUMBER": NUMBER, "SIGNAL_GROUP_ID": GROUP, "LOG_LEVEL": "WARNING",
+                       "LOG_FILE": str(Path(tempfile.mkdtemp()) / "bot.log")})
+    import bot_v2
+    import envelopes
+    from envelopes import EnvelopeFilter
+
+    lines = [l.encode("utf-8") for l in make_stream(args.n)]
+    flt = EnvelopeFilter(GROUP, bot_v2.Config.BOT_TRIGGER)
+
+    def relevant(obj):
+        txt, gid, _ = bot_v2.extract_text_and_gid(obj)
+        return gid == GROUP and bot_v2.trigger_payload(txt) is not None
+
+    def full(loads):
+        n = 0
+        for raw in lines:
+            try:
+                obj = loads(raw)
+            except ValueError:
+                continue
+            n += relevant(obj)
+        return n
+
+    def filtered(loads):
+        n = 0
+        for raw in lines:
+            if not flt(raw):
+                continue
+            try:
+                obj = loads(raw)
+            except ValueError:
+                continue
+            n += relevant(obj)
+        return n
+
+    def bench(name, fn, loads):
+        best, n = float("inf"), 0
+        for _ in range(args.rounds):
+            t = time.perf_counter()
+            n = fn(loads)
+            best = min(best, time.perf_counter() - t)
+        print(f"{name:<22} {best * 1e6 / len(lines):6.2f} µs/Zeile  {len(lines) / best:10.0f} Zeilen/s  relevant={n}")
+        return n
+
+    passed = sum(flt(raw) for raw in lines)
+    print(f"{len(lines)} Zeilen, Vorfilter lässt {passed} durch ({passed / len(lines):.0%})")
+    ref = bench("json.loads (alle)", full, json.loads)
+    got = bench("vorfilter + json", filtered, json.loads)
+    if envelopes.orjson is not None:
+        bench("orjson (alle)", full, envelopes.orjson.loads)
+        bench("vorfilter + orjson", filtered, envelopes.orjson.loads)
+    else:
+        print("orjson nicht installiert – übersprungen")
+    if got != ref:
+        print(f"FEHLER: Vorfilter verwirft relevante Nachrichten ({got} statt {ref})")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: Recall und Latenz der Retrieval-Stufe (retrieval.VectorIndex)
+auf einem gelabelten Fragenset aus FIXED_RESPONSES_TODOs.csv.
+
+Zwei Varianten je Zeile: die Frage wie in der CSV und die Frage ohne das
+führende Stichwort (vor „–“/„:“), damit der Teilstring-Lookup nicht greift.
+
+    PYTHONPATH=. python3 bench/bench_retrieval.py [--fixed FIXED_RESPONSES.txt]
+"""
+import argparse
+import csv
+import re
+import statistics
+import time
+from pathlib import Path
+
+from fixed_responses import FixedResponsesLoader
+from retrieval import VectorIndex, np
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# CSV-Zeile (Nr.) → erwarteter FIXED-Schlüssel
+LABELS = {
+    1: "adresse", 2: "haustiere", 3: "haustech", 4: "haustech", 5: "haustech", 6: "grill",
+    7: "anreise", 8: "abreise", 9: "ruhezeiten", 10: "müll", 11: "müll", 12: "wlan", 13: "wlan",
+    14: "strom", 15: "wasser", 16: "gas", 17: "arzt", 18: "apotheke", 19: "krankenhaus",
+    20: "supermarkt", 21: "bäckerei", 22: "pizzeria", 23: "märkte", 24: "parken", 25: "tankstelle",
+    26: "bus", 27: "strand", 28: "sehenswürdigkeiten", 29: "wandern",
+}
+# Aliase zählen als Treffer ihres Ziels
+ALIASES = {"wifi": "wlan", "einkauf": "einkaufen"}
+
+def load_questions(path):
+    with open(path, encoding="utf-8") as f:
+        rows = list(csv.reader(f))[1:]
+    full, stripped = [], []
+    for row in rows:
+        nr, question = int(row[0]), row[1]
+        label = LABELS.get(nr)
+        if not label:
+            continue
+        full.append((question, label))
+        rest = re.split(r"\s[–:]\s|:\s", question, maxsplit=1)
+        if len(rest) == 2 and rest[1].strip():
+            stripped.append((rest[1], label))
+    return full, stripped
+
+def evaluate(index, questions, k):
+    hit1 = hitk = 0
+    lat = []
+    for q, label in questions:
+        t = time.perf_counter()
+        top = index.search(q, k)
+        lat.append(time.perf_counter() - t)
+        keys = [ALIASES.get(key, key) for key, _ in top]
+        hit1 += bool(keys) and keys[0] == label
+        hitk += label in keys
+    n = len(questions)
+    return hit1 / n, hitk / n, statistics.median(lat) * 1e6, max(lat) * 1e6
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--fixed", default=str(ROOT / "FIXED_RESPONSES.txt"))
+    ap.add_argument("--csv", default=str(ROOT / "FIXED_RESPONSES_TODOs.csv"))
+    ap.add_argument("--k", type=int, default=3)
+    args = ap.parse_args()
+
+    loader = FixedResponsesLoader(args.fixed, snapshot=False)
+    loader.maybe_reload(force=True)
+    entries = loader.entries
+    t = time.perf_counter()
+    index = VectorIndex.build(entries)
+    build = (time.perf_counter() - t) * 1e3
+
+    full, stripped = load_questions(args.csv)
+    print(f"{len(entries)} Einträge, Index in {build:.1f} ms, NumPy={'ja' if np is not None else 'nein'}")
+    print(f"{'Set':<16} {'n':>3} {'recall@1':>9} {f'recall@{args.k}':>9} {'p50 µs':>8} {'max µs':>8}")
+    for name, qs in (("CSV-Frage", full), ("ohne Stichwort", stripped)):
+        r1, rk, p50, mx = evaluate(index, qs, args.k)
+        print(f"{name:<16} {len(qs):>3} {r1:>9.2f} {rk:>9.2f} {p50:>8.0f} {mx:>8.0f}")
+
+if __name__ == "__main__":
+    main()
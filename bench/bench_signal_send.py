@@ -0,0 +1,54 @@
+"""
+Benchmark: Antwort-Latenz Spawn-pro-Send (utils.send_signal_message) vs.
+persistenter JSON-RPC-Verbindung (signal_rpc.SignalRpcClient), beide gegen
+bench/fake_signal_cli.py mit simulierter JVM-Startzeit.
+
+    PYTHONPATH=. python3 bench/bench_signal_send.py [--n 20] [--startup 1.0]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+FAKE = f"{sys.executable} {Path(__file__).with_name('fake_signal_cli.py')}"
+
+def summary(name, lat):
+    lat = sorted(lat)
+    p95 = lat[min(len(lat) - 1, int(len(lat) * 0.95))]
+    print(f"{name:<18} mean={statistics.mean(lat)*1e3:8.1f} ms  p50={statistics.median(lat)*1e3:8.1f} ms  p95={p95*1e3:8.1f} ms")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=20)
+    ap.add_argument("--startup", type=float, default=1.0, help="simulierte JVM-Startzeit (s)")
+    ap.add_argument("--latency", type=float, default=0.05, help="simulierte Sendedauer (s)")
+    args = ap.parse_args()
+    os.environ["FAKE_STARTUP"] = str(args.startup)
+    os.environ["FAKE_SEND_LATENCY"] = str(args.latency)
+
+    from utils import send_signal_message
+    from signal_rpc import SignalRpcClient
+
+    lat = []
+    for i in range(args.n):
+        t = time.perf_counter()
+        assert send_signal_message("+490000", f"spawn {i}", "GROUP", retry=1, cli=FAKE)
+        lat.append(time.perf_counter() - t)
+    summary("spawn-per-send", lat)
+
+    client = SignalRpcClient("+490000", cli=FAKE)
+    t = time.perf_counter()
+    assert client.send_message("warmup", "GROUP", retry=1)
+    print(f"{'rpc (1. Send)':<18} {(time.perf_counter() - t)*1e3:8.1f} ms inkl. Start")
+    lat = []
+    for i in range(args.n):
+        t = time.perf_counter()
+        assert client.send_message(f"rpc {i}", "GROUP", retry=1)
+        lat.append(time.perf_counter() - t)
+    client.close()
+    summary("jsonRpc", lat)
+
+if __name__ == "__main__":
+    main()
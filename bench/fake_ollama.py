@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Lokaler Ersatz für Ollama (Tests/Benchmarks, kein Modell nötig).
+
+    fake_ollama.py serve [--port 11435]     HTTP-API: POST /api/generate (NDJSON-Stream)
+    fake_ollama.py run MODEL < prompt       wie `ollama run`, Antwort auf stdout
+
+Umgebungsvariablen:
+    FAKE_LLM_STARTUP   Prozessstart von `run` in Sekunden (Default 0.3)
+    FAKE_LLM_LOAD      Modell-Ladezeit in Sekunden; der Server lädt nur einmal
+                       (bzw. nach Ablauf von keep_alive), `run` jedes Mal (Default 1.0)
+    FAKE_LLM_TOKEN     Sekunden pro generiertem Token (Default 0.02)
+    FAKE_LLM_TOKENS    Tokens pro Antwort, begrenzt durch num_predict (Default 60)
+    FAKE_LLM_MODELS    Komma-Liste vorhandener Modelle; andere bekommen wie bei Ollama
+                       HTTP 404 {"error": …} (Default leer = alle)
+"""
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STARTUP = float(os.getenv("FAKE_LLM_STARTUP", "0.3"))
+LOAD = float(os.getenv("FAKE_LLM_LOAD", "1.0"))
+TOKEN = float(os.getenv("FAKE_LLM_TOKEN", "0.02"))
+TOKENS = int(os.getenv("FAKE_LLM_TOKENS", "60"))
+MODELS = [m for m in os.getenv("FAKE_LLM_MODELS", "").split(",") if m]
+
+WORDS = ("Das Borgo liegt ruhig in den Hügeln über Lucca. Der Check-out ist bis zehn Uhr. "
+         "Bitte lasst die Häuser so zurück, wie ihr sie vorfinden möchtet. ").split(" ")
+
+def tokens(n):
+    for i in range(n):
+        yield WORDS[i % len(WORDS)] + " "
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    loaded_until = {}
+    lock = threading.Lock()
+    requests = 0   # beantwortete /api/generate-Aufrufe (Benchmarks prüfen damit den LLM-Pfad)
+
+    def log_message(self, *args):
+        pass
+
+    def _chunk(self, obj):
+        data = (json.dumps(obj) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+        model = body.get("model", "")
+        if MODELS and model not in MODELS:
+            data = json.dumps({"error": f"model '{model}' not found, try pulling it first"}).encode("utf-8")
+            self.send_response(404)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        n = min(TOKENS, int((body.get("options") or {}).get("num_predict", TOKENS)))
+        with self.lock:
+            _Handler.requests += 1
+            if self.loaded_until.get(model, 0) < time.monotonic():
+                time.sleep(LOAD)
+            self.loaded_until[model] = time.monotonic() + 300   # keep_alive der Einfachheit halber fest
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        t0 = time.monotonic()
+        for tok in tokens(n):
+            time.sleep(TOKEN)
+            self._chunk({"model": model, "response": tok, "done": False})
+        self._chunk({"model": model, "response": "", "done": True,
+                     "prompt_eval_count": len(body.get("prompt", "")) // 4, "eval_count": n,
+                     "total_duration": int((time.monotonic() - t0) * 1e9)})
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+def make_server(port=0):
+    """Startet den Fake-Server in einem Hintergrund-Thread; liefert (server, url).
+    `server.RequestHandlerClass.requests` zählt die Generierungen."""
+    srv = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_address[1]}"
+
+def cmd_run():
+    prompt = sys.stdin.read()
+    time.sleep(STARTUP + LOAD)
+    out = "".join(tokens(TOKENS))
+    time.sleep(TOKEN * TOKENS)
+    sys.stdout.write(out.strip() + "\n" if prompt else "")
+    return 0
+
+def main(argv):
+    if argv[:1] == ["run"]:
+        return cmd_run()
+    if argv[:1] == ["serve"]:
+        port = int(argv[2]) if len(argv) > 2 and argv[1] == "--port" else 11435
+        srv, url = make_server(port)
+        print(f"fake ollama: {url}", flush=True)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            srv.shutdown()
+        return 0
+    print(__doc__, file=sys.stderr)
+    return 2
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Lokaler Ersatz für signal-cli (Tests/Benchmarks, kein Signal-Account nötig).
+
+    fake_signal_cli.py -u NUMBER send [-g GROUP] [NUMBER] -m TEXT
+    fake_signal_cli.py -u NUMBER -o json receive
+    fake_signal_cli.py -a NUMBER jsonRpc
+
+Umgebungsvariablen:
+    FAKE_STARTUP       simulierte JVM-Startzeit in Sekunden (Default 1.0)
+    FAKE_SEND_LATENCY  Dauer eines Sendevorgangs in Sekunden (Default 0.05)
+    FAKE_SEND_FAIL     Anteil fehlschlagender Sends 0..1 (Default 0)
+    FAKE_SIGNAL_LOG    Datei, an die jeder Send als JSON-Zeile angehängt wird (mit Konto)
+    FAKE_RECEIVE_FILE  JSON-Lines mit Envelopes (`-o json receive`-Format), die
+                       `receive` ausgibt bzw. `jsonRpc` als Notifications sendet
+    FAKE_RECEIVE_RATE  Envelopes pro Sekunde beim Abspielen (Default 0 = sofort)
+    FAKE_RECEIVE_HOLD  1 = `receive` bleibt nach dem Abspielen offen, bis es beendet
+                       wird (wie ein laufendes signal-cli; Default 0)
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+STARTUP = float(os.getenv("FAKE_STARTUP", "1.0"))
+RATE = float(os.getenv("FAKE_RECEIVE_RATE", "0"))
+_out_lock = threading.Lock()
+LATENCY = float(os.getenv("FAKE_SEND_LATENCY", "0.05"))
+FAIL = float(os.getenv("FAKE_SEND_FAIL", "0"))
+
+ACCOUNT = ""   # Wert von -u/-a
+
+def record(params):
+    path = os.getenv("FAKE_SIGNAL_LOG")
+    if path:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"ts": time.time(), "account": ACCOUNT, **params}, ensure_ascii=False) + "\n")
+
+def do_send(params):
+    time.sleep(LATENCY)
+    if FAIL and random.random() < FAIL:
+        return False
+    record(params)
+    return True
+
+def cmd_send(args):
+    params = {}
+    it = iter(args)
+    for a in it:
+        if a == "-g":
+            params["groupId"] = next(it)
+        elif a == "-m":
+            params["message"] = next(it)
+        else:
+            params["recipient"] = [a]
+    if not do_send(params):
+        print("Failed to send message (fake)", file=sys.stderr)
+        return 1
+    return 0
+
+def write_line(line):
+    with _out_lock:
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+def replay(emit):
+    path = os.getenv("FAKE_RECEIVE_FILE")
+    if not path:
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line:
+                emit(line)
+                if RATE:
+                    time.sleep(1.0 / RATE)
+
+def cmd_receive():
+    replay(write_line)
+    if os.getenv("FAKE_RECEIVE_HOLD", "0") == "1":
+        threading.Event().wait()
+    return 0
+
+def cmd_json_rpc():
+    def notify(line):
+        try:
+            params = json.loads(line)
+        except ValueError:
+            write_line(line)   # Rauschen unverändert durchreichen
+            return
+        write_line(json.dumps({"jsonrpc": "2.0", "method": "receive", "params": params}, ensure_ascii=False))
+    threading.Thread(target=replay, args=(notify,), daemon=True).start()
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            req = json.loads(line)
+        except ValueError:
+            continue
+        rid, method = req.get("id"), req.get("method")
+        if method == "send" and do_send(req.get("params") or {}):
+            resp = {"jsonrpc": "2.0", "id": rid, "result": {"timestamp": int(time.time() * 1000)}}
+        elif method == "send":
+            resp = {"jsonrpc": "2.0", "id": rid, "error": {"code": -1, "message": "Failed to send message (fake)"}}
+        else:
+            resp = {"jsonrpc": "2.0", "id": rid, "error": {"code": -32601, "message": f"Method not implemented: {method}"}}
+        write_line(json.dumps(resp))
+    return 0
+
+def main(argv):
+    global ACCOUNT
+    args = list(argv)
+    while args and args[0] in ("-u", "-a", "-o"):
+        if args[0] in ("-u", "-a") and len(args) > 1:
+            ACCOUNT = args[1]
+        args = args[2:]
+    if not args:
+        print("usage: fake_signal_cli.py -u NUMBER <send|jsonRpc> ...", file=sys.stderr)
+        return 2
+    time.sleep(STARTUP)
+    cmd, rest = args[0], args[1:]
+    if cmd == "send":
+        return cmd_send(rest)
+    if cmd == "receive":
+        return cmd_receive()
+    if cmd == "jsonRpc":
+        return cmd_json_rpc()
+    print(f"fake signal-cli: unbekannter Befehl {cmd}", file=sys.stderr)
+    return 2
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
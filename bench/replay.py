@@ -0,0 +1,215 @@
+"""
+Benchmark: spielt einen aufgezeichneten `signal-cli -o json receive`-Strom durch
+die echte Pipeline (bot_v2.receive_loop: Parsen, Dedup, Filter, FIXED/Retrieval,
+Cache, Scheduler, LLM, Senden). signal-cli und Ollama sind die lokalen Fakes aus
+bench/ mit einstellbarer Latenz.
+
+    PYTHONPATH=. python3 bench/replay.py [--n 2000] [--llm-share 0.05] [--daemon]
+    PYTHONPATH=. python3 bench/replay.py --file aufzeichnung.jsonl
+    PYTHONPATH=. python3 bench/replay.py --async [--daemon]          # asyncio-Kern (bot_async)
+    PYTHONPATH=. python3 bench/replay.py --handlers 4 [--daemon]     # HANDLER_PROCS=4
+    PYTHONPATH=. python3 bench/replay.py --n 500 --write stream.jsonl   # nur erzeugen
+
+Ohne --file wird ein synthetischer Strom erzeugt: dataMessages mit Trigger
+(FIXED-Stichwort, Umschreibung, freie LLM-Frage), Nachrichten ohne Trigger,
+fremde Gruppen, eigene syncMessages, Empfangsbestätigungen, Tipp-Indikatoren,
+Duplikate und Nicht-JSON-Rauschen.
+Ausgabe: Nachrichten/s, Antwortlatenz p50/p95/p99 (Empfang bis erste gesendete
+Antwort), Antwortarten und Speicher (Peak-RSS).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+HERE = Path(__file__).parent
+FAKE_CLI = f"{sys.executable} {HERE / 'fake_signal_cli.py'}"
+NUMBER, OTHER, GROUP, FOREIGN = "+4915100000000", "+4915111111111", "YmVuY2gtZ3JvdXA=", "ZnJlbWQtZ3J1cHBl"
+
+KEYWORDS = ("wlan", "adresse", "müll", "grill", "checkliste", "haustiere", "ping", "abreise")
+REPHRASED = ("wie ist das wlan passwort", "wo kann ich grillen", "wann ist die abreise",
+             "dürfen hunde mit", "wie trenne ich den müll")
+QUESTIONS = ("was kann man bei regen in lucca machen", "empfiehlst du ein restaurant in pescaglia",
+             "wie weit ist es bis zum meer", "gibt es einen wochenmarkt in der nähe")
+
+def make_stream(n, llm_share=0.05, seed=1):
+    """Synthetischer Envelope-Strom als JSON-Zeilen (Format von `-o json receive`)."""
+    rnd = random.Random(seed)
+    lines, ts = [], 1_700_000_000_000
+    for i in range(n):
+        ts += rnd.randint(1, 50)
+        r = rnd.random()
+        if r < 0.02:
+            lines.append("INFO  ReceiveHelper - Connection closed unexpectedly, reconnecting")
+            continue
+        if r < 0.06 and lines and lines[-1].startswith("{"):
+            lines.append(lines[-1])   # Duplikat (erneute Zustellung)
+            continue
+        if r < 0.30:
+            env = {"source": OTHER, "sourceNumber": OTHER, "timestamp": ts,
+                   "receiptMessage": {"when": ts, "isDelivery": r < 0.18, "isRead": r >= 0.18,
+                                      "timestamps": [ts - 1000]}}
+        elif r < 0.40:
+            env = {"source": OTHER, "sourceNumber": OTHER, "timestamp": ts,
+                   "typingMessage": {"action": "STARTED", "timestamp": ts, "groupId": GROUP}}
+        elif r < 0.45:
+            env = {"source": NUMBER, "timestamp": ts, "syncMessage": {"sentMessage": {
+                "message": "!Bot ping", "groupInfo": {"groupId": GROUP}}}}
+        else:
+            gid = FOREIGN if r < 0.55 else GROUP
+            if r < 0.70:
+                text = "bin heute abend zurück"
+            elif rnd.random() < llm_share:
+                text = f"!Bot {rnd.choice(QUESTIONS)} {i}"   # eindeutig → immer LLM
+            elif rnd.random() < 0.2:
+                text = f"!Bot {rnd.choice(REPHRASED)}"
+            else:
+                text = f"!Bot {rnd.choice(KEYWORDS)}"
+            env = {"source": OTHER, "sourceNumber": OTHER, "timestamp": ts,
+                   "dataMessage": {"timestamp": ts, "message": text, "groupInfo": {"groupId": gid}}}
+        lines.append(json.dumps({"envelope": env, "account": NUMBER}, ensure_ascii=False))
+    return lines
+
+def expected_replies(lines, bot):
+    """Anzahl Nachrichten, auf die der Bot antworten muss (gleiche Filter wie receive_loop)."""
+    seen, n = set(), 0
+    for line in lines:
+        try:
+            obj = json.loads(line)
+        except ValueError:
+            continue
+        mid = bot.message_id(obj)
+        if mid in seen:
+            continue
+        seen.add(mid)
+        txt, gid, _ = bot.extract_text_and_gid(obj)
+        if bot.from_myself(obj) or gid != GROUP or not txt:
+            continue
+        if bot.trigger_payload(txt) is not None:
+            n += 1
+    return n
+
+class Recorder:
+    """Ersetzt bot_v2.T_REPLY: sammelt die exakten Latenzen und zählt weiter ins Histogramm."""
+    def __init__(self, hist):
+        self.hist, self.values, self.lock = hist, [], threading.Lock()
+    def observe(self, v):
+        self.hist.observe(v)
+        with self.lock:
+            self.values.append(v)
+
+def pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else float("nan")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--file", help="aufgezeichneter Strom (JSON-Lines); sonst synthetisch")
+    ap.add_argument("--n", type=int, default=2000, help="Zeilen im synthetischen Strom")
+    ap.add_argument("--llm-share", type=float, default=0.05, help="Anteil freier LLM-Fragen")
+    ap.add_argument("--write", help="synthetischen Strom nur in diese Datei schreiben")
+    ap.add_argument("--rate", type=float, default=0, help="Envelopes/s beim Abspielen (0 = sofort)")
+    ap.add_argument("--daemon", action="store_true", help="jsonRpc-Sitzung statt receive + send-Prozess")
+    ap.add_argument("--send-latency", type=float, default=0.01)
+    ap.add_argument("--send-rate", type=float, default=0, help="Rate-Limit pro Gruppe (0 = aus, Bot-Default 1.0)")
+    ap.add_argument("--startup", type=float, default=0.0, help="simulierte JVM-Startzeit")
+    ap.add_argument("--llm-token", type=float, default=0.005, help="Sekunden pro LLM-Token")
+    ap.add_argument("--llm-tokens", type=int, default=40)
+    ap.add_argument("--timeout", type=float, default=300)
+    ap.add_argument("--log-level", default="WARNING")
+    ap.add_argument("--no-prefilter", action="store_true", help="Byte-Vorfilter abschalten (PREFILTER=false)")
+    ap.add_argument("--async", dest="async_core", action="store_true", help="asyncio-Kern (bot_async) statt Threads")
+    ap.add_argument("--handlers", type=int, default=0, help="HANDLER_PROCS: Antwortsuche/LLM in n Prozessen")
+    args = ap.parse_args()
+
+    lines = Path(args.file).read_text(encoding="utf-8").splitlines() if args.file \
+        else make_stream(args.n, args.llm_share)
+    if args.write:
+        Path(args.write).write_text("\n".join(lines) + "\n", encoding="utf-8")
+        print(f"{len(lines)} Zeilen → {args.write}")
+        return
+
+    tmp = Path(tempfile.mkdtemp(prefix="borgo-replay-"))
+    stream = tmp / "receive.jsonl"
+    stream.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    # Konfiguration vor dem Import von config/bot_v2 setzen (.env überschreibt keine Umgebung)
+    os.environ.update({
+        "SIGNAL_NUMBER": NUMBER, "SIGNAL_GROUP_ID": GROUP, "SIGNAL_CLI": FAKE_CLI,
+        "DAEMON_MODE": str(args.daemon).lower(), "USE_LLM": "true", "LLM_BACKEND": "http",
+        "FIXED_FILE": str(HERE.parent / "FIXED_RESPONSES.txt"), "FIXED_SNAPSHOT": "false",
+        "DEDUP_DB": str(tmp / "dedup.sqlite3"), "LOG_FILE": str(tmp / "bot.log"),
+        "LOG_LEVEL": args.log_level.upper(), "METRICS_PORT": "0", "METRICS_FILE": "",
+        "PREFILTER": str(not args.no_prefilter).lower(), "SEND_RATE": str(args.send_rate),
+        "DEAD_LETTER_FILE": str(tmp / "dead_letter.jsonl"), "JOURNAL_DB": str(tmp / "journal.sqlite3"),
+        "FAKE_STARTUP": str(args.startup), "FAKE_SEND_LATENCY": str(args.send_latency),
+        "FAKE_RECEIVE_FILE": str(stream), "FAKE_RECEIVE_RATE": str(args.rate), "FAKE_RECEIVE_HOLD": "1",
+        "FAKE_LLM_LOAD": "0", "FAKE_LLM_TOKEN": str(args.llm_token), "FAKE_LLM_TOKENS": str(args.llm_tokens),
+    })
+    sys.path.insert(0, str(HERE))
+    from fake_ollama import make_server
+    ollama, url = make_server()
+    # über die Umgebung, damit auch die Handler-Prozesse (HANDLER_PROCS) den Fake erreichen
+    os.environ.update({"OLLAMA_URL": url, "HANDLER_PROCS": str(args.handlers)})
+    from config import Config
+    import bot_v2
+    from signal_rpc import SignalSession
+    from receiver import ReceiveProcess
+    from envelopes import EnvelopeFilter
+
+    expected = expected_replies(lines, bot_v2)
+    rec = bot_v2.T_REPLY = Recorder(bot_v2.T_REPLY)
+    prefilter = EnvelopeFilter(GROUP, Config.BOT_TRIGGER) if Config.PREFILTER else None
+    if args.async_core:
+        import bot_async
+        from signal_rpc import AsyncSignalSession
+        from receiver import AsyncReceiveProcess
+        source = (AsyncSignalSession(NUMBER, cli=FAKE_CLI, prefilter=prefilter) if args.daemon
+                  else AsyncReceiveProcess(NUMBER, cli=FAKE_CLI, prefilter=prefilter))
+        aloop = asyncio.new_event_loop()
+        run = lambda: aloop.run_until_complete(bot_async.receive_loop(source))
+        stop = lambda: aloop.call_soon_threadsafe(source.stop)
+    else:
+        source = (SignalSession(NUMBER, cli=FAKE_CLI, prefilter=prefilter) if args.daemon
+                  else ReceiveProcess(NUMBER, cli=FAKE_CLI, prefilter=prefilter))
+        run, stop = (lambda: bot_v2.receive_loop(source)), source.stop
+    rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    t0 = time.perf_counter()
+    loop = threading.Thread(target=run, daemon=True)
+    loop.start()
+    def done():   # beantwortet oder endgültig im dead letter
+        outbox = bot_v2.OUTBOX
+        return len(rec.values) + (outbox.dead if outbox else 0)
+    while done() < expected and time.perf_counter() - t0 < args.timeout:
+        time.sleep(0.01)
+    dead = bot_v2.OUTBOX.dead if bot_v2.OUTBOX else 0
+    elapsed = time.perf_counter() - t0
+    stop()
+    loop.join(timeout=10)
+
+    lat = rec.values
+    rss1 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    lookups = {k[0]: int(v.value) for k, v in bot_v2.LOOKUPS._children.items()}
+    busy = sum(int(v.value) for v in bot_v2.BUSY_REPLIES._children.values())
+    print(f"mode={'jsonRpc' if args.daemon else 'receive+send'} core={'asyncio' if args.async_core else 'threads'} lines={len(lines)} "
+          f"replies={len(lat)}/{expected} elapsed={elapsed:.2f}s")
+    print(f"throughput  {len(lines) / elapsed:8.1f} msgs/s   {len(lat) / elapsed:8.1f} replies/s")
+    print(f"reply p50={pct(lat, 0.50)*1e3:8.1f} ms  p95={pct(lat, 0.95)*1e3:8.1f} ms  "
+          f"p99={pct(lat, 0.99)*1e3:8.1f} ms  max={max(lat, default=0)*1e3:8.1f} ms")
+    print(f"lookups {lookups} busy={busy} fallbacks={int(bot_v2.FALLBACKS.labels().value)} dead_letters={dead} "
+          f"llm_requests={ollama.RequestHandlerClass.requests}"
+          + (" (lookups/busy/fallbacks zählen die Handler-Prozesse, hier nicht enthalten)" if args.handlers else ""))
+    print(f"memory peak_rss={rss1 / 1024:.1f} MiB (+{(rss1 - rss0) / 1024:.1f} MiB während des Laufs)")
+    if len(lat) + dead < expected:
+        print(f"WARNUNG: nur {len(lat)} von {expected} Antworten innerhalb von {args.timeout}s")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
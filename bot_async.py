@@ -0,0 +1,221 @@
+"""
+asyncio-Kern des Bots: Empfang (signal-cli als asyncio-Subprozess bzw.
+jsonRpc-Sitzung), LLM (Ollama über asyncio-Streams) und Versand (AsyncOutbox)
+laufen in einem Event-Loop. Wartende Aufrufe belegen keinen Thread, Timeouts
+und Abbrüche laufen über asyncio.timeout bzw. Task-Cancel. Antwortsuche,
+Filter, Dedup, Journal und Metriken kommen unverändert aus bot_v2.
+
+    ASYNC_CORE=true python3 bot_v2.py
+
+SIGTERM/SIGINT beenden zuerst nur den Empfang; laufende LLM-Antworten und die
+Outbox werden noch abgearbeitet (je höchstens LLM_TIMEOUT Sekunden). Was dann
+noch offen ist, bleibt im Journal und wird beim nächsten Start nachgeholt.
+"""
+import time, signal, asyncio, logging
+
+import bot_v2 as core
+from config import Config
+from fixed_responses import FIXED_LOADER, FALLBACK
+from tenants import get_router
+from dedup_store import SQLiteDedupStore
+from llm_scheduler import AsyncLLMScheduler
+from outbox import AsyncOutbox
+from journal import Journal
+from signal_rpc import AsyncSignalSession
+from receiver import AsyncReceiveProcess, merge_messages_async
+from local_llm_interface import generate_ollama_async, LLMError, DEFAULT_PERSONA
+from answer_cache import exact_question
+from streaming import ChunkedReply
+from utils import AsyncSingleFlight, send_signal_message_async
+
+log = logging.getLogger("borgo")
+
+LLM_FLIGHTS = AsyncSingleFlight()
+SESSIONS: dict[str, AsyncSignalSession] = {}   # Konto -> Sitzung; gesetzt in receive_loop, wenn DAEMON_MODE aktiv
+
+# ---------------- Senden ----------------
+async def send_text(text: str, group_id: str | None, retry=1, wait=0.0, number: str | None = None) -> bool:
+    number = number or Config.SIGNAL_NUMBER
+    session = SESSIONS.get(number)
+    if session is not None:
+        return await session.send_message(text, group_id, retry=retry, wait=wait)
+    return await send_signal_message_async(number, text, group_id, retry=retry, wait=wait, cli=Config.SIGNAL_CLI)
+
+async def _outbox_send(group_id, text) -> bool:
+    # ein Versuch; Retries/Backoff macht die Outbox
+    return await send_text(text, group_id, number=core.account_for(group_id))
+
+# ---------------- LLM ----------------
+async def _generate(payload: str, timeout: float, on_token=None, fixed=FIXED_LOADER,
+                    persona=DEFAULT_PERSONA) -> str:
+    t0 = time.perf_counter()
+    try:
+        return await generate_ollama_async(payload, Config.LLM_MODEL, timeout, Config.LLM_MAX_TOKENS,
+                                           on_token=on_token, context=core.llm_context(payload, fixed),
+                                           persona=persona)
+    finally:
+        core.T_GENERATE.observe(time.perf_counter() - t0)
+
+async def _answer_llm(payload: str, timeout: float | None, on_token, fixed, persona) -> str:
+    """Wie bot_v2._answer_llm: Cache-Prüfung, Single-Flight und Antwort-Cache; LLMError geht an den Aufrufer."""
+    generation = core.cache_generation(fixed, persona)
+    hit = core.cached_answer(payload, generation)
+    if hit:
+        return hit
+    key = (exact_question(payload) or payload,) + generation
+    reply = await LLM_FLIGHTS.do(key, lambda: _generate(payload, timeout or Config.LLM_TIMEOUT, on_token,
+                                                        fixed, persona))
+    if Config.ANSWER_CACHE_SIZE > 0 and generation == core.cache_generation(fixed, persona):
+        core.ANSWER_CACHE.put(payload, reply, generation)
+    return reply
+
+async def answer_llm(payload: str, timeout: float | None = None, on_token=None, fixed=FIXED_LOADER,
+                     persona=DEFAULT_PERSONA) -> str:
+    """Wie bot_v2.answer_llm (Single-Flight, Antwort-Cache, FALLBACK)."""
+    if Config.USE_LLM:
+        try:
+            return await _answer_llm(payload, timeout, on_token, fixed, persona)
+        except LLMError as e:
+            log.warning(f"[LLM] {e}")
+    core.FALLBACKS.inc()
+    return FALLBACK
+
+async def _llm_job(job, deadline: float):
+    tenant, gid, payload, received, mid = job
+    try:
+        await _llm_reply(tenant, gid, payload, received, mid, deadline)
+    except asyncio.CancelledError:
+        raise   # Abbruch beim Herunterfahren: Frage bleibt im Journal offen → nächster Start
+    except Exception:
+        core._handled(mid)   # eine kaputte Frage nicht bei jedem Start wiederholen
+        raise
+    core._handled(mid)
+
+async def _llm_reply(tenant, gid, payload: str, received, mid, deadline: float):
+    # Generierung darf die Deadline des Nutzers nicht überschreiten
+    timeout = max(1.0, min(Config.LLM_TIMEOUT, deadline - time.monotonic()))
+    if not Config.STREAM_REPLIES or Config.LLM_BACKEND == "cli":
+        reply = await answer_llm(payload, timeout, fixed=tenant.fixed, persona=tenant.persona)
+        core.send_reply(gid, reply, received, mid)
+        return
+    if Config.STREAM_PLACEHOLDER:
+        core.send_reply(gid, Config.STREAM_PLACEHOLDER, received, mid)
+        received = None
+
+    def send_chunk(text):
+        nonlocal received
+        core.send_reply(gid, text, received, mid)   # nur einreihen, blockiert den Loop nicht
+        received = None
+
+    stream = ChunkedReply(send_chunk, Config.STREAM_MIN_INTERVAL)
+    try:
+        reply = await _answer_llm(payload, timeout, stream.feed, tenant.fixed, tenant.persona)
+    except LLMError as e:
+        log.warning(f"[LLM] {e}")
+        core.FALLBACKS.inc()
+        if stream.started:
+            stream.abort(core.CUT_OFF)   # Satzanfang im Puffer nicht als Antwort schicken
+        else:
+            core.send_reply(gid, FALLBACK, received, mid)
+        return
+    if stream.started:
+        stream.finish()
+    else:
+        core.send_reply(gid, reply, received, mid)
+
+# ---------------- main loop ----------------
+def _shutdown(sources, signame):
+    log.info(f"[SHUTDOWN] {signame}: Empfang wird beendet, offene Antworten werden noch zugestellt")
+    for src in sources:
+        src.stop()
+
+async def receive_loop(source=None):
+    """
+    Hauptschleife; `source` (AsyncReceiveProcess/AsyncSignalSession) kann vorgegeben
+    werden (bench/replay.py --async), sonst ein Empfänger pro Bot-Konto der Tenants.
+    Endet, wenn alle Quellen enden (`stop()`).
+    """
+    Config.validate()
+    router = get_router()
+    seen = core.open_dedup(writer=True)   # SQLite-Commits nicht auf dem Event-Loop
+    core.log_config("asyncio")
+
+    for loader in router.loaders():
+        loader.start_watcher()
+
+    # bot_v2.send_reply stellt in core.OUTBOX ein – hier die asyncio-Variante (put ist synchron)
+    outbox = core.OUTBOX = AsyncOutbox(_outbox_send, Config.SEND_RATE, Config.SEND_BURST, Config.SEND_COALESCE,
+                                       retries=Config.SEND_RETRY, backoff=Config.SEND_RETRY_WAIT,
+                                       max_backoff=Config.SEND_BACKOFF_MAX, dead_letter=Config.DEAD_LETTER_FILE,
+                                       workers=Config.SEND_WORKERS, on_sent=core._outbox_sent,
+                                       on_dead=core._outbox_dead)
+    scheduler = AsyncLLMScheduler(_llm_job, core._llm_expired, Config.LLM_WORKERS, Config.LLM_QUEUE)
+    outbox.start()
+    scheduler.start()
+
+    # FIXED-Antworten direkt in die Outbox: Einreihen blockiert nie, ein eigener Pool entfällt
+    dispatch = core.make_dispatch(lambda conv, job: core._fast_job(job), scheduler)
+
+    if Config.JOURNAL_DB:
+        core.JOURNAL = Journal(Config.JOURNAL_DB, Config.JOURNAL_FLUSH, Config.JOURNAL_RETAIN, Config.JOURNAL_MAX_AGE)
+        core.recover(core.JOURNAL, outbox, router, dispatch)
+
+    if source is not None:
+        sources = [source]
+        if isinstance(source, AsyncSignalSession):
+            SESSIONS[Config.SIGNAL_NUMBER] = source
+    else:
+        sources = core.open_sources(router, AsyncSignalSession, AsyncReceiveProcess)
+        if Config.DAEMON_MODE:
+            SESSIONS.update(zip(router.accounts, sources))
+    for src in sources:
+        await src.start()
+    core.start_metrics(seen, None, scheduler, outbox, list(SESSIONS.values()), flights=LLM_FLIGHTS)
+
+    loop = asyncio.get_running_loop()
+    signals = []
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, _shutdown, sources, sig.name)
+            signals.append(sig)
+        except (RuntimeError, ValueError, NotImplementedError):
+            pass   # nicht im Haupt-Thread (bench/replay.py) oder Plattform ohne Unterstützung
+
+    # Alive-Ping (informativ) in jede fest zugeordnete Gruppe
+    for t in router.tenants:
+        for gid in t.groups:
+            if gid != "*":
+                outbox.put(gid, "✅ V2 online. Sende `!Bot hilfe`.")
+
+    try:
+        async for obj in merge_messages_async(sources):
+            received = time.perf_counter()
+            accepted = core.accept(obj, seen, received)
+            if accepted is not None:
+                tenant, conv, payload, mid = accepted
+                dispatch(tenant, conv, payload, received, mid)
+    finally:
+        for sig in signals:
+            loop.remove_signal_handler(sig)
+        # Reihenfolge: erst LLM-Antworten fertig, dann Outbox leeren, dann Verbindung schließen
+        await scheduler.stop(timeout=Config.LLM_TIMEOUT)
+        await outbox.stop(timeout=Config.LLM_TIMEOUT)
+        for src in sources:
+            await src.close()
+        log.info(f"[DEDUP] stats {seen.stats()}")
+        log.info(f"[CACHE] stats {core.ANSWER_CACHE.stats()}")
+        log.info(f"[LLM] single-flight {LLM_FLIGHTS.stats()}")
+        log.info(f"[SCHED] stats {scheduler.stats()}")
+        log.info(f"[OUTBOX] stats {outbox.stats()}")
+        core.OUTBOX = None
+        SESSIONS.clear()
+        if core.JOURNAL is not None:
+            log.info(f"[JOURNAL] stats {core.JOURNAL.stats()}")
+            core.JOURNAL.close()
+            core.JOURNAL = None
+        if isinstance(seen, SQLiteDedupStore):
+            seen.close()
+        log.info("Bye.")
+
+if __name__ == "__main__":
+    asyncio.run(receive_loop())
@@ -1,11 +1,26 @@
-import os, json, time, logging, shutil, subprocess, shlex
+import os, time, signal, logging, shutil, shlex, threading
 from logging.handlers import RotatingFileHandler
 import colorlog
 
 from config import Config
 from fixed_responses import FIXED_LOADER, FALLBACK
-from utils import TTLCache, run_cmd, send_signal_message
-from local_llm_interface import generate_ollama, LLMError
+from utils import TTLCache, SingleFlight, run_cmd, send_signal_message
+from dedup_store import SQLiteDedupStore
+from workers import KeyedWorkerPool
+from llm_scheduler import LLMScheduler
+from signal_rpc import SignalSession
+from receiver import ReceiveProcess, merge_messages
+from envelopes import EnvelopeFilter
+from local_llm_interface import generate_ollama, LLMError, DEFAULT_PERSONA
+from answer_cache import AnswerCache, exact_question
+from rag import select_context
+from streaming import ChunkedReply
+from outbox import Outbox
+from journal import Journal
+from log_pipeline import JsonLinesFormatter, start_queue_logging
+from tenants import get_router
+from handler_procs import HandlerProcesses
+import metrics
 
 # ---------------- logging setup ----------------
 def setup_logging():
@@ -13,17 +28,46 @@ def setup_logging():
     logger = logging.getLogger("borgo")
     logger.setLevel(getattr(logging, Config.LOG_LEVEL, logging.INFO))
     fh = RotatingFileHandler(Config.LOG_FILE, maxBytes=2_000_000, backupCount=5, encoding="utf-8")
-    fh.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
-    logger.addHandler(fh)
+    if Config.LOG_FORMAT == "json":
+        fh.setFormatter(JsonLinesFormatter())
+    else:
+        fh.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
     ch = logging.StreamHandler()
     ch.setFormatter(colorlog.ColoredFormatter(
         "%(log_color)s%(asctime)s [%(levelname)s] %(message)s",
         log_colors={"DEBUG":"cyan","INFO":"green","WARNING":"yellow","ERROR":"red","CRITICAL":"bold_red"}))
-    logger.addHandler(ch)
+    # Datei + Konsole schreibt ein eigener Thread; der Hot-Path stellt nur in die Queue
+    start_queue_logging(logger, [fh, ch], Config.LOG_DEBUG_SAMPLE)
     return logger
 
 log = setup_logging()
 
+ANSWER_CACHE = AnswerCache(Config.ANSWER_CACHE_SIZE, Config.ANSWER_CACHE_TTL,
+                           Config.ANSWER_CACHE_BYTES, Config.ANSWER_CACHE_SIMILARITY)
+BUSY = "⏳ Gerade sind viele Fragen offen – bitte in einer Minute nochmal versuchen."
+CUT_OFF = "… (Antwort abgebrochen – bitte die Frage nochmal stellen)"
+
+# identische Fragen, die gleichzeitig ans LLM gehen, teilen sich eine Generierung
+LLM_FLIGHTS = SingleFlight()
+
+SESSIONS: dict[str, SignalSession] = {}   # Konto -> Sitzung; gesetzt in receive_loop, wenn DAEMON_MODE aktiv
+OUTBOX: Outbox | None = None           # gesetzt in receive_loop; ohne Outbox wird direkt gesendet
+JOURNAL: Journal | None = None         # gesetzt in receive_loop, wenn JOURNAL_DB konfiguriert ist
+
+# ---------------- metrics ----------------
+# Kinder vorab binden: im Hot-Path kostet eine Messung nur perf_counter + observe
+STAGE = metrics.histogram("borgo_stage_seconds", "Dauer je Verarbeitungsstufe", ("stage",))
+T_DEDUP, T_LOOKUP, T_GENERATE, T_SEND = (STAGE.labels(s) for s in ("dedup", "lookup", "generate", "send"))
+T_REPLY = metrics.histogram("borgo_reply_seconds", "Empfang bis erste gesendete Antwort")
+RECEIVED = metrics.counter("borgo_messages_total", "Empfangene Nachrichten nach Ergebnis", ("result",))
+LOOKUPS = metrics.counter("borgo_lookups_total", "Antwortsuche ohne LLM nach Ergebnis", ("result",))
+FALLBACKS = metrics.counter("borgo_fallbacks_total", "FALLBACK-Antworten (LLM aus oder Fehler)")
+QUEUED_CACHE_HITS = metrics.counter("borgo_llm_queued_cache_hits_total",
+                                    "LLM-Jobs, deren Antwort beim Start schon im Cache lag")
+BUSY_REPLIES = metrics.counter("borgo_busy_total", "Busy-Antworten (Warteschlange voll, Deadline)", ("reason",))
+SENT = metrics.counter("borgo_send_total", "Gesendete Antworten nach Ergebnis", ("result",))
+TENANT_MESSAGES = metrics.counter("borgo_tenant_messages_total", "Angenommene Anfragen je Tenant", ("tenant",))
+
 # ---------------- helpers ----------------
 def envelope(obj): return obj.get("envelope", {}) if isinstance(obj, dict) else {}
 
@@ -58,133 +102,496 @@ def message_id(obj):
 
 def from_myself(obj):
     env = envelope(obj)
-    return env.get("source","") == Config.SIGNAL_NUMBER
+    return env.get("source","") in get_router().numbers   # auch die anderen Bot-Konten
 
-def handle_message(text: str) -> str | None:
+def trigger_payload(text: str) -> str | None:
+    """Text nach dem Trigger oder None, wenn die Nachricht nicht an den Bot geht."""
     if not text:
         return None
     if not text.lower().startswith(Config.BOT_TRIGGER.lower()):
         return None
+    return text[len(Config.BOT_TRIGGER):].strip()
 
-    payload = text[len(Config.BOT_TRIGGER):].strip()
+def cache_generation(fixed=FIXED_LOADER, persona=DEFAULT_PERSONA):
+    """Cache-Einträge gelten nur für dieselbe FIXED-Datei und Persona, ihren Inhalt und dasselbe Modell."""
+    return ((fixed.path, persona), fixed.version, Config.LLM_MODEL)
 
-    # FIXED first
-    hit = FIXED_LOADER.lookup(payload)
+def fast_answer(payload: str, fixed=FIXED_LOADER, persona=DEFAULT_PERSONA) -> str | None:
+    """Antworten ohne LLM: FIXED-Treffer (Stichwort oder Retrieval) oder gecachte LLM-Antwort."""
+    hit = fixed.lookup(payload)
     if hit:
+        LOOKUPS.labels("fixed").inc()
         return hit
+    if Config.RETRIEVAL:
+        top = fixed.search(payload, 1)
+        if top and top[0][1] >= Config.RETRIEVAL_ANSWER:
+            log.info("[RETRIEVE] %r → %s (%.2f)", payload, top[0][0], top[0][1])
+            LOOKUPS.labels("retrieval").inc()
+            return fixed.entries.get(top[0][0])
+    if Config.USE_LLM and Config.ANSWER_CACHE_SIZE > 0:
+        hit = ANSWER_CACHE.get(payload, cache_generation(fixed, persona))
+        if hit:
+            log.info("[CACHE] hit %r", payload)
+            LOOKUPS.labels("cache").inc()
+            return hit
+    LOOKUPS.labels("miss").inc()
+    return None
 
-    # LLM or fallback
+def llm_context(payload: str, fixed=FIXED_LOADER) -> list[str]:
+    """FIXED-Einträge, die ähnlich genug sind, um dem LLM als Kontext zu dienen."""
+    if not Config.RETRIEVAL:
+        return []
+    return select_context(payload, fixed, Config.RAG_MAX_TOKENS,
+                          Config.RETRIEVAL_TOP_K, Config.RETRIEVAL_CONTEXT)
+
+def _generate(payload: str, timeout: float, on_token=None, fixed=FIXED_LOADER, persona=DEFAULT_PERSONA) -> str:
+    t0 = time.perf_counter()
+    try:
+        return generate_ollama(payload, Config.LLM_MODEL, timeout, Config.LLM_MAX_TOKENS,
+                               on_token=on_token, context=llm_context(payload, fixed), persona=persona)
+    finally:
+        T_GENERATE.observe(time.perf_counter() - t0)
+
+def cached_answer(payload: str, generation) -> str | None:
+    """Cache-Treffer für einen LLM-Job, unmittelbar bevor er generieren würde."""
+    if Config.ANSWER_CACHE_SIZE <= 0:
+        return None
+    hit = ANSWER_CACHE.get(payload, generation)
+    if hit:
+        log.info("[CACHE] hit nach Warteschlange %r", payload)
+        QUEUED_CACHE_HITS.inc()
+    return hit
+
+def _answer_llm(payload: str, timeout: float | None, on_token, fixed, persona) -> str:
+    """Antwort-Cache, sonst Generierung über Single-Flight (Ergebnis in den Cache); LLMError geht an den Aufrufer."""
+    generation = cache_generation(fixed, persona)
+    # Single-Flight hilft nur bei gleichzeitigen Generierungen; mit LLM_WORKERS=1 wartet die
+    # gleiche Frage eines anderen Absenders in der Queue – bis dahin steht die Antwort im Cache
+    hit = cached_answer(payload, generation)
+    if hit:
+        return hit
+    # FIXED-Version und Persona im Schlüssel: Tenants mit anderem Kontext teilen keine Generierung
+    key = (exact_question(payload) or payload,) + generation
+    reply = LLM_FLIGHTS.do(key, lambda: _generate(payload, timeout or Config.LLM_TIMEOUT, on_token,
+                                                  fixed, persona))
+    # FIXED-Datei/Modell während der Generierung geändert → nicht cachen
+    if Config.ANSWER_CACHE_SIZE > 0 and generation == cache_generation(fixed, persona):
+        ANSWER_CACHE.put(payload, reply, generation)
+    return reply
+
+def answer_llm(payload: str, timeout: float | None = None, on_token=None, fixed=FIXED_LOADER,
+               persona=DEFAULT_PERSONA) -> str:
     if Config.USE_LLM:
         try:
-            return generate_ollama(payload, Config.LLM_MODEL, Config.LLM_TIMEOUT, Config.LLM_MAX_TOKENS)
+            return _answer_llm(payload, timeout, on_token, fixed, persona)
         except LLMError as e:
             log.warning(f"[LLM] {e}")
-            return FALLBACK
+    FALLBACKS.inc()
     return FALLBACK
 
+def handle_message(text: str) -> str | None:
+    payload = trigger_payload(text)
+    if payload is None:
+        return None
+
+    # FIXED / Cache first
+    hit = fast_answer(payload)
+    if hit:
+        return hit
+
+    # LLM or fallback
+    return answer_llm(payload)
+
+def send_text(text: str, group_id: str | None, retry=1, wait=0.0, number: str | None = None) -> bool:
+    number = number or Config.SIGNAL_NUMBER
+    session = SESSIONS.get(number)
+    if session is not None:
+        return session.send_message(text, group_id, retry=retry, wait=wait)
+    return send_signal_message(number, text, group_id, retry=retry, wait=wait, cli=Config.SIGNAL_CLI)
+
+def account_for(group_id) -> str:
+    """Bot-Konto, über das an `group_id` geantwortet wird (Konto des zuständigen Tenants)."""
+    tenant = get_router().route(group_id)
+    return tenant.number if tenant is not None else Config.SIGNAL_NUMBER
+
+def _outbox_send(group_id, text) -> bool:
+    # ein Versuch; Retries/Backoff macht die Outbox
+    return send_text(text, group_id, number=account_for(group_id))
+
+def _outbox_sent(ok, items, seconds):
+    T_SEND.observe(seconds)
+    SENT.labels("ok" if ok else "failed").inc()
+    log.info("[SEND] %s (%d Antwort(en))", "ok" if ok else "failed", len(items))
+    if ok:
+        now = time.perf_counter()
+        for item in items:
+            if item.received is not None:
+                T_REPLY.observe(now - item.received)
+            if JOURNAL is not None and item.ref is not None:
+                JOURNAL.sent(item.ref)
+
+def _outbox_dead(items, reason):
+    # beim Herunterfahren Übriggebliebenes bleibt im Journal offen → nächster Start sendet es
+    if JOURNAL is not None and reason != "shutdown":
+        for item in items:
+            if item.ref is not None:
+                JOURNAL.sent(item.ref)
+
+def _handled(mid):
+    if JOURNAL is not None and mid is not None:
+        JOURNAL.handled(mid)
+
+def send_reply(group_id: str | None, reply: str, received: float | None = None, mid: str | None = None):
+    """
+    Antwort in die Gruppe, aus der die Frage kam; `received` (perf_counter beim
+    Empfang) misst die Antwortlatenz, `mid` ordnet die Antwort im Journal der Frage zu.
+    """
+    if OUTBOX is not None:
+        ref = JOURNAL.reply(mid, group_id, reply) if JOURNAL is not None else None
+        OUTBOX.put(group_id, reply, received, ref)
+        return
+    t0 = time.perf_counter()
+    ok = send_text(reply, group_id, retry=Config.SEND_RETRY, wait=Config.SEND_RETRY_WAIT,
+                   number=account_for(group_id))
+    t1 = time.perf_counter()
+    T_SEND.observe(t1 - t0)
+    if received is not None:
+        T_REPLY.observe(t1 - received)
+    SENT.labels("ok" if ok else "failed").inc()
+    log.info("[SEND] %s", "ok" if ok else "failed")
+
+def _fast_job(job):
+    gid, reply, received, mid = job
+    send_reply(gid, reply, received, mid)
+    _handled(mid)
+
+def _llm_job(job, deadline: float):
+    tenant, gid, payload, received, mid = job
+    try:
+        _llm_reply(tenant, gid, payload, received, mid, deadline)
+    finally:
+        _handled(mid)   # auch bei Fehlern: eine kaputte Frage nicht bei jedem Start wiederholen
+
+def _llm_reply(tenant, gid, payload: str, received, mid, deadline: float):
+    # Generierung darf die Deadline des Nutzers nicht überschreiten
+    timeout = max(1.0, min(Config.LLM_TIMEOUT, deadline - time.monotonic()))
+    if not Config.STREAM_REPLIES or Config.LLM_BACKEND == "cli":
+        send_reply(gid, answer_llm(payload, timeout, fixed=tenant.fixed, persona=tenant.persona), received, mid)
+        return
+    # Streaming: erster Satz sofort, Rest satzweise mit Mindestabstand
+    if Config.STREAM_PLACEHOLDER:
+        send_reply(gid, Config.STREAM_PLACEHOLDER, received, mid)
+        received = None
+
+    def send_chunk(text):
+        nonlocal received
+        send_reply(gid, text, received, mid)
+        received = None   # Latenz nur bis zum ersten Teil messen
+
+    stream = ChunkedReply(send_chunk, Config.STREAM_MIN_INTERVAL)
+    try:
+        reply = _answer_llm(payload, timeout, stream.feed, tenant.fixed, tenant.persona)
+    except LLMError as e:
+        log.warning(f"[LLM] {e}")
+        FALLBACKS.inc()
+        if stream.started:
+            stream.abort(CUT_OFF)   # Satzanfang im Puffer nicht als Antwort schicken
+        else:
+            send_reply(gid, FALLBACK, received, mid)
+        return
+    if stream.started:
+        stream.finish()
+    else:
+        # Cache/Single-Flight-Mitläufer
+        send_reply(gid, reply, received, mid)
+
+def _llm_expired(job):
+    BUSY_REPLIES.labels("deadline").inc()
+    tenant, gid, payload, received, mid = job
+    send_reply(gid, BUSY, received, mid)
+    _handled(mid)
+
+def make_dispatch(submit_fast, scheduler):
+    """
+    dispatch(tenant, conv, payload, received, mid): FIXED/Retrieval/Cache-Treffer gehen an
+    `submit_fast(conv, job)`, alles andere an den LLM-Scheduler (voll → „busy“).
+    Reihenfolge pro Konversation gilt nur innerhalb eines Wegs (FIXED-Pool bzw.
+    Scheduler je Absender FIFO). Bewusst nicht zwischen beiden: eine spätere
+    FIXED-Antwort überholt eine frühere, noch laufende LLM-Antwort derselben
+    Konversation – FIXED wartet nie hinter dem LLM.
+    """
+    def dispatch(tenant, conv, payload, received, mid):
+        gid = conv[0]
+        t0 = time.perf_counter()
+        hit = fast_answer(payload, tenant.fixed, tenant.persona)
+        T_LOOKUP.observe(time.perf_counter() - t0)
+        if hit:
+            submit_fast(conv, (gid, hit, received, mid))
+        elif not Config.USE_LLM:
+            FALLBACKS.inc()
+            submit_fast(conv, (gid, FALLBACK, received, mid))
+        elif not scheduler.submit(conv, (tenant, gid, payload, received, mid),
+                                  time.monotonic() + Config.LLM_DEADLINE):
+            BUSY_REPLIES.labels("queue_full").inc()
+            submit_fast(conv, (gid, BUSY, received, mid))
+    return dispatch
+
+def accept(obj, seen, received):
+    """
+    Dedup, Filter (eigene Nachrichten, Tenant per groupId, Trigger) und Journal für
+    ein Envelope; (tenant, conv, payload, mid), wenn der Bot antworten soll, sonst None.
+    """
+    mid = message_id(obj)
+    if mid in seen:
+        T_DEDUP.observe(time.perf_counter() - received)
+        RECEIVED.labels("duplicate").inc()
+        log.debug("[DEDUP] skip %s", mid)
+        return None
+    seen.add(mid)
+    T_DEDUP.observe(time.perf_counter() - received)
+
+    # immer loggen, auch self
+    txt, gid, kind = extract_text_and_gid(obj)
+    if from_myself(obj):
+        RECEIVED.labels("self").inc()
+        log.info("[RX-SELF] kind=%s groupId=%s text=%r", kind, gid, txt)
+        return None
+
+    log.info("[RX] kind=%s groupId=%s text=%r", kind, gid, txt)
+
+    # Routing: groupId -> Tenant; Gruppen ohne Tenant ignorieren
+    tenant = get_router().route(gid)
+    if tenant is None:
+        RECEIVED.labels("ignored").inc()
+        return None
+    if not txt:
+        RECEIVED.labels("ignored").inc()
+        return None
+
+    payload = trigger_payload(txt)
+    if payload is None:
+        RECEIVED.labels("ignored").inc()
+        return None
+
+    RECEIVED.labels("handled").inc()
+    TENANT_MESSAGES.labels(tenant.name).inc()
+    log.info("[HANDLE] tenant=%s msg=%r", tenant.name, txt)
+    conv = (gid, envelope(obj).get("source", ""))
+    if JOURNAL is not None:
+        JOURNAL.received(mid, gid, conv[1], payload)
+    return tenant, conv, payload, mid
+
+def open_dedup(writer=False):
+    if Config.DEDUP_DB:
+        return SQLiteDedupStore(Config.DEDUP_DB, ttl=Config.DEDUP_TTL, maxrows=Config.DEDUP_MAX, writer=writer)
+    return TTLCache(4096, Config.DEDUP_TTL)
+
+def log_config(core="threads"):
+    log.info(f"[BOOT] V2 startet … (core={core})")
+    log.info(f"[CFG] number={Config.SIGNAL_NUMBER} trigger={Config.BOT_TRIGGER} tenants={Config.TENANTS_FILE or '-'}")
+    for t in get_router().tenants:
+        log.info(f"[CFG] tenant {t.name}: number={t.number} groups={len(t.groups)} fixed_file={t.fixed.path}")
+    log.info(f"[CFG] llm={Config.USE_LLM} model={Config.LLM_MODEL} fixed_file={Config.FIXED_FILE}")
+    log.info(f"[CFG] llm_backend={Config.LLM_BACKEND} ollama={Config.OLLAMA_URL} keep_alive={Config.LLM_KEEP_ALIVE}")
+    log.info(f"[CFG] dedup_db={Config.DEDUP_DB or '-'} ttl={Config.DEDUP_TTL}s journal={Config.JOURNAL_DB or '-'}")
+    log.info(f"[CFG] workers fast={Config.FAST_WORKERS} queue={Config.WORKER_QUEUE} "
+             f"llm={Config.LLM_WORKERS} llm_queue={Config.LLM_QUEUE} deadline={Config.LLM_DEADLINE}s "
+             f"handler_procs={Config.HANDLER_PROCS}")
+    log.info(f"[CFG] send workers={Config.SEND_WORKERS} rate={Config.SEND_RATE}/s burst={Config.SEND_BURST} "
+             f"coalesce={Config.SEND_COALESCE}s retries={Config.SEND_RETRY} dead_letter={Config.DEAD_LETTER_FILE or '-'}")
+    log.info(f"[CFG] signal-cli path={shutil.which(shlex.split(Config.SIGNAL_CLI)[0])} daemon={Config.DAEMON_MODE} "
+             f"prefilter={Config.PREFILTER}")
+
+def recover(journal, outbox, router, dispatch):
+    """Offene Antworten erneut einreihen, offene Fragen neu an `dispatch` geben."""
+    questions, replies = journal.recover()
+    for ref, gid, text in replies:
+        outbox.put(gid, text, None, ref)
+    for mid, gid, src, payload in questions:
+        tenant = router.route(gid)
+        if tenant is None:
+            log.warning(f"[JOURNAL] Gruppe {gid} hat keinen Tenant mehr – Frage {mid} verworfen")
+            journal.handled(mid)
+            continue
+        dispatch(tenant, (gid, src), payload, None, mid)
+
+def open_sources(router, session_cls, process_cls):
+    """Ein Empfänger pro Bot-Konto (Reihenfolge wie router.accounts)."""
+    groups = router.groups()
+    prefilter = EnvelopeFilter(groups if groups is not None else "*", Config.BOT_TRIGGER) if Config.PREFILTER else None
+    if Config.DAEMON_MODE:
+        # ein gemeinsamer Daemon-Socket bedient nur ein Konto; weitere Konten bekommen eigene Prozesse
+        return [session_cls(number, cli=Config.SIGNAL_CLI, socket_path=Config.SIGNAL_SOCKET if i == 0 else "",
+                            prefilter=prefilter) for i, number in enumerate(router.accounts)]
+    return [process_cls(number, cli=Config.SIGNAL_CLI, prefilter=prefilter) for number in router.accounts]
+
+def start_metrics(seen, fast_pool, scheduler, outbox, sessions=(), handlers=None, flights=None):
+    """Gauges werden erst beim Abruf berechnet; Export per HTTP und/oder Textfile."""
+    flights = LLM_FLIGHTS if flights is None else flights   # asyncio-Kern: eigene AsyncSingleFlight
+    if fast_pool is not None:   # asyncio-Kern: FIXED-Antworten gehen direkt in die Outbox
+        metrics.gauge("borgo_queue_depth", "Wartende Jobs im FIXED-Pool", fn=fast_pool.depth)
+    metrics.gauge("borgo_outbox_depth", "Wartende ausgehende Nachrichten", fn=outbox.depth)
+    metrics.counter("borgo_outbox_retries_total", "Erneut eingeplante Sends", fn=lambda: outbox.retried)
+    metrics.counter("borgo_outbox_coalesced_total", "In andere Sends zusammengefasste Antworten",
+                    fn=lambda: outbox.coalesced)
+    metrics.counter("borgo_dead_letters_total", "Endgültig nicht zugestellte Antworten", fn=lambda: outbox.dead)
+    if scheduler is not None:   # HANDLER_PROCS: Scheduler laufen in den Handler-Prozessen
+        metrics.gauge("borgo_llm_queue_depth", "Wartende LLM-Jobs", fn=scheduler.depth)
+        metrics.gauge("borgo_llm_running", "Laufende LLM-Generierungen", fn=lambda: scheduler.stats()["running"])
+        metrics.gauge("borgo_llm_in_flight", "Laufende Single-Flight-Aufrufe", fn=lambda: flights.stats()["in_flight"])
+        metrics.counter("borgo_llm_coalesced_total", "Durch Single-Flight gesparte LLM-Generierungen",
+                        fn=lambda: flights.stats()["shared"])
+    if handlers is not None:
+        metrics.gauge("borgo_handler_in_flight", "An Handler-Prozesse gegebene, offene Fragen", fn=handlers.depth)
+        metrics.counter("borgo_handler_restarts_total", "Neu gestartete Handler-Prozesse",
+                        fn=lambda: handlers.restarts)
+    metrics.gauge("borgo_answer_cache_entries", "Einträge im Antwort-Cache", fn=lambda: ANSWER_CACHE.stats()["size"])
+    metrics.gauge("borgo_answer_cache_bytes", "Größe des Antwort-Caches", fn=lambda: ANSWER_CACHE.stats()["bytes"])
+    if isinstance(seen, SQLiteDedupStore):
+        metrics.gauge("borgo_dedup_pending", "Noch nicht committete Dedup-IDs", fn=lambda: seen.stats()["pending"])
+    if sessions:
+        metrics.gauge("borgo_inbox_depth", "Empfangene, noch nicht verarbeitete Nachrichten",
+                      fn=lambda: sum(s._inbox.qsize() for s in sessions))
+    if Config.METRICS_PORT:
+        metrics.start_http_server(Config.METRICS_PORT, Config.METRICS_HOST)
+    if Config.METRICS_FILE:
+        metrics.start_textfile_writer(Config.METRICS_FILE)
+
 # ---------------- main loop (streaming receive) ----------------
-def receive_loop():
+def receive_loop(source=None):
+    """
+    Hauptschleife; `source` (ReceiveProcess/SignalSession) kann vorgegeben werden (bench/replay.py),
+    sonst ein Empfänger pro Bot-Konto der Tenants. FIXED-Pool, LLM-Scheduler und Outbox
+    teilen sich alle Tenants. Mit HANDLER_PROCS > 0 laufen Antwortsuche und LLM in
+    eigenen Prozessen (handler_procs.py); hier bleiben Empfang, Dedup, Journal und Versand.
+    """
+    global OUTBOX, JOURNAL
     Config.validate()
-    seen = TTLCache(4096, 12*3600)
+    router = get_router()
+    seen = open_dedup()
+    log_config()
 
-    log.info("[BOOT] V2 startet …")
-    log.info(f"[CFG] number={Config.SIGNAL_NUMBER} trigger={Config.BOT_TRIGGER}")
-    log.info(f"[CFG] llm={Config.USE_LLM} model={Config.LLM_MODEL} fixed_file={Config.FIXED_FILE}")
-    log.info(f"[CFG] signal-cli path={shutil.which('signal-cli')}")
+    if Config.HANDLER_PROCS <= 0:   # sonst suchen nur die Handler-Prozesse in den FIXED-Dateien
+        for loader in router.loaders():
+            loader.start_watcher()
+
+    # FIXED-Antworten und LLM-Generierungen laufen getrennt, damit eine fixe
+    # Antwort nie hinter einer LLM-Generierung wartet (dafür kann sie eine frühere
+    # LLM-Antwort derselben Konversation überholen, siehe make_dispatch). Vor dem LLM sitzt der
+    # Scheduler (begrenzte Parallelität, faire Warteschlange, Deadlines).
+    # Versand entkoppelt: Worker und Empfang stellen nur in die Outbox, Retries blockieren niemanden
+    OUTBOX = Outbox(_outbox_send, Config.SEND_RATE, Config.SEND_BURST, Config.SEND_COALESCE,
+                    retries=Config.SEND_RETRY, backoff=Config.SEND_RETRY_WAIT,
+                    max_backoff=Config.SEND_BACKOFF_MAX, dead_letter=Config.DEAD_LETTER_FILE,
+                    workers=Config.SEND_WORKERS, on_sent=_outbox_sent, on_dead=_outbox_dead)
+    if Config.HANDLER_PROCS > 0:
+        # Antworten der Handler laufen über send_reply/_handled hier: ein Journal, ein Sender
+        handlers = HandlerProcesses(Config.HANDLER_PROCS, send_reply, _handled, Config.LOG_FILE)
+        fast_pool = scheduler = None
+
+        def dispatch(tenant, conv, payload, received, mid):
+            handlers.submit(conv, conv, payload, received, mid)
+    else:
+        handlers = None
+        fast_pool = KeyedWorkerPool("fast", _fast_job, Config.FAST_WORKERS, Config.WORKER_QUEUE)
+        scheduler = LLMScheduler(_llm_job, _llm_expired, Config.LLM_WORKERS, Config.LLM_QUEUE)
+        dispatch = make_dispatch(fast_pool.submit, scheduler)
 
-    # Alive-Ping (informativ)
-    send_signal_message(Config.SIGNAL_NUMBER, "✅ V2 online. Sende `!Bot hilfe`.", Config.SIGNAL_GROUP_ID)
+    # Journal: was beim letzten Lauf angenommen, aber nicht beantwortet/zugestellt wurde, nachholen
+    if Config.JOURNAL_DB:
+        JOURNAL = Journal(Config.JOURNAL_DB, Config.JOURNAL_FLUSH, Config.JOURNAL_RETAIN, Config.JOURNAL_MAX_AGE)
+        recover(JOURNAL, OUTBOX, router, dispatch)
 
-    def start_receiver():
-        cmd = f"signal-cli -u {Config.SIGNAL_NUMBER} -o json receive"
-        log.info(f"[RECV] spawn: {cmd}")
-        return subprocess.Popen(
-            shlex.split(cmd),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1  # line-buffered
-        )
+    # Empfang: eine gemeinsame jsonRpc-Sitzung pro Konto (Empfang + Versand)
+    # oder klassisch `signal-cli -o json receive` + Prozess pro Send
+    if source is not None:
+        sources = [source]
+        if isinstance(source, SignalSession):
+            SESSIONS[Config.SIGNAL_NUMBER] = source
+    else:
+        sources = open_sources(router, SignalSession, ReceiveProcess)
+        if Config.DAEMON_MODE:
+            SESSIONS.update(zip(router.accounts, sources))
+    if handlers is not None:
+        handlers.wait_ready()
+    for src in sources:
+        src.start()
+    previous = _install_shutdown(sources)
+    start_metrics(seen, fast_pool, scheduler, OUTBOX, list(SESSIONS.values()), handlers)
 
-    backoff = 1
-    proc = None
+    # Alive-Ping (informativ) in jede fest zugeordnete Gruppe
+    for t in router.tenants:
+        for gid in t.groups:
+            if gid != "*":
+                OUTBOX.put(gid, "✅ V2 online. Sende `!Bot hilfe`.")
 
     try:
-        while True:
-            if proc is None or proc.poll() is not None:
-                proc = start_receiver()
-                backoff = 1
-
-            line = proc.stdout.readline()
-            if not line:
-                # evtl. beendet / kurz still – stderr prüfen
-                errbuf = ""
-                if proc and proc.stderr:
-                    try:
-                        errbuf = proc.stderr.read(1000) if not proc.poll() else (proc.stderr.read() or "")
-                    except Exception:
-                        errbuf = ""
-                if errbuf:
-                    log.warning(f"[RECV:STDERR] {errbuf.strip()[:500]}")
-                if proc.poll() is not None:
-                    rc = proc.returncode
-                    log.warning(f"[RECV] receiver exited rc={rc}; restarting in {backoff}s")
-                    time.sleep(backoff)
-                    backoff = min(backoff * 2, 30)
-                    continue
-                time.sleep(0.2)
-                continue
-
-            s = line.strip()
-            if not s:
-                continue
-
-            log.debug(f"[RECV:LINE] {s[:500]}")
-            try:
-                obj = json.loads(s)
-            except json.JSONDecodeError:
-                log.debug(f"[RECV] non-json: {s[:120]}")
-                continue
-
-            mid = message_id(obj)
-            if mid in seen:
-                log.debug(f"[DEDUP] skip {mid}")
-                continue
-            seen.add(mid)
-
-            # immer loggen, auch self
-            txt, gid, kind = extract_text_and_gid(obj)
-            if from_myself(obj):
-                log.info(f"[RX-SELF] kind={kind} groupId={gid} text={txt!r}")
-                continue
-
-            log.info(f"[RX] kind={kind} groupId={gid} text={txt!r}")
-
-            # Gruppen-Filter ('*' erlaubt alles)
-            if Config.SIGNAL_GROUP_ID != "*" and (not gid or gid != Config.SIGNAL_GROUP_ID):
-                continue
-            if not txt:
-                continue
-
-            log.info(f"[HANDLE] msg={txt!r}")
-            reply = handle_message(txt)
-            if reply:
-                ok = send_signal_message(
-                    Config.SIGNAL_NUMBER, reply, Config.SIGNAL_GROUP_ID,
-                    retry=Config.SEND_RETRY, wait=Config.SEND_RETRY_WAIT
-                )
-                log.info("[SEND] ok" if ok else "[SEND] failed")
+        for obj in merge_messages(sources):
+            received = time.perf_counter()
+            accepted = accept(obj, seen, received)
+            if accepted is not None:
+                tenant, conv, payload, mid = accepted
+                dispatch(tenant, conv, payload, received, mid)
     except KeyboardInterrupt:
         log.info("Bye.")
     finally:
-        try:
-            if proc and proc.poll() is None:
-                proc.terminate()
-        except Exception:
-            pass
+        if handlers is not None:
+            handlers.stop(timeout=Config.LLM_TIMEOUT + 5)   # Handler räumen ihren Scheduler selbst ab
+        else:
+            scheduler.stop(timeout=Config.LLM_TIMEOUT)
+            fast_pool.stop(timeout=Config.LLM_TIMEOUT)
+        OUTBOX.stop(timeout=Config.LLM_TIMEOUT)
+        for src in sources:
+            src.stop()
+        SESSIONS.clear()
+        log.info(f"[DEDUP] stats {seen.stats()}")
+        if handlers is not None:
+            log.info(f"[PROCS] stats {handlers.stats()}")
+        else:
+            log.info(f"[CACHE] stats {ANSWER_CACHE.stats()}")
+            log.info(f"[LLM] single-flight {LLM_FLIGHTS.stats()}")
+            log.info(f"[SCHED] stats {scheduler.stats()}")
+        log.info(f"[OUTBOX] stats {OUTBOX.stats()}")
+        OUTBOX = None
+        if JOURNAL is not None:
+            log.info(f"[JOURNAL] stats {JOURNAL.stats()}")
+            JOURNAL.close()
+            JOURNAL = None
+        if isinstance(seen, SQLiteDedupStore):
+            seen.close()
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+
+def _shutdown(sources, signame):
+    log.info(f"[SHUTDOWN] {signame}: Empfang wird beendet, offene Antworten werden noch zugestellt")
+    for src in sources:
+        src.stop()
+
+def _install_shutdown(sources) -> dict:
+    """
+    SIGTERM/SIGINT beenden wie im asyncio-Kern nur den Empfang: merge_messages endet
+    regulär und das finally von receive_loop arbeitet Scheduler, Outbox und Journal ab.
+    Kein KeyboardInterrupt mitten in accept() – sonst wäre eine Nachricht als gesehen
+    markiert, aber nie journalisiert. Ein zweites Strg+C bricht hart ab.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return {}   # Signale gibt es nur im Haupt-Thread
+
+    def handler(signum, frame):
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        # stop() nicht im Handler selbst: er unterbricht den Haupt-Thread, evtl. mitten in der Quelle
+        threading.Thread(target=_shutdown, args=(sources, signal.Signals(signum).name),
+                         name="shutdown", daemon=True).start()
+    return {sig: signal.signal(sig, handler) for sig in (signal.SIGTERM, signal.SIGINT)}
 
 if __name__ == "__main__":
-    try:
-        receive_loop()
-    except KeyboardInterrupt:
-        log.info("Bye.")
\ No newline at end of file
+    if Config.ASYNC_CORE:
+        import sys, asyncio
+        sys.modules.setdefault("bot_v2", sys.modules[__name__])   # bot_async nutzt dieses Modul, kein zweiter Import
+        import bot_async
+        asyncio.run(bot_async.receive_loop())
+    else:
+        try:
+            receive_loop()
+        except KeyboardInterrupt:
+            log.info("Bye.")
\ No newline at end of file
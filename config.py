@@ -1,4 +1,4 @@
-import os
+import os, sys
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -8,30 +8,117 @@ class Config:
     SIGNAL_NUMBER = os.getenv("SIGNAL_NUMBER", "").strip()
     SIGNAL_GROUP_ID = os.getenv("SIGNAL_GROUP_ID", "").strip()
     BOT_TRIGGER = os.getenv("BOT_TRIGGER", "!Bot").strip()
+    # Mehrere Gruppen/Konten mit eigener FIXED-Datei (JSON, siehe tenants.py); leer = nur SIGNAL_*
+    TENANTS_FILE = os.getenv("TENANTS_FILE", "").strip()
 
     RECV_TIMEOUT = int(os.getenv("RECV_TIMEOUT", "300"))
     LLM_TIMEOUT = int(os.getenv("LLM_TIMEOUT", "25"))
     SEND_RETRY = int(os.getenv("SEND_RETRY", "3"))
     SEND_RETRY_WAIT = float(os.getenv("SEND_RETRY_WAIT", "1.0"))
+    # Ausgangs-Queue: Sender-Threads, Rate-Limit pro Gruppe, Sammelfenster, dead letter
+    SEND_WORKERS = int(os.getenv("SEND_WORKERS", "1"))
+    SEND_RATE = float(os.getenv("SEND_RATE", "1.0"))
+    SEND_BURST = int(os.getenv("SEND_BURST", "5"))
+    SEND_COALESCE = float(os.getenv("SEND_COALESCE", "0.3"))
+    SEND_BACKOFF_MAX = float(os.getenv("SEND_BACKOFF_MAX", "60"))
+    DEAD_LETTER_FILE = os.getenv("DEAD_LETTER_FILE", "logs/dead_letter.jsonl").strip()
+
+    # true = asyncio-Kern (bot_async.py): ein Event-Loop statt Worker-Threads
+    ASYNC_CORE = os.getenv("ASYNC_CORE", "false").lower() == "true"
+    # >0 = Antwortsuche/LLM in so vielen Handler-Prozessen (handler_procs.py); 0 = im Empfangsprozess
+    HANDLER_PROCS = int(os.getenv("HANDLER_PROCS", "0"))
+    # Worker-Threads für FIXED-Antworten (fast) samt Queue-Länge pro Thread
+    FAST_WORKERS = int(os.getenv("FAST_WORKERS", "1"))
+    WORKER_QUEUE = int(os.getenv("WORKER_QUEUE", "32"))
+    # LLM-Scheduler: parallele Generierungen, Warteschlange, Antwort-Deadline (s)
+    LLM_WORKERS = int(os.getenv("LLM_WORKERS", "1"))
+    LLM_QUEUE = int(os.getenv("LLM_QUEUE", "8"))
+    LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "90"))
+    # LLM-Antworten satzweise senden, sobald der erste Satz fertig ist
+    STREAM_REPLIES = os.getenv("STREAM_REPLIES", "false").lower() == "true"
+    STREAM_MIN_INTERVAL = float(os.getenv("STREAM_MIN_INTERVAL", "3.0"))
+    STREAM_PLACEHOLDER = os.getenv("STREAM_PLACEHOLDER", "").strip()
 
     USE_LLM = os.getenv("USE_LLM", "false").lower() == "true"
     LLM_MODEL = os.getenv("LLM_MODEL", "mistral:instruct").strip()
     LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "300"))
+    # "http" = Ollama-API mit Keep-Alive + Streaming, "cli" = `ollama run` pro Frage
+    LLM_BACKEND = os.getenv("LLM_BACKEND", "http").strip().lower()
+    OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434").strip()
+    OLLAMA_BIN = os.getenv("OLLAMA_BIN", "ollama").strip()
+    # wie lange Ollama das Modell nach einer Anfrage geladen hält
+    LLM_KEEP_ALIVE = os.getenv("LLM_KEEP_ALIVE", "30m").strip()
+
+    # Persistente Dedupe-DB (SQLite); leer = nur im Speicher
+    DEDUP_DB = os.getenv("DEDUP_DB", "logs/dedup.sqlite3").strip()
+    DEDUP_TTL = int(os.getenv("DEDUP_TTL", str(12*3600)))
+    DEDUP_MAX = int(os.getenv("DEDUP_MAX", "1000000"))
+
+    # Journal angenommener Fragen/offener Antworten für Wiederaufnahme nach Absturz (leer = aus)
+    JOURNAL_DB = os.getenv("JOURNAL_DB", "logs/journal.sqlite3").strip()
+    JOURNAL_FLUSH = float(os.getenv("JOURNAL_FLUSH", "0.05"))
+    # Offenes, das älter ist, wird beim Start nicht mehr nachgeholt; Erledigtes wird nach RETAIN gelöscht
+    JOURNAL_MAX_AGE = int(os.getenv("JOURNAL_MAX_AGE", "3600"))
+    JOURNAL_RETAIN = int(os.getenv("JOURNAL_RETAIN", str(24*3600)))
+
+    # Retrieval-Stufe über FIXED_RESPONSES (Ähnlichkeit statt Teilstring)
+    RETRIEVAL = os.getenv("RETRIEVAL", "true").lower() == "true"
+    RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+    # ab diesem Score direkt die FIXED-Antwort, ab CONTEXT als Kontext fürs LLM
+    RETRIEVAL_ANSWER = float(os.getenv("RETRIEVAL_ANSWER", "0.35"))
+    RETRIEVAL_CONTEXT = float(os.getenv("RETRIEVAL_CONTEXT", "0.15"))
+    # Token-Budget für FIXED-Kontext im LLM-Prompt
+    RAG_MAX_TOKENS = int(os.getenv("RAG_MAX_TOKENS", "400"))
+
+    # Antwort-Cache für LLM-Antworten (0 = aus)
+    ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+    ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", str(6*3600)))
+    ANSWER_CACHE_BYTES = int(os.getenv("ANSWER_CACHE_BYTES", "1000000"))
+    # Mindest-Ähnlichkeit (Trigramm-Jaccard, gleiches Fragewort) für Umformulierungen; 0 = nur exakt
+    ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))
 
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
     LOG_FILE = os.getenv("LOG_FILE", "logs/borgo-bot.log")
+    # Format der Logdatei: json (eine JSON-Zeile pro Eintrag) oder text
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json").strip().lower()
+    # Bei LOG_LEVEL=DEBUG nur jeden n-ten DEBUG-Eintrag pro Codestelle schreiben (1 = alle)
+    LOG_DEBUG_SAMPLE = int(os.getenv("LOG_DEBUG_SAMPLE", "10"))
+
+    # Prometheus-Metriken: HTTP-Port für /metrics (0 = aus) und/oder Textfile
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1").strip()
+    METRICS_FILE = os.getenv("METRICS_FILE", "").strip()
 
     # 👉 Hier wichtig: FIXED_FILE wird aus der .env gelesen
     FIXED_FILE = str(Path(os.getenv("FIXED_FILE", "FIXED_RESPONSES.txt")).expanduser().resolve())
+    # Sekunden zwischen zwei Änderungsprüfungen der FIXED_FILE
+    FIXED_TTL = float(os.getenv("FIXED_TTL", "5.0"))
+    # Vorkompilierten Snapshot (<FIXED_FILE>.snapshot) lesen/schreiben
+    FIXED_SNAPSHOT = os.getenv("FIXED_SNAPSHOT", "true").lower() == "true"
 
+    # signal-cli-Aufruf (auch "python3 bench/fake_signal_cli.py" für lokale Tests)
+    SIGNAL_CLI = os.getenv("SIGNAL_CLI", "signal-cli").strip()
+    # true = Senden über eine langlebige JSON-RPC-Verbindung statt JVM pro Nachricht
     DAEMON_MODE = os.getenv("DAEMON_MODE", "false").lower() == "true"
+    # Optional: Socket eines bereits laufenden `signal-cli daemon --socket …`
+    SIGNAL_SOCKET = os.getenv("SIGNAL_SOCKET", "").strip()
+    # Byte-Vorfilter: irrelevante Envelopes (Quittungen, fremde Gruppen, ohne Trigger) nicht dekodieren
+    PREFILTER = os.getenv("PREFILTER", "true").lower() == "true"
 
     @staticmethod
     def validate():
         missing = []
-        if not Config.SIGNAL_NUMBER:
-            missing.append("SIGNAL_NUMBER")
-        if not Config.SIGNAL_GROUP_ID:
-            missing.append("SIGNAL_GROUP_ID")
+        if Config.TENANTS_FILE:
+            if not Path(Config.TENANTS_FILE).is_file():
+                missing.append(f"TENANTS_FILE ({Config.TENANTS_FILE} nicht gefunden)")
+        else:
+            if not Config.SIGNAL_NUMBER:
+                missing.append("SIGNAL_NUMBER")
+            if not Config.SIGNAL_GROUP_ID:
+                missing.append("SIGNAL_GROUP_ID")
         if missing:
-            raise ValueError(f"Missing required env vars: {', '.join(missing)}")
\ No newline at end of file
+            raise ValueError(f"Missing required env vars: {', '.join(missing)}")
+        if Config.HANDLER_PROCS > 0 and Config.ASYNC_CORE:
+            raise ValueError("HANDLER_PROCS geht nur mit dem Thread-Kern (ASYNC_CORE=false)")
+        if Config.ASYNC_CORE and sys.version_info < (3, 11):
+            raise ValueError("ASYNC_CORE braucht Python 3.11+ (asyncio.timeout)")
\ No newline at end of file
@@ -0,0 +1,166 @@
+import os, time, sqlite3, threading, logging
+from utils import TTLCache
+log = logging.getLogger("borgo")
+
+class SQLiteDedupStore:
+    """
+    Persistenter Dedupe-Speicher (SQLite, WAL) mit derselben Schnittstelle wie
+    utils.TTLCache (`add`, `in`). Überlebt Neustarts, damit der von signal-cli
+    erneut zugestellte Rückstau nicht doppelt beantwortet wird.
+
+    - neue IDs werden gesammelt und in Batches committed (`batch` / `flush_interval`)
+    - ein kleiner TTLCache hält die jüngsten IDs im Speicher (Hot-Path ohne SQL)
+    - `compact()` löscht abgelaufene Einträge und begrenzt die Tabelle auf `maxrows`
+    - `writer=True`: Commits und Kompaktierung laufen in einem eigenen Thread,
+      `add`/`in` machen dann kein Schreib-SQL (asyncio-Kern: Event-Loop bleibt frei)
+    """
+    def __init__(self, path, ttl=12*3600, maxrows=1_000_000, batch=256,
+                 flush_interval=1.0, hot=4096, compact_interval=600, writer=False):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path, self.ttl, self.maxrows = path, ttl, maxrows
+        self.batch, self.flush_interval, self.compact_interval = batch, flush_interval, compact_interval
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._writing = {}   # vom Schreiber-Thread gerade committet
+        self._hot = TTLCache(hot, ttl)
+        self.hits = self.misses = 0
+        self._last_flush = self._last_compact = time.monotonic()
+        self._db = self._connect()
+        self._db.execute("CREATE TABLE IF NOT EXISTS seen (mid TEXT PRIMARY KEY, ts REAL NOT NULL) WITHOUT ROWID")
+        self._db.execute("CREATE INDEX IF NOT EXISTS seen_ts ON seen(ts)")
+        # mit Schreiber-Thread eigene Verbindung zum Schreiben (WAL: Lesen blockiert nicht)
+        self._wdb = self._connect() if writer else self._db
+        self._writer = None
+        self.compact()
+        if writer:
+            self._wlock = threading.Lock()
+            self._wake = threading.Event()
+            self._closed = False
+            self._writer = threading.Thread(target=self._write_loop, name="dedup-writer", daemon=True)
+            self._writer.start()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("PRAGMA cache_size=-2000")   # max. ~2 MB Page-Cache
+        return db
+
+    def add(self, key):
+        with self._lock:
+            self._pending[key] = time.time()
+            self._hot.add(key)
+            self._maybe_flush()
+
+    def __contains__(self, key):
+        if key in self._hot:
+            self.hits += 1
+            return True
+        with self._lock:
+            if key in self._pending or key in self._writing:
+                self.hits += 1
+                return True
+            self._maybe_flush()
+            row = self._db.execute("SELECT ts FROM seen WHERE mid=?", (key,)).fetchone()
+        found = bool(row) and time.time() - row[0] <= self.ttl
+        if found: self.hits += 1
+        else: self.misses += 1
+        return found
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "pending": len(self._pending) + len(self._writing),
+                "hot": self._hot.stats()}
+
+    def __len__(self):
+        self.flush()
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def _maybe_flush(self):
+        if self._writer is not None:
+            if len(self._pending) >= self.batch:
+                self._wake.set()   # committet wird im Schreiber-Thread, nicht beim Aufrufer
+            return
+        now = time.monotonic()
+        if len(self._pending) >= self.batch or (self._pending and now - self._last_flush >= self.flush_interval):
+            self._flush()
+        if now - self._last_compact >= self.compact_interval:
+            self._compact()
+
+    def _flush(self):
+        """Ohne Schreiber-Thread; Aufrufer hält self._lock."""
+        self._last_flush = time.monotonic()
+        rows, self._pending = self._pending, {}
+        self._commit(rows)
+
+    def _commit(self, rows):
+        if not rows:
+            return
+        self._wdb.execute("BEGIN")
+        try:
+            self._wdb.executemany("INSERT OR REPLACE INTO seen (mid, ts) VALUES (?, ?)", list(rows.items()))
+            self._wdb.execute("COMMIT")
+        except sqlite3.Error as e:
+            self._wdb.execute("ROLLBACK")
+            log.error(f"[DEDUP] Batch ({len(rows)}) nicht gespeichert: {e}")
+
+    def _compact(self):
+        self._last_compact = time.monotonic()
+        cur = self._wdb.execute("DELETE FROM seen WHERE ts < ?", (time.time() - self.ttl,))
+        expired = cur.rowcount
+        over = self._wdb.execute("SELECT COUNT(*) FROM seen").fetchone()[0] - self.maxrows
+        if over > 0:
+            self._wdb.execute("DELETE FROM seen WHERE mid IN (SELECT mid FROM seen ORDER BY ts LIMIT ?)", (over,))
+        if expired or over > 0:
+            log.info(f"[DEDUP] compact: {expired} abgelaufen, {max(over, 0)} über Limit entfernt")
+
+    def _write_loop(self):
+        """Schreiber-Thread (writer=True, asyncio-Kern): Batches und Kompaktierung abseits des Event-Loops."""
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.monotonic() - self._last_compact >= self.compact_interval:
+                    self.compact()
+            except sqlite3.Error:
+                log.exception("[DEDUP] Schreiber-Thread")
+
+    def flush(self):
+        if self._writer is None:
+            with self._lock:
+                self._flush()
+            return
+        with self._wlock:
+            # nur der Tausch hält self._lock; `in` prüft solange auch _writing
+            with self._lock:
+                self._last_flush = time.monotonic()
+                self._writing, self._pending = self._pending, {}
+            try:
+                self._commit(self._writing)
+            finally:
+                with self._lock:
+                    self._writing = {}
+
+    def compact(self):
+        if self._writer is None:
+            with self._lock:
+                self._flush()
+                self._compact()
+            return
+        self.flush()
+        with self._wlock:
+            self._compact()
+
+    def close(self):
+        if self._writer is not None:
+            self._closed = True
+            self._wake.set()
+            self._writer.join()
+            self._writer = None
+        with self._lock:
+            self._flush()
+            if self._wdb is not self._db:
+                self._wdb.close()
+            self._db.close()
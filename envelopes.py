@@ -0,0 +1,62 @@
+import re, json
+from metrics import counter
+
+try:
+    import orjson   # optional: deutlich schnellerer Decoder, gleiche Ergebnisse
+    loads = orjson.loads
+except ImportError:
+    orjson = None
+    loads = json.loads
+
+# Zeilenlimit der asyncio-StreamReader: Envelopes mit Anhängen/Zitaten können groß werden
+LINE_LIMIT = 16 * 1024 * 1024
+
+_GROUP_ID_RE = re.compile(rb'"groupId"\s*:\s*"([^"]*)"')
+
+class EnvelopeFilter:
+    """
+    Billiger Byte-Vorfilter vor dem vollständigen JSON-Decode. Verwirft nur Zeilen,
+    die sicher keine Bot-Anfrage sind: kein Trigger, falsche Gruppe, keine
+    data-/syncMessage (Empfangsbestätigungen, Tipp-Indikatoren). Im Zweifel lässt
+    er durch – die eigentlichen Filter in receive_loop bleiben unverändert.
+    Die selektivste Prüfung (Trigger) kommt zuerst.
+    """
+    __slots__ = ("trigger", "groups", "group_set", "rejected")
+
+    def __init__(self, group_id="*", trigger="!Bot"):
+        """`group_id`: eine groupId, eine Liste davon (mehrere Tenants) oder "*"."""
+        # bytes-Regex ignoriert nur ASCII-Groß/Kleinschreibung; andere Trigger nicht vorfiltern
+        self.trigger = None
+        if trigger and trigger.isascii():
+            self.trigger = re.compile(re.escape(trigger.encode("ascii")), re.IGNORECASE).search
+        self.groups = None
+        ids = [group_id] if isinstance(group_id, str) else list(group_id)
+        if ids and "*" not in ids:
+            groups = []
+            for gid in ids:
+                g = gid.encode("utf-8")
+                groups.append(g)
+                if b"/" in g:
+                    groups.append(g.replace(b"/", b"\\/"))   # JSON darf "/" als "\/" schreiben (Base64-Gruppen-IDs)
+            self.groups = tuple(groups)
+        # viele Gruppen (Tenants): groupId einmal herausschneiden und im Set nachsehen statt n Teilstring-Suchen
+        self.group_set = frozenset(self.groups) if self.groups and len(self.groups) > 4 else None
+        self.rejected = 0   # nur vom Empfangs-Thread geschrieben; Export beim Scrape
+        counter("borgo_prefiltered_total", "Vor dem JSON-Decode verworfene Zeilen", fn=lambda: self.rejected)
+
+    def __call__(self, raw: bytes) -> bool:
+        if self.trigger is not None and self.trigger(raw) is None:
+            self.rejected += 1
+            return False
+        if self.group_set is not None:
+            m = _GROUP_ID_RE.search(raw)
+            if m is None or m.group(1) not in self.group_set:
+                self.rejected += 1
+                return False
+        elif self.groups is not None and not any(g in raw for g in self.groups):
+            self.rejected += 1
+            return False
+        if b'"dataMessage"' not in raw and b'"syncMessage"' not in raw:
+            self.rejected += 1
+            return False
+        return True
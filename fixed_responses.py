@@ -2,69 +2,278 @@ import os
 import re
 import time
 import ast
+import stat
+import marshal
+import hashlib
 import logging
-from typing import Dict, Optional
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
 from pathlib import Path
 from config import Config
+from retrieval import VectorIndex
 
 log = logging.getLogger("borgo")
 
-_DICT_RE = re.compile(r"=\s*({.*})\s*\Z", re.DOTALL)
+# Kopfzeile "FIXED_RESPONSES: dict[str, str] = {" – nur der Anfang wird per Regex gesucht
+_HEAD_RE = re.compile(r"^[ \t]*\w+[ \t]*(?::[^=\n]*)?=[ \t]*(?={)", re.M)
+_SNAPSHOT_VERSION = 2
+
+class FixedFileError(ValueError):
+    pass
+
+def parse_fixed_text(txt: str) -> Dict[str, str]:
+    """
+    Parst den Inhalt der FIXED_FILE (ein einziges Dict-Literal) und validiert ihn.
+    Wirft FixedFileError mit Zeilennummer, damit Tippfehler im Editor auffallen.
+    """
+    m = _HEAD_RE.search(txt)
+    if not m:
+        raise FixedFileError("Kein Dict in FIXED_FILE gefunden.")
+    start, end = m.end(), txt.rfind("}")
+    if end < start or txt[end + 1:].strip():
+        raise FixedFileError("Dict in FIXED_FILE ist nicht abgeschlossen.")
+    line0 = txt.count("\n", 0, start)
+    try:
+        node = ast.parse(txt[start:end + 1], mode="eval").body
+    except SyntaxError as e:
+        raise FixedFileError(f"Syntaxfehler in Zeile {line0 + (e.lineno or 1)}: {e.msg}") from None
+    if not isinstance(node, ast.Dict):
+        raise FixedFileError("FIXED_FILE enthält kein dict.")
+
+    data: Dict[str, str] = {}
+    for k_node, v_node in zip(node.keys, node.values):
+        line = line0 + getattr(k_node or v_node, "lineno", 1)
+        try:
+            k = ast.literal_eval(k_node) if k_node is not None else None
+            v = ast.literal_eval(v_node)
+        except ValueError:
+            raise FixedFileError(f"Zeile {line}: nur Text-Literale erlaubt") from None
+        if not isinstance(k, str) or not k.strip():
+            raise FixedFileError(f"Zeile {line}: Schlüssel muss ein nicht-leerer Text sein")
+        if not isinstance(v, str):
+            raise FixedFileError(f"Zeile {line}: Antwort zu {k!r} muss ein Text sein")
+        key = k.strip().lower()
+        if key in data:
+            log.warning(f"[FIXED] Zeile {line}: Schlüssel {key!r} doppelt – letzter gewinnt")
+        if not v.strip():
+            log.warning(f"[FIXED] Zeile {line}: leere Antwort für {key!r}")
+        data[key] = v
+    return data
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick-Automat über alle FIXED-Keys.
+    Ein Durchlauf über den Text findet alle Treffer; gewinnt der längste Key,
+    bei Gleichstand der zuerst in der Datei stehende (deterministisch).
+    """
+    def __init__(self, keys: List[str]):
+        self.keys = list(keys)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._best: List[int] = [-1]   # bester Key-Index, der in diesem Knoten endet (inkl. Fail-Kette)
+        for idx, key in enumerate(self.keys):
+            self._insert(key, idx)
+        self._link()
+
+    def to_state(self) -> tuple:
+        return (self.keys, self._goto, self._fail, self._best)
+
+    @classmethod
+    def from_state(cls, state: tuple) -> "KeywordAutomaton":
+        obj = cls.__new__(cls)
+        obj.keys, obj._goto, obj._fail, obj._best = state
+        return obj
+
+    def _better(self, a: int, b: int) -> int:
+        if a < 0: return b
+        if b < 0: return a
+        la, lb = len(self.keys[a]), len(self.keys[b])
+        if la != lb:
+            return a if la > lb else b
+        return min(a, b)
+
+    def _insert(self, key: str, idx: int):
+        if not key:
+            return
+        node = 0
+        for ch in key:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(-1)
+            node = nxt
+        self._best[node] = self._better(self._best[node], idx)
+
+    def _link(self):
+        # BFS: Fail-Links setzen und beste Ausgabe entlang der Fail-Kette erben
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]; head += 1
+            for ch, nxt in self._goto[node].items():
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                cand = self._goto[f].get(ch, 0)
+                self._fail[nxt] = cand if cand != nxt else 0
+                self._best[nxt] = self._better(self._best[nxt], self._best[self._fail[nxt]])
+                queue.append(nxt)
+
+    def search(self, text: str) -> Optional[str]:
+        goto, fail, best = self._goto, self._fail, self._best
+        node, found = 0, -1
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            b = best[node]
+            if b >= 0 and b != found:
+                found = self._better(found, b)
+        return self.keys[found] if found >= 0 else None
+
+class _Snapshot(NamedTuple):
+    entries: Dict[str, str]
+    automaton: KeywordAutomaton
+    stamp: Optional[Tuple[int, int]]   # (mtime_ns, size) der geladenen Datei
+    sha: str = ""                      # sha256 des Dateiinhalts
+    vectors: Optional[VectorIndex] = None
 
 class FixedResponsesLoader:
-    def __init__(self, path: str, ttl: float = 5.0):
+    """
+    Lookups lesen nur den aktuellen In-Memory-Snapshot. Ob die Datei neu
+    geladen werden muss, wird höchstens alle `ttl` Sekunden per stat() geprüft –
+    entweder beim Lookup oder (nach start_watcher()) im Hintergrund-Thread.
+    Ein Reload ersetzt den Snapshot atomar durch eine einzige Zuweisung.
+    Geparste Daten samt Lookup-Index landen (marshal, per Inhalts-Hash
+    verschlüsselt) in `<FIXED_FILE>.snapshot`; unveränderte Dateien werden
+    bei Neustart/Reload nicht erneut geparst.
+    """
+    def __init__(self, path: str, ttl: float = 5.0, snapshot: bool = True):
         self.path = str(Path(path).expanduser().resolve())
         self.ttl = ttl
-        self._cache: Dict[str, str] = {,
-    "canary":"M4_CANARY_2025-09-21"
-}
+        self.snapshot_path = self.path + ".snapshot" if snapshot else None
+        self._snap = _Snapshot({}, KeywordAutomaton([]), None, "", VectorIndex.build({}))
         self._last_load_ts: float = 0.0
-        self._last_mtime: float = -1.0
+        self._next_check: float = 0.0
+        self._bad_stamp: Optional[Tuple[int, int]] = None   # zuletzt fehlerhafte Dateiversion
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
 
-    def _needs_reload(self) -> bool:
+    def _read_snapshot(self, sha: str) -> Optional[_Snapshot]:
+        if not self.snapshot_path:
+            return None
         try:
-            mtime = os.path.getmtime(self.path)
-        except OSError:
-            return False
-        return (mtime != self._last_mtime)
-
-    def _parse_file(self) -> Dict[str, str]:
-        with open(self.path, "r", encoding="utf-8") as f:
-            txt = f.read()
-        m = _DICT_RE.search(txt)
-        if not m:
-            raise ValueError("Kein Dict in FIXED_FILE gefunden.")
-        data = ast.literal_eval(m.group(1))
-        if not isinstance(data, dict):
-            raise ValueError("FIXED_FILE enthält kein dict.")
-        return {str(k).lower(): str(v) for k, v in data.items(),
-    "canary":"M4_CANARY_2025-09-21"
-}
-
-    def maybe_reload(self):
-        if not os.path.isfile(self.path):
-            if not self._cache:
-                log.warning(f"[FIXED] Datei nicht gefunden: {self.path}")
-            return
-        if not self._needs_reload():
+            with open(self.snapshot_path, "rb") as f:
+                blob = marshal.load(f)
+            if blob.get("v") != _SNAPSHOT_VERSION or blob.get("sha") != sha:
+                return None
+            return _Snapshot(blob["entries"], KeywordAutomaton.from_state(blob["index"]), None, sha,
+                             VectorIndex.from_state(blob["vectors"]))
+        except (OSError, EOFError, ValueError, TypeError, KeyError, AttributeError):
+            return None
+
+    def _write_snapshot(self, snap: _Snapshot):
+        if not self.snapshot_path:
             return
+        tmp = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        blob = {"v": _SNAPSHOT_VERSION, "sha": snap.sha,
+                "entries": snap.entries, "index": snap.automaton.to_state(),
+                "vectors": snap.vectors.to_state()}
         try:
-            mtime = os.path.getmtime(self.path)
-            data = self._parse_file()
-            self._cache = data
-            self._last_mtime = mtime
-            self._last_load_ts = time.time()
-            log.info(f"[FIXED] geladen: {self.path} ({len(self._cache)} Einträge)")
-        except Exception as e:
-            log.error(f"[FIXED] Fehler beim Laden: {e}")
+            with open(tmp, "wb") as f:
+                marshal.dump(blob, f)
+            os.replace(tmp, self.snapshot_path)
+        except OSError as e:
+            log.debug(f"[FIXED] Snapshot nicht geschrieben: {e}")
+            try: os.unlink(tmp)
+            except OSError: pass
+
+    def _build(self, raw: bytes, stamp: Tuple[int, int]) -> Tuple[_Snapshot, str]:
+        sha = hashlib.sha256(raw).hexdigest()
+        if sha == self._snap.sha:
+            return self._snap._replace(stamp=stamp), "unverändert"
+        snap = self._read_snapshot(sha)
+        if snap is not None:
+            return snap._replace(stamp=stamp), "snapshot"
+        data = parse_fixed_text(raw.decode("utf-8"))
+        snap = _Snapshot(data, KeywordAutomaton(list(data)), stamp, sha, VectorIndex.build(data))
+        self._write_snapshot(snap)
+        return snap, "geparst"
+
+    def maybe_reload(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return
+        self._next_check = now + self.ttl
+        with self._reload_lock:
+            try:
+                st = os.stat(self.path)
+            except OSError:
+                st = None
+            if st is None or not stat.S_ISREG(st.st_mode):
+                if self._bad_stamp != (-1, -1):
+                    log.warning(f"[FIXED] Datei nicht gefunden: {self.path}")
+                    self._bad_stamp = (-1, -1)
+                return
+            stamp = (st.st_mtime_ns, st.st_size)
+            if stamp == self._snap.stamp or stamp == self._bad_stamp:
+                return
+            try:
+                with open(self.path, "rb") as f:
+                    raw = f.read()
+                snap, how = self._build(raw, stamp)
+                self._snap = snap
+                self._bad_stamp = None
+                self._last_load_ts = time.time()
+                log.info(f"[FIXED] geladen ({how}): {self.path} ({len(snap.entries)} Einträge)")
+            except Exception as e:
+                self._bad_stamp = stamp
+                log.error(f"[FIXED] Fehler beim Laden, behalte {len(self._snap.entries)} Einträge: {e}")
+
+    def start_watcher(self):
+        """Startet den Hintergrund-Reload; Lookups machen danach keine Syscalls mehr."""
+        if self._watcher is not None:
+            return
+        self.maybe_reload(force=True)
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="fixed-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=self.ttl + 1)
+            self._watcher = None
+
+    def _watch(self):
+        while not self._stop.wait(self.ttl):
+            self.maybe_reload(force=True)
+
+    @property
+    def entries(self) -> Dict[str, str]:
+        return self._snap.entries
+
+    @property
+    def version(self) -> str:
+        """Inhalts-Hash der geladenen Datei (ändert sich bei jedem echten Reload)."""
+        return self._snap.sha
+
+    def search(self, text: str, k: int = 3) -> List[Tuple[str, float]]:
+        """Ähnlichkeitssuche (Retrieval-Stufe) über alle Einträge: [(key, score)]."""
+        if self._watcher is None:
+            self.maybe_reload()
+        return self._snap.vectors.search(text or "", k)
 
     def lookup(self, text: str) -> Optional[str]:
-        self.maybe_reload()
-        t = (text or "").lower()
-        for key, val in self._cache.items():
-            if key in t:
-                return val
-        return None
-
-FIXED_LOADER = FixedResponsesLoader(Config.FIXED_FILE)
-FALLBACK = "Ich habe dazu keine fixe Antwort. Sende `!bot hilfe` oder aktiviere LLM."
\ No newline at end of file
+        if self._watcher is None:
+            self.maybe_reload()
+        snap = self._snap
+        key = snap.automaton.search((text or "").lower())
+        return snap.entries.get(key) if key is not None else None
+
+FIXED_LOADER = FixedResponsesLoader(Config.FIXED_FILE, ttl=Config.FIXED_TTL, snapshot=Config.FIXED_SNAPSHOT)
+FALLBACK = "Ich habe dazu keine fixe Antwort. Sende `!bot hilfe` oder aktiviere LLM."
@@ -0,0 +1,241 @@
+"""
+Aufteilung auf mehrere Prozesse (HANDLER_PROCS > 0):
+
+    Empfangsprozess (bot_v2.py)              Handler-Prozesse (dieses Modul)
+    signal-cli, Dedup, Filter, Journal  -->  FIXED-Suche, Retrieval, Cache, LLM
+    Outbox (einziger Sender)            <--  Antworten + „erledigt“
+
+Die Prozesse reden über stdin/stdout (eine JSON-Zeile pro Job bzw. Meldung).
+Dedup und Journal gibt es nur im Empfangsprozess, gesendet wird nur von dort.
+Jobs derselben Konversation (Gruppe + Absender) gehen immer an denselben
+Handler, so bleibt die Reihenfolge pro Konversation wie beim KeyedWorkerPool
+(je Weg: FIXED-Antworten können frühere LLM-Antworten überholen, siehe make_dispatch).
+`received` (perf_counter) und Deadlines (monotonic) sind unter Linux beide
+CLOCK_MONOTONIC und damit prozessübergreifend vergleichbar.
+"""
+import os, sys, json, time, zlib, signal, threading, subprocess, logging
+from collections import OrderedDict
+log = logging.getLogger("borgo")
+
+def handler_log_file(path: str, index: int) -> str:
+    """logs/borgo-bot.log -> logs/borgo-bot.h1.log"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.h{index}{ext}"
+
+class HandlerProcesses:
+    """
+    Startet `procs` Handler-Prozesse und verteilt Jobs per Schlüssel (crc32) auf sie.
+    Ein Lese-Thread pro Prozess ruft `on_reply(group_id, text, received, mid)` bzw.
+    `on_handled(mid)` – hier also send_reply/_handled des Empfangsprozesses.
+    Jeder Job bleibt bis zu seinem „erledigt“ gemerkt (mid -> Zeile). Stirbt ein
+    Handler, wird er neu gestartet und bekommt seine offenen Jobs noch einmal;
+    was in der Zwischenzeit eingereicht wird, wartet mit (schon gesendete
+    Streaming-Teile können dabei doppelt kommen). Ein Job, bei dem der Handler
+    `max_attempts`-mal stirbt, wird aufgegeben (als erledigt gemeldet).
+    """
+    max_attempts = 3
+
+    def __init__(self, procs, on_reply, on_handled, log_file=""):
+        self.on_reply, self.on_handled, self.log_file = on_reply, on_handled, log_file
+        n = max(1, procs)
+        self._locks = [threading.Lock() for _ in range(n)]    # nur _pending, nie während eines Writes
+        self._wlocks = [threading.Lock() for _ in range(n)]   # stdin des Handlers, Neustart
+        self._procs = [None] * n
+        self._readers = [None] * n
+        self._pending = [OrderedDict() for _ in range(n)]   # mid -> [Zeile, Versuche]
+        self._stopping = False
+        self._ready = threading.Semaphore(0)
+        self.submitted = self.restarts = 0
+        for i in range(n):
+            with self._wlocks[i]:
+                self._spawn(i)
+
+    def _spawn(self, i):
+        env = dict(os.environ, HANDLER_PROCS="0")
+        if self.log_file:
+            env["LOG_FILE"] = handler_log_file(self.log_file, i + 1)
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__)], stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, env=env)
+        log.info(f"[PROCS] Handler h{i + 1} gestartet (pid {proc.pid})")
+        self._procs[i] = proc
+        self._readers[i] = threading.Thread(target=self._read, args=(i, proc), name=f"handler-h{i + 1}", daemon=True)
+        self._readers[i].start()
+
+    def submit(self, key, conv, payload, received, mid):
+        i = zlib.crc32(str(key).encode("utf-8")) % len(self._procs)
+        line = json.dumps({"conv": conv, "payload": payload, "received": received, "mid": mid},
+                          ensure_ascii=False).encode("utf-8") + b"\n"
+        with self._wlocks[i]:
+            # unter dem Write-Lock merken: ein Neustart dazwischen schickt ihn nicht doppelt
+            with self._locks[i]:
+                job = self._pending[i][mid] = [line, 0]
+                self.submitted += 1
+            self._write(i, job)
+
+    def _write(self, i, job) -> bool:
+        """
+        Aufrufer hält self._wlocks[i], aber nicht self._locks[i]: blockiert das Schreiben
+        (volle Pipe), muss der Lese-Thread „erledigt“ trotzdem austragen können, sonst
+        warten Empfang, Lese-Thread und Handler aufeinander. Schlägt es fehl, bleibt der Job gemerkt.
+        """
+        try:
+            # volle Pipe blockiert den Empfang (Backpressure wie beim KeyedWorkerPool)
+            self._procs[i].stdin.write(job[0])
+            self._procs[i].stdin.flush()
+        except OSError as e:
+            log.warning("[PROCS] Handler h%d nicht erreichbar (%s) – Job wartet auf den Neustart", i + 1, e)
+            return False
+        with self._locks[i]:
+            job[1] += 1
+        return True
+
+    def _read(self, i, proc):
+        started = time.monotonic()
+        for line in proc.stdout:
+            try:
+                msg = json.loads(line)
+                if msg["op"] == "reply":
+                    self.on_reply(msg["group"], msg["text"], msg["received"], msg["mid"])
+                elif msg["op"] == "ready":
+                    self._ready.release()
+                else:
+                    with self._locks[i]:
+                        self._pending[i].pop(msg["mid"], None)
+                    self.on_handled(msg["mid"])
+            except Exception:
+                log.exception(f"[PROCS] Meldung von h{i + 1} nicht verarbeitet: {line[:200]!r}")
+        rc = proc.wait()
+        if self._stopping:
+            return
+        log.error(f"[PROCS] Handler h{i + 1} beendet (rc={rc}) – wird neu gestartet")
+        if time.monotonic() - started < 10:
+            time.sleep(5)   # stirbt direkt beim Start (Konfiguration?) – nicht im Kreis starten
+        with self._wlocks[i]:
+            if self._stopping or self._procs[i] is not proc:
+                return
+            self.restarts += 1
+            self._spawn(i)
+            self._resend(i)
+
+    def _resend(self, i):
+        """Offene Jobs an den neuen Handler; Aufrufer hält self._wlocks[i]."""
+        given_up, resend = [], []
+        with self._locks[i]:
+            pending = self._pending[i]
+            for mid, job in list(pending.items()):
+                if job[1] >= self.max_attempts:
+                    del pending[mid]
+                    given_up.append((mid, job[1]))
+                else:
+                    resend.append(job)
+        for mid, attempts in given_up:
+            log.error(f"[PROCS] Frage {mid}: Handler {attempts}x gestorben – aufgegeben")
+            self.on_handled(mid)   # eine kaputte Frage nicht endlos wiederholen
+        if resend:
+            log.warning(f"[PROCS] {len(resend)} offene Job(s) erneut an h{i + 1}")
+        for job in resend:
+            self._write(i, job)
+
+    def wait_ready(self, timeout=30.0) -> bool:
+        """Wartet, bis alle Handler ihre Module und FIXED-Dateien geladen haben."""
+        deadline = time.monotonic() + timeout
+        for _ in self._procs:
+            if not self._ready.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                log.warning(f"[PROCS] Handler nach {timeout:.0f}s noch nicht bereit – Jobs warten in der Pipe")
+                return False
+        return True
+
+    def depth(self):
+        """Jobs, die an Handler gegeben, aber noch nicht erledigt sind."""
+        return sum(len(p) for p in self._pending)
+
+    def stats(self):
+        return {"procs": len(self._procs), "submitted": self.submitted, "in_flight": self.depth(),
+                "restarts": self.restarts}
+
+    def stop(self, timeout=None):
+        """stdin schließen: Handler arbeiten Eingereihtes ab und beenden sich; Antworten kommen noch an."""
+        self._stopping = True
+        for i, proc in enumerate(self._procs):
+            with self._wlocks[i]:
+                try:
+                    proc.stdin.close()
+                except OSError:
+                    pass
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for i, proc in enumerate(self._procs):
+            try:
+                proc.wait(None if deadline is None else max(0.1, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                log.warning(f"[PROCS] Handler h{i + 1} reagiert nicht – kill")
+                proc.kill()
+                proc.wait()
+        for t in self._readers:
+            t.join(timeout=5)
+
+class ReplyPipe:
+    """
+    Im Handler-Prozess Ersatz für OUTBOX und JOURNAL von bot_v2: send_reply und
+    _handled laufen unverändert, ihre Aufrufe gehen als JSON-Zeilen an den
+    Empfangsprozess (der dann journalisiert und über seine Outbox sendet).
+    """
+    def __init__(self, out):
+        self._out = out
+        self._lock = threading.Lock()   # LLM-Worker-Threads schreiben gleichzeitig
+
+    def _write(self, msg):
+        line = json.dumps(msg, ensure_ascii=False).encode("utf-8") + b"\n"
+        with self._lock:
+            self._out.write(line)
+            self._out.flush()
+
+    def reply(self, mid, group_id, text):
+        return mid   # Journal-Ref = Frage-ID; journalisiert wird im Empfangsprozess
+
+    def put(self, group_id, text, received=None, ref=None):
+        self._write({"op": "reply", "group": group_id, "text": text, "received": received, "mid": ref})
+
+    def handled(self, mid):
+        self._write({"op": "handled", "mid": mid})
+
+    def ready(self):
+        self._write({"op": "ready"})
+
+def serve():
+    """Handler-Prozess: Jobs zeilenweise von stdin, Ende bei EOF (Empfangsprozess schließt stdin)."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)   # Strg+C gilt dem Empfangsprozess, der uns sauber beendet
+    out, sys.stdout = sys.stdout.buffer, sys.stderr  # stdout gehört dem Protokoll
+    import bot_v2 as core
+    from config import Config
+    from tenants import get_router
+    from llm_scheduler import LLMScheduler
+
+    pipe = core.OUTBOX = core.JOURNAL = ReplyPipe(out)
+    router = get_router()
+    for loader in router.loaders():
+        loader.start_watcher()
+    scheduler = LLMScheduler(core._llm_job, core._llm_expired, Config.LLM_WORKERS, Config.LLM_QUEUE)
+    # FIXED-Antworten direkt melden: Schreiben in die Pipe blockiert nicht nennenswert
+    dispatch = core.make_dispatch(lambda conv, job: core._fast_job(job), scheduler)
+    log.info(f"[PROCS] Handler bereit (pid {os.getpid()})")
+    pipe.ready()
+    try:
+        for line in sys.stdin.buffer:
+            try:
+                job = json.loads(line)
+                gid, src = job["conv"]
+            except (ValueError, KeyError, TypeError):
+                log.warning(f"[PROCS] kaputter Job: {line[:200]!r}")
+                continue
+            tenant = router.route(gid)
+            if tenant is None:   # TENANTS_FILE zwischen Empfang und Handler-Start geändert
+                core._handled(job["mid"])
+                continue
+            dispatch(tenant, (gid, src), job["payload"], job["received"], job["mid"])
+    finally:
+        scheduler.stop(timeout=Config.LLM_TIMEOUT)
+        log.info(f"[PROCS] Handler pid {os.getpid()} beendet: sched {scheduler.stats()} "
+                 f"cache {core.ANSWER_CACHE.stats()}")
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,134 @@
+import os, time, sqlite3, itertools, threading, logging
+log = logging.getLogger("borgo")
+
+class Journal:
+    """
+    Write-Ahead-Journal (SQLite, WAL, synchronous=FULL) für angenommene Fragen
+    (`inbox`) und noch nicht zugestellte Antworten (`outbox`).
+
+    - Aufrufer hängen nur an eine Liste an; ein Writer-Thread schreibt alle
+      angesammelten Einträge alle `flush_interval` Sekunden in einer Transaktion
+      (Group Commit: ein fsync für viele Nachrichten, nichts davon im Hot-Path)
+    - `recover()` liefert beim Start offene Fragen und offene Antworten
+    - erledigte Einträge werden nach `retain` Sekunden entfernt, das WAL gekürzt
+    """
+    def __init__(self, path, flush_interval=0.05, retain=24*3600, max_age=3600, compact_interval=600):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path, self.flush_interval = path, flush_interval
+        self.retain, self.max_age, self.compact_interval = retain, max_age, compact_interval
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS inbox (mid TEXT PRIMARY KEY, ts REAL NOT NULL, "
+                         "group_id TEXT, source TEXT, payload TEXT NOT NULL, done INTEGER NOT NULL DEFAULT 0)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY, mid TEXT, ts REAL NOT NULL, "
+                         "group_id TEXT, text TEXT NOT NULL, done INTEGER NOT NULL DEFAULT 0)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS inbox_open ON inbox(done, ts)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS outbox_open ON outbox(done, ts)")
+        start = self._db.execute("SELECT COALESCE(MAX(id), 0) FROM outbox").fetchone()[0] + 1
+        self._ids = itertools.count(start)
+        self._cond = threading.Condition()
+        self._ops = []
+        self._closed = False
+        self.commits = self.written = 0
+        self._last_compact = time.monotonic()
+        self._writer = threading.Thread(target=self._run, name="journal", daemon=True)
+        self._writer.start()
+
+    # ---------- Hot-Path: nur anhängen ----------
+    def _append(self, sql, args):
+        with self._cond:
+            self._ops.append((sql, args))
+            self._cond.notify()
+
+    def received(self, mid, group_id, source, payload):
+        self._append("INSERT OR IGNORE INTO inbox (mid, ts, group_id, source, payload) VALUES (?, ?, ?, ?, ?)",
+                     (mid, time.time(), group_id, source, payload))
+
+    def handled(self, mid):
+        """Alle Antworten zu `mid` stehen in der outbox (oder es gibt keine)."""
+        self._append("UPDATE inbox SET done=1 WHERE mid=?", (mid,))
+
+    def reply(self, mid, group_id, text) -> int:
+        ref = next(self._ids)
+        self._append("INSERT INTO outbox (id, mid, ts, group_id, text) VALUES (?, ?, ?, ?, ?)",
+                     (ref, mid, time.time(), group_id, text))
+        return ref
+
+    def sent(self, ref):
+        """Antwort zugestellt oder endgültig aufgegeben (dead letter)."""
+        self._append("UPDATE outbox SET done=1 WHERE id=?", (ref,))
+
+    # ---------- Writer ----------
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._ops and not self._closed:
+                    self._cond.wait(self.flush_interval)
+                ops, self._ops = self._ops, []
+                closed = self._closed
+            if ops:
+                self._commit(ops)
+                time.sleep(self.flush_interval)   # nächste Gruppe sammeln
+            if time.monotonic() - self._last_compact >= self.compact_interval:
+                self._compact()
+            if closed:
+                return
+
+    def _commit(self, ops):
+        try:
+            self._db.execute("BEGIN")
+            for sql, args in ops:
+                self._db.execute(sql, args)
+            self._db.execute("COMMIT")
+            self.commits += 1
+            self.written += len(ops)
+        except sqlite3.Error as e:
+            self._db.execute("ROLLBACK")
+            log.error(f"[JOURNAL] Gruppe ({len(ops)}) nicht gespeichert: {e}")
+
+    # ---------- Start / Wartung ----------
+    def recover(self):
+        """
+        Offene Arbeit vom letzten Lauf:
+        - Fragen ohne `handled` werden komplett neu bearbeitet; ihre bereits
+          eingereihten Antworten werden dafür verworfen
+        - offene Antworten zu erledigten Fragen werden erneut gesendet
+        Älter als `max_age` gilt als veraltet und wird nur abgeschlossen.
+        Vor dem ersten neuen Eintrag aufrufen.
+        Gibt ([(mid, group_id, source, payload)], [(ref, group_id, text)]) zurück.
+        """
+        cutoff = time.time() - self.max_age
+        db = self._db
+        db.execute("BEGIN")
+        stale = db.execute("UPDATE inbox SET done=1 WHERE done=0 AND ts < ?", (cutoff,)).rowcount
+        stale += db.execute("UPDATE outbox SET done=1 WHERE done=0 AND ts < ?", (cutoff,)).rowcount
+        db.execute("UPDATE outbox SET done=1 WHERE done=0 AND mid IN (SELECT mid FROM inbox WHERE done=0)")
+        inbox = db.execute("SELECT mid, group_id, source, payload FROM inbox WHERE done=0 ORDER BY ts").fetchall()
+        outbox = db.execute("SELECT id, group_id, text FROM outbox WHERE done=0 ORDER BY id").fetchall()
+        db.execute("COMMIT")
+        if inbox or outbox or stale:
+            log.warning(f"[JOURNAL] Wiederaufnahme: {len(inbox)} Fragen, {len(outbox)} Antworten "
+                        f"({stale} veraltet verworfen)")
+        return inbox, outbox
+
+    def _compact(self):
+        """Nur aus dem Writer-Thread (eine Verbindung, kein paralleler Zugriff)."""
+        self._last_compact = time.monotonic()
+        cutoff = time.time() - self.retain
+        n = self._db.execute("DELETE FROM inbox WHERE done=1 AND ts < ?", (cutoff,)).rowcount
+        n += self._db.execute("DELETE FROM outbox WHERE done=1 AND ts < ?", (cutoff,)).rowcount
+        self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if n:
+            log.info(f"[JOURNAL] compact: {n} erledigte Einträge entfernt")
+
+    def stats(self):
+        return {"commits": self.commits, "written": self.written, "pending": len(self._ops)}
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._writer.join()
+        self._db.close()
@@ -0,0 +1,169 @@
+import time, asyncio, threading, logging
+from collections import OrderedDict, deque
+log = logging.getLogger("borgo")
+
+_STOP = object()
+
+class _SchedulerCore:
+    """Warteschlange + Fairness; Sperren/Warten machen die Unterklassen."""
+    def __init__(self, handler, on_expired=None, concurrency=1, max_queue=8):
+        self.handler, self.on_expired = handler, on_expired
+        self.concurrency, self.max_queue = max(1, concurrency), max_queue
+        self._queues = OrderedDict()   # sender -> deque[(deadline, job)]
+        self._queued = 0
+        self._active = set()           # Absender mit laufendem Job
+        self._stopping = False
+        self.submitted = self.rejected = self.expired = self.completed = 0
+
+    def _enqueue(self, sender, job, deadline) -> bool:
+        if self._queued >= self.max_queue:
+            self.rejected += 1
+            log.warning("[SCHED] Warteschlange voll (%d/%d) – abgelehnt: %s", self._queued, self.max_queue, sender)
+            return False
+        self._queues.setdefault(sender, deque()).append((deadline, job))
+        self._queued += 1
+        self.submitted += 1
+        return True
+
+    def depth(self):
+        return self._queued
+
+    def _pop(self):
+        """Nächster Job: erster Absender in Rotationsreihenfolge, der gerade nichts laufen hat."""
+        for sender, q in self._queues.items():
+            if sender not in self._active:
+                break
+        else:
+            return None
+        deadline, job = q.popleft()
+        self._queued -= 1
+        del self._queues[sender]
+        if q:
+            self._queues[sender] = q   # wieder hinten anstellen
+        self._active.add(sender)
+        return sender, deadline, job
+
+    def _expire(self, sender, job):
+        self.expired += 1
+        log.warning("[SCHED] Deadline verstrichen – übersprungen: %s", sender)
+        if self.on_expired:
+            self.on_expired(job)
+
+    def stats(self):
+        return {"queued": self._queued, "running": len(self._active), "submitted": self.submitted,
+                "rejected": self.rejected, "expired": self.expired, "completed": self.completed}
+
+class LLMScheduler(_SchedulerCore):
+    """
+    Zulassungskontrolle vor dem LLM.
+    - höchstens `concurrency` Generierungen gleichzeitig (je ein Worker-Thread)
+    - Warteschlange mit max. `max_queue` Jobs; ist sie voll, lehnt `submit` sofort ab
+    - Round-Robin über Absender (Fairness); pro Absender FIFO und nie zwei Jobs
+      gleichzeitig, damit die Antwortreihenfolge je Konversation erhalten bleibt
+    - Jobs, deren Deadline beim Start schon verstrichen ist, gehen an `on_expired`
+    """
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self._cond = threading.Condition()
+        self._threads = [threading.Thread(target=self._run, name=f"llm-{i}", daemon=True)
+                         for i in range(self.concurrency)]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, sender, job, deadline) -> bool:
+        """Reiht `job` ein; False, wenn die Warteschlange voll ist (→ „busy“ antworten)."""
+        with self._cond:
+            if not self._enqueue(sender, job, deadline):
+                return False
+            self._cond.notify()
+            return True
+
+    def _next(self):
+        with self._cond:
+            while True:
+                nxt = self._pop()
+                if nxt is not None:
+                    return nxt
+                if self._stopping and not self._queued:
+                    return None, None, _STOP
+                self._cond.wait()
+
+    def _run(self):
+        while True:
+            sender, deadline, job = self._next()
+            if job is _STOP:
+                return
+            try:
+                if time.monotonic() >= deadline:
+                    self._expire(sender, job)
+                else:
+                    self.handler(job, deadline)
+                    self.completed += 1
+            except Exception:
+                log.exception("[SCHED] Fehler im Handler")
+            finally:
+                with self._cond:
+                    self._active.discard(sender)
+                    self._cond.notify_all()
+
+    def stop(self, timeout=None):
+        """Arbeitet die Warteschlange ab und beendet die Worker."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+
+class AsyncLLMScheduler(_SchedulerCore):
+    """
+    Wie `LLMScheduler` (Zulassung, Fairness, Deadlines), aber für einen asyncio-Loop:
+    `handler(job, deadline)` ist eine Coroutine, `concurrency` Tasks statt Threads.
+    `submit` ist synchron; `on_expired` wird synchron aufgerufen.
+    """
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self._wake = asyncio.Event()
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._run(), name=f"llm-{i}") for i in range(self.concurrency)]
+
+    def submit(self, sender, job, deadline) -> bool:
+        if not self._enqueue(sender, job, deadline):
+            return False
+        self._wake.set()
+        return True
+
+    async def _run(self):
+        while True:
+            nxt = self._pop()
+            if nxt is None:
+                if self._stopping and not self._queued:
+                    self._wake.set()
+                    return
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            sender, deadline, job = nxt
+            try:
+                if time.monotonic() >= deadline:
+                    self._expire(sender, job)
+                else:
+                    await self.handler(job, deadline)
+                    self.completed += 1
+            except Exception:
+                log.exception("[SCHED] Fehler im Handler")
+            finally:
+                self._active.discard(sender)
+                self._wake.set()
+
+    async def stop(self, timeout=None):
+        """Arbeitet die Warteschlange ab; nach `timeout` werden laufende Jobs abgebrochen."""
+        self._stopping = True
+        self._wake.set()
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for t in pending:
+            t.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
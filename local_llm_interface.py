@@ -1,30 +1,327 @@
-import subprocess, shlex
-from threading import Timer
+import json, queue, shlex, asyncio, subprocess, time, logging, http.client
+from typing import Callable, List, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+from config import Config
+from rag import estimate_tokens
+
+log = logging.getLogger("borgo")
 
 class LLMError(Exception): pass
 
-def generate_ollama(prompt: str, model="mistral:instruct", timeout=25, max_tokens=300) -> str:
-    sys_prompt = (
-        "You are Borgo-Batone-Bot, a concise, helpful Tuscany assistant. "
-        "Answer briefly (max ~6 sentences)."
-    )
-    composed = f"{sys_prompt}\n\nUser: {prompt}\nAssistant:"
+SYSTEM_PROMPT = (
+    "You are Borgo-Batone-Bot, a concise, helpful Tuscany assistant. "
+    "Answer briefly (max ~6 sentences)."
+)
+
+class Persona(NamedTuple):
+    """Systemprompt und Name für die Fakten-Überschrift („Facts about <label>“), pro Tenant."""
+    system: str = SYSTEM_PROMPT
+    label: str = "Borgo Batone"
+
+DEFAULT_PERSONA = Persona()
+
+def compose_prompt(prompt: str, context: Optional[List[str]] = None, persona: Persona = DEFAULT_PERSONA) -> str:
+    # Reihenfolge bewusst: fester Systemprompt zuerst, damit Ollama den
+    # Prompt-/KV-Cache für dieses Präfix zwischen Anfragen wiederverwenden kann.
+    if context:
+        facts = "\n".join(f"- {c}" for c in context)
+        return f"{persona.system}\n\nFacts about {persona.label}:\n{facts}\n\nUser: {prompt}\nAssistant:"
+    return f"{persona.system}\n\nUser: {prompt}\nAssistant:"
+
+class Generation(NamedTuple):
+    text: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    ttft: float = 0.0      # Sekunden bis zum ersten Token
+    total: float = 0.0     # Sekunden gesamt
+
+class OllamaClient:
+    """
+    Client für die lokale Ollama-HTTP-API (/api/generate).
+    Hält einen kleinen Pool von Keep-Alive-Verbindungen, streamt die Tokens
+    (optional an `on_token`) und hält das Modell per `keep_alive` geladen.
+    """
+    def __init__(self, url="http://127.0.0.1:11434", pool_size=2, keep_alive="30m"):
+        parts = urlsplit(url if "//" in url else f"http://{url}")
+        self.host, self.port = parts.hostname or "127.0.0.1", parts.port or 11434
+        self.keep_alive = keep_alive
+        self.pool_size = pool_size
+        self._pool = queue.LifoQueue()
+
+    def _get_conn(self, timeout):
+        """(Verbindung, aus dem Pool?)"""
+        try:
+            conn, pooled = self._pool.get_nowait(), True
+        except queue.Empty:
+            return http.client.HTTPConnection(self.host, self.port, timeout=timeout), False
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, pooled
+
+    def _request(self, body, timeout):
+        conn, pooled = self._get_conn(timeout)
+        try:
+            conn.request("POST", "/api/generate", body=body, headers={"Content-Type": "application/json"})
+            return conn, conn.getresponse()
+        except TimeoutError:
+            conn.close()
+            raise
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            if not pooled:
+                raise
+        # Server hat die Keep-Alive-Verbindung im Leerlauf geschlossen → einmal mit frischer Verbindung
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+        try:
+            conn.request("POST", "/api/generate", body=body, headers={"Content-Type": "application/json"})
+            return conn, conn.getresponse()
+        except BaseException:
+            conn.close()
+            raise
+
+    def _put_conn(self, conn):
+        if self._pool.qsize() < self.pool_size:
+            self._pool.put(conn)
+        else:
+            conn.close()
+
+    def generate(self, prompt: str, model: str, timeout=25, max_tokens=300,
+                 on_token: Optional[Callable[[str], None]] = None) -> Generation:
+        body = json.dumps({
+            "model": model, "prompt": prompt, "stream": True,
+            "keep_alive": self.keep_alive, "options": {"num_predict": max_tokens},
+        }).encode("utf-8")
+        t0 = time.monotonic()
+        deadline, ttft, parts, final = t0 + timeout, 0.0, [], {}
+        conn = None
+        try:
+            conn, resp = self._request(body, timeout)
+            if resp.status != 200:
+                raise LLMError(f"HTTP {resp.status}: {resp.read()[:200].decode('utf-8', 'replace')}")
+            for line in resp:
+                if time.monotonic() > deadline:
+                    raise LLMError(f"Timeout nach {timeout}s")
+                if not line.strip():
+                    continue
+                obj = json.loads(line)
+                if obj.get("error"):
+                    raise LLMError(obj["error"])
+                tok = obj.get("response", "")
+                if tok:
+                    if not parts:
+                        ttft = time.monotonic() - t0
+                    parts.append(tok)
+                    if on_token:
+                        on_token(tok)
+                if obj.get("done"):
+                    final = obj
+                    break
+            resp.read()   # Rest des Chunked-Bodys lesen, damit die Verbindung wiederverwendbar bleibt
+        except LLMError:
+            conn.close()
+            raise
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            if conn is not None:
+                conn.close()
+            raise LLMError(f"{type(e).__name__}: {e}") from None
+        self._put_conn(conn)
+        return Generation("".join(parts).strip() or "…", final.get("prompt_eval_count", 0),
+                          final.get("eval_count", 0), ttft, time.monotonic() - t0)
+
+class AsyncOllamaClient:
+    """
+    asyncio-Gegenstück zu OllamaClient: HTTP/1.1 direkt über asyncio-Streams
+    (kein Thread pro Anfrage), Keep-Alive-Pool, gestreamte NDJSON-Antwort.
+    Das Timeout gilt für die ganze Generierung (asyncio.timeout); ein Abbruch
+    des aufrufenden Tasks schließt die Verbindung, Ollama bricht dann ebenfalls ab.
+    Nur aus einem Event-Loop benutzen.
+    """
+    def __init__(self, url="http://127.0.0.1:11434", pool_size=2, keep_alive="30m"):
+        parts = urlsplit(url if "//" in url else f"http://{url}")
+        self.host, self.port = parts.hostname or "127.0.0.1", parts.port or 11434
+        self.keep_alive = keep_alive
+        self.pool_size = pool_size
+        self._pool = []   # [(reader, writer)]
 
-    cmd = f"ollama run {shlex.quote(model)}"
+    async def _get_conn(self):
+        while self._pool:
+            reader, writer = self._pool.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return await asyncio.open_connection(self.host, self.port)
+
+    def _put_conn(self, conn):
+        if len(self._pool) < self.pool_size:
+            self._pool.append(conn)
+        else:
+            conn[1].close()
+
+    @staticmethod
+    async def _read_head(reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Verbindung vom Server geschlossen")
+        status = int(status_line.split(None, 2)[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return status, headers
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    @staticmethod
+    async def _body(reader, headers):
+        """Liefert den Body stückweise (chunked oder Content-Length)."""
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass   # Trailer
+                    return
+                yield await reader.readexactly(size)
+                await reader.readexactly(2)
+        elif "content-length" in headers:
+            yield await reader.readexactly(int(headers["content-length"]))
+        else:
+            yield await reader.read()
+
+    async def generate(self, prompt: str, model: str, timeout=25, max_tokens=300,
+                       on_token: Optional[Callable[[str], None]] = None) -> Generation:
+        body = json.dumps({
+            "model": model, "prompt": prompt, "stream": True,
+            "keep_alive": self.keep_alive, "options": {"num_predict": max_tokens},
+        }).encode("utf-8")
+        head = (f"POST /api/generate HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode("ascii")
+        t0 = time.monotonic()
+        ttft, parts, final, conn = 0.0, [], {}, None
+        try:
+            async with asyncio.timeout(timeout):
+                conn = reader, writer = await self._get_conn()
+                writer.write(head + body)
+                await writer.drain()
+                status, headers = await self._read_head(reader)
+                if status != 200:
+                    data = b"".join([c async for c in self._body(reader, headers)])
+                    raise LLMError(f"HTTP {status}: {data[:200].decode('utf-8', 'replace')}")
+                buf = b""
+                async for chunk in self._body(reader, headers):
+                    buf += chunk
+                    *lines, buf = buf.split(b"\n")
+                    for line in lines:
+                        if not line.strip() or final:
+                            continue
+                        obj = json.loads(line)
+                        if obj.get("error"):
+                            raise LLMError(obj["error"])
+                        tok = obj.get("response", "")
+                        if tok:
+                            if not parts:
+                                ttft = time.monotonic() - t0
+                            parts.append(tok)
+                            if on_token:
+                                on_token(tok)
+                        if obj.get("done"):
+                            final = obj
+        except BaseException as e:
+            if conn is not None:
+                conn[1].close()
+            if isinstance(e, TimeoutError):
+                raise LLMError(f"Timeout nach {timeout}s") from None
+            if isinstance(e, (OSError, ValueError, asyncio.IncompleteReadError)):
+                raise LLMError(f"{type(e).__name__}: {e}") from None
+            raise   # LLMError, Abbruch (CancelledError)
+        self._put_conn(conn)
+        return Generation("".join(parts).strip() or "…", final.get("prompt_eval_count", 0),
+                          final.get("eval_count", 0), ttft, time.monotonic() - t0)
+
+_CLIENT: Optional[OllamaClient] = None
+
+def get_client() -> OllamaClient:
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = OllamaClient(Config.OLLAMA_URL, keep_alive=Config.LLM_KEEP_ALIVE)
+    return _CLIENT
+
+def generate_ollama_cli(prompt: str, model="mistral:instruct", timeout=25, max_tokens=300,
+                        context: Optional[List[str]] = None, persona: Persona = DEFAULT_PERSONA) -> str:
+    """Alter Weg: ein `ollama run`-Prozess pro Frage (max_tokens wird hier nicht unterstützt)."""
+    composed = compose_prompt(prompt, context, persona)
+
+    cmd = f"{Config.OLLAMA_BIN} run {shlex.quote(model)}"
     try:
         proc = subprocess.Popen(
             shlex.split(cmd), stdin=subprocess.PIPE,
             stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
         )
-        timer = Timer(timeout, proc.kill)
         try:
-            timer.start()
-            out, err = proc.communicate(composed)
-        finally:
-            timer.cancel()
+            out, err = proc.communicate(composed, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            raise LLMError(f"Timeout nach {timeout}s")
 
         if proc.returncode != 0:
             raise LLMError(err.strip())
         return out.strip() or "…"
+    except LLMError:
+        raise
     except Exception as e:
-        raise LLMError(str(e))
\ No newline at end of file
+        raise LLMError(str(e))
+
+def generate_ollama(prompt: str, model="mistral:instruct", timeout=25, max_tokens=300,
+                    on_token: Optional[Callable[[str], None]] = None,
+                    context: Optional[List[str]] = None, persona: Persona = DEFAULT_PERSONA) -> str:
+    if Config.LLM_BACKEND == "cli":
+        return generate_ollama_cli(prompt, model, timeout, max_tokens, context, persona)
+    composed = compose_prompt(prompt, context, persona)
+    g = get_client().generate(composed, model, timeout, max_tokens, on_token)
+    log.info(f"[LLM] model={model} ctx={len(context or [])} prompt_tok≈{estimate_tokens(composed)} "
+             f"eval={g.prompt_tokens} out={g.completion_tokens} ttft={g.ttft:.2f}s total={g.total:.2f}s")
+    return g.text
+
+_ASYNC_CLIENT: Optional[AsyncOllamaClient] = None
+
+def get_async_client() -> AsyncOllamaClient:
+    global _ASYNC_CLIENT
+    if _ASYNC_CLIENT is None:
+        _ASYNC_CLIENT = AsyncOllamaClient(Config.OLLAMA_URL, pool_size=max(2, Config.LLM_WORKERS),
+                                          keep_alive=Config.LLM_KEEP_ALIVE)
+    return _ASYNC_CLIENT
+
+async def generate_ollama_cli_async(prompt: str, model="mistral:instruct", timeout=25,
+                                    context: Optional[List[str]] = None, persona: Persona = DEFAULT_PERSONA) -> str:
+    """`ollama run` als asyncio-Subprozess; bei Timeout oder Abbruch wird er beendet."""
+    cmd = shlex.split(Config.OLLAMA_BIN) + ["run", model]
+    try:
+        proc = await asyncio.create_subprocess_exec(*cmd, stdin=asyncio.subprocess.PIPE,
+                                                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    except OSError as e:
+        raise LLMError(str(e))
+    try:
+        async with asyncio.timeout(timeout):
+            out, err = await proc.communicate(compose_prompt(prompt, context, persona).encode("utf-8"))
+    except BaseException as e:
+        proc.kill()
+        if isinstance(e, TimeoutError):
+            raise LLMError(f"Timeout nach {timeout}s") from None
+        raise
+    if proc.returncode != 0:
+        raise LLMError(err.decode("utf-8", "replace").strip())
+    return out.decode("utf-8", "replace").strip() or "…"
+
+async def generate_ollama_async(prompt: str, model="mistral:instruct", timeout=25, max_tokens=300,
+                                on_token: Optional[Callable[[str], None]] = None,
+                                context: Optional[List[str]] = None, persona: Persona = DEFAULT_PERSONA) -> str:
+    if Config.LLM_BACKEND == "cli":
+        return await generate_ollama_cli_async(prompt, model, timeout, context, persona)
+    composed = compose_prompt(prompt, context, persona)
+    g = await get_async_client().generate(composed, model, timeout, max_tokens, on_token)
+    log.info(f"[LLM] model={model} ctx={len(context or [])} prompt_tok≈{estimate_tokens(composed)} "
+             f"eval={g.prompt_tokens} out={g.completion_tokens} ttft={g.ttft:.2f}s total={g.total:.2f}s")
+    return g.text
@@ -0,0 +1,53 @@
+import json, time, queue, atexit, logging
+from logging.handlers import QueueHandler, QueueListener
+
+class JsonLinesFormatter(logging.Formatter):
+    """Eine JSON-Zeile pro Record: ts, level, msg, thread (+ exc bei Ausnahmen)."""
+    def format(self, record):
+        ct = record.created
+        obj = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(ct)) + f".{int(ct % 1 * 1000):03d}",
+            "level": record.levelname,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            obj["exc"] = self.formatException(record.exc_info)
+        return json.dumps(obj, ensure_ascii=False)
+
+class DebugSampler(logging.Filter):
+    """Lässt von DEBUG-Records nur jeden n-ten pro Aufrufstelle durch (INFO und höher immer)."""
+    def __init__(self, every=10):
+        super().__init__()
+        self.every = max(1, every)
+        self._seen = {}
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        site = (record.pathname, record.lineno)
+        n = self._seen.get(site, 0)
+        self._seen[site] = n + 1
+        return n % self.every == 0
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Reicht den Record unverändert weiter: Formatierung (msg % args) passiert erst
+    im Listener-Thread. Die Argumente der Hot-Path-Logs sind unveränderliche Werte.
+    """
+    def prepare(self, record):
+        return record
+
+def start_queue_logging(logger, handlers, sample_every=10):
+    """
+    Hängt `logger` an eine Queue; `handlers` (Datei, Konsole) laufen in einem
+    QueueListener-Thread, sodass Platten- und Konsolen-I/O den Empfang nie bremsen.
+    """
+    q = queue.SimpleQueue()
+    qh = LazyQueueHandler(q)
+    qh.addFilter(DebugSampler(sample_every))
+    logger.addHandler(qh)
+    listener = QueueListener(q, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)   # Restliche Records beim Beenden noch schreiben
+    return listener
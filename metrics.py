@@ -0,0 +1,164 @@
+import os, bisect, threading, logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+log = logging.getLogger("borgo")
+
+# Sekunden-Buckets von 100 µs bis 2 min (Lookup/Parsen bis LLM-Generierung)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+def _escape(value) -> str:
+    """Label-Wert nach dem Exposition-Format: Backslash, Anführungszeichen, Zeilenumbruch."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _fmt_labels(names, values, extra=()):
+    # Werte können Freitext sein (Tenant-Namen aus TENANTS_FILE)
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + [f'{n}="{v}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+    """Basis aller Metriken; Counter/Gauge mit `fn` lesen ihren Wert erst beim Scrape (kein Aufwand im Hot-Path)."""
+    kind = ""
+    def __init__(self, name, help, labelnames=(), fn=None):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.fn = fn
+        self._lock = threading.Lock()
+        self._children = {}
+        if not self.labelnames:
+            self.labels()   # ungelabelte Metrik sofort mit 0 exportieren
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self):
+        if self.fn is not None:
+            try:
+                self.labels().set(self.fn())
+            except Exception as e:
+                log.debug(f"[METRICS] {self.name}: {e}")
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, values))
+        return lines
+
+class _Value:
+    __slots__ = ("value", "lock")
+    def __init__(self):
+        self.value, self.lock = 0.0, threading.Lock()
+    def inc(self, n=1):
+        with self.lock:
+            self.value += n
+    def set(self, v):
+        self.value = v
+    def render(self, name, names, values):
+        return [f"{name}{_fmt_labels(names, values)} {self.value:g}"]
+
+class Counter(_Metric):
+    kind = "counter"
+    def _new_child(self): return _Value()
+    def inc(self, n=1): self.labels().inc(n)
+
+class Gauge(_Metric):
+    kind = "gauge"
+    def _new_child(self): return _Value()
+    def set(self, v): self.labels().set(v)
+
+class _Hist:
+    __slots__ = ("buckets", "counts", "sum", "count", "lock")
+    def __init__(self, buckets):
+        self.buckets, self.counts = buckets, [0] * (len(buckets) + 1)
+        self.sum, self.count, self.lock = 0.0, 0, threading.Lock()
+    def observe(self, v):
+        i = bisect.bisect_left(self.buckets, v)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += v
+            self.count += 1
+    def render(self, name, names, values):
+        out, acc = [], 0
+        for b, c in zip(self.buckets, self.counts):
+            acc += c
+            out.append(f"{name}_bucket{_fmt_labels(names, values, [('le', f'{b:g}')])} {acc}")
+        out.append(f"{name}_bucket{_fmt_labels(names, values, [('le', '+Inf')])} {self.count}")
+        out.append(f"{name}_sum{_fmt_labels(names, values)} {self.sum:g}")
+        out.append(f"{name}_count{_fmt_labels(names, values)} {self.count}")
+        return out
+
+class Histogram(_Metric):
+    kind = "histogram"
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+    def _new_child(self): return _Hist(self.buckets)
+    def observe(self, v): self.labels().observe(v)
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def _add_fn(self, metric, fn):
+        m = self._add(metric)
+        if fn is not None:
+            m.fn = fn   # erneute Registrierung (z. B. neuer Pool) ersetzt die Quelle
+        return m
+
+    def counter(self, name, help, labelnames=(), fn=None):
+        return self._add_fn(Counter(name, help, labelnames, fn), fn)
+
+    def gauge(self, name, help, labelnames=(), fn=None):
+        return self._add_fn(Gauge(name, help, labelnames, fn), fn)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for m in list(self._metrics.values()):
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+counter, gauge, histogram = REGISTRY.counter, REGISTRY.gauge, REGISTRY.histogram
+
+def start_http_server(port, host="127.0.0.1", registry=REGISTRY):
+    """Kleiner /metrics-Endpunkt im Hintergrund-Thread (Prometheus-Textformat)."""
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+    srv = ThreadingHTTPServer((host, port), Handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, name="metrics-http", daemon=True).start()
+    log.info(f"[METRICS] http://{host}:{srv.server_address[1]}/metrics")
+    return srv
+
+def start_textfile_writer(path, interval=15.0, registry=REGISTRY):
+    """Schreibt die Metriken periodisch atomar in eine Datei (node_exporter textfile collector)."""
+    stop = threading.Event()
+    def run():
+        while not stop.wait(interval):
+            tmp = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(registry.render())
+                os.replace(tmp, path)
+            except OSError as e:
+                log.warning(f"[METRICS] Textfile nicht geschrieben: {e}")
+    threading.Thread(target=run, name="metrics-file", daemon=True).start()
+    return stop
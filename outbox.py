@@ -0,0 +1,272 @@
+import os, json, time, random, asyncio, threading, logging
+from collections import deque
+log = logging.getLogger("borgo")
+
+class _Item:
+    __slots__ = ("text", "received", "enqueued", "attempts", "ref")
+    def __init__(self, text, received, enqueued, ref=None):
+        self.text, self.received, self.enqueued, self.ref = text, received, enqueued, ref
+        self.attempts = 0
+
+class _OutboxCore:
+    """Zustand und Planung der Ausgangs-Queue; Sperren/Warten machen die Unterklassen."""
+    def __init__(self, send, rate=1.0, burst=5, coalesce=0.3, max_chars=2000, retries=3,
+                 backoff=1.0, max_backoff=60.0, dead_letter="", workers=1, on_sent=None, on_dead=None):
+        self.send, self.on_sent, self.on_dead = send, on_sent, on_dead
+        self.rate, self.burst, self.coalesce, self.max_chars = rate, burst, coalesce, max_chars
+        self.retries, self.backoff, self.max_backoff = max(1, retries), backoff, max_backoff
+        self.dead_letter, self.workers = dead_letter, max(1, workers)
+        self._groups = {}      # group -> deque[_Item]
+        self._not_before = {}  # group -> monotonic (Backoff nach Fehlschlag)
+        self._tokens = {}      # group -> (tokens, stand)
+        self._busy = set()
+        self._queued = 0
+        self._stopping = self._aborted = False
+        self.sent = self.failed = self.retried = self.coalesced = self.dead = 0
+
+    def _enqueue(self, group_id, text, received, ref):
+        self._groups.setdefault(group_id, deque()).append(_Item(text, received, time.monotonic(), ref))
+        self._queued += 1
+
+    def depth(self):
+        return self._queued
+
+    def _bucket(self, group, now):
+        """(Tokens, Zeitpunkt, ab dem ein Token verfügbar ist)."""
+        if self.rate <= 0:
+            return self.burst, now
+        tokens, stamp = self._tokens.get(group, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - stamp) * self.rate)
+        return tokens, now if tokens >= 1 else now + (1 - tokens) / self.rate
+
+    def _take(self, group, q, now):
+        """Kopf der Gruppe plus zusammenfassbare Nachfolger; verbraucht ein Token."""
+        items = [q.popleft()]
+        size = len(items[0].text)
+        while (q and q[0].attempts == items[0].attempts
+               and q[0].enqueued - items[0].enqueued <= self.coalesce
+               and size + 2 + len(q[0].text) <= self.max_chars):
+            items.append(q.popleft())
+            size += 2 + len(items[-1].text)
+        self._queued -= len(items)
+        if self.rate > 0:
+            tokens, _ = self._bucket(group, now)
+            self._tokens[group] = (tokens - 1, now)
+        self._busy.add(group)
+        return items
+
+    def _pick(self, now):
+        """(Gruppe, Zeitpunkt) der als Nächstes sendbaren Gruppe; (None, None) wenn keine wartet."""
+        best, best_at = None, None
+        for group, q in self._groups.items():
+            if not q or group in self._busy:
+                continue
+            at = max(self._not_before.get(group, 0.0), self._bucket(group, now)[1])
+            if best_at is None or at < best_at:
+                best, best_at = group, at
+        return best, best_at
+
+    def _finished(self, group, items, ok):
+        self._busy.discard(group)
+        if ok:
+            self.sent += 1
+            self.coalesced += len(items) - 1
+            self._not_before.pop(group, None)
+        else:
+            self._failed(group, items)
+
+    def _failed(self, group, items):
+        self.failed += 1
+        attempts = items[0].attempts + 1
+        if attempts >= self.retries:
+            self._dead(group, items, attempts, "retries")
+            return
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1)) * random.uniform(0.5, 1.5)
+        log.warning("[OUTBOX] Senden fehlgeschlagen (Versuch %d/%d) – neuer Versuch in %.1fs",
+                    attempts, self.retries, delay)
+        self.retried += 1
+        # zurück an den Kopf; gleiche Versuchszahl + Zeitstempel → beim nächsten Mal wieder ein Send
+        q = self._groups.setdefault(group, deque())
+        for item in reversed(items):
+            item.attempts = attempts
+            q.appendleft(item)
+        self._queued += len(items)
+        self._not_before[group] = time.monotonic() + delay
+
+    def _dead(self, group, items, attempts, reason):
+        self.dead += len(items)   # Anzahl Antworten, nicht Sends
+        log.error("[OUTBOX] endgültig nicht zugestellt (%s, %d Versuche) – dead letter", reason, attempts)
+        if self.on_dead:
+            self.on_dead(items, reason)
+        if not self.dead_letter:
+            return
+        text = "\n\n".join(i.text for i in items)
+        try:
+            os.makedirs(os.path.dirname(self.dead_letter) or ".", exist_ok=True)
+            with open(self.dead_letter, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"ts": time.time(), "group": group, "text": text, "replies": len(items),
+                                    "attempts": attempts, "reason": reason}, ensure_ascii=False) + "\n")
+        except OSError as e:
+            log.error("[OUTBOX] dead letter nicht geschrieben: %s", e)
+
+    def stats(self):
+        return {"queued": self._queued, "sent": self.sent, "failed": self.failed, "retried": self.retried,
+                "coalesced": self.coalesced, "dead": self.dead}
+
+    def _abandon(self):
+        """Alles noch Wartende als „shutdown“ in den dead letter."""
+        self._aborted = True
+        for group, q in self._groups.items():
+            if q:
+                self._dead(group, list(q), max(i.attempts for i in q), "shutdown")
+                q.clear()
+        self._queued = 0
+
+class Outbox(_OutboxCore):
+    """
+    Ausgehende Warteschlange mit eigenen Worker-Threads; `put` blockiert nie.
+    - pro Gruppe FIFO und nie zwei Sends gleichzeitig (Reihenfolge bleibt erhalten)
+    - Token-Bucket pro Gruppe (`rate` Nachrichten/s, Burst `burst`; 0 = unbegrenzt)
+    - wartet mehr als eine Antwort an dieselbe Gruppe (z. B. während Rate-Limit oder
+      laufendem Send), werden die innerhalb von `coalesce` Sekunden eingereihten zu
+      einer Nachricht zusammengefasst – ohne zusätzliche Wartezeit im Normalfall
+    - Fehlschläge: erneuter Versuch mit exponentiellem Backoff + Jitter; nach
+      `retries` Versuchen landet die Nachricht als JSON-Zeile in `dead_letter`
+    `send(group_id, text) -> bool` macht genau einen Versuch; `on_sent(ok, items, seconds)`
+    erhält nach jedem Versuch die beteiligten Einträge (Metriken, Journal), `on_dead(items, reason)`
+    die aufgegebenen (reason "retries" oder "shutdown").
+    """
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self._cond = threading.Condition()
+        self._threads = [threading.Thread(target=self._run, name=f"outbox-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for t in self._threads:
+            t.start()
+
+    def put(self, group_id, text, received=None, ref=None):
+        """`ref` ist eine frei wählbare Kennung (z. B. Journal-ID), die in den Callbacks zurückkommt."""
+        with self._cond:
+            self._enqueue(group_id, text, received, ref)
+            self._cond.notify()
+
+    def _next(self):
+        with self._cond:
+            while True:
+                if self._aborted:
+                    return None, None
+                now = time.monotonic()
+                group, at = self._pick(now)
+                if group is None:
+                    if self._stopping and not self._queued and not self._busy:
+                        return None, None
+                    self._cond.wait()
+                elif at > now:
+                    self._cond.wait(at - now)
+                else:
+                    return group, self._take(group, self._groups[group], now)
+
+    def _run(self):
+        while True:
+            group, items = self._next()
+            if items is None:
+                with self._cond:
+                    self._cond.notify_all()
+                return
+            text = "\n\n".join(i.text for i in items)
+            t0 = time.perf_counter()
+            try:
+                ok = self.send(group, text)
+            except Exception:
+                log.exception("[OUTBOX] Fehler beim Senden")
+                ok = False
+            if self.on_sent:
+                self.on_sent(ok, items, time.perf_counter() - t0)
+            with self._cond:
+                self._finished(group, items, ok)
+                self._cond.notify_all()
+
+    def stop(self, timeout=None):
+        """Sendet noch Eingereihtes; was nach `timeout` übrig ist, geht in den dead letter."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        with self._cond:
+            self._abandon()
+            self._cond.notify_all()
+
+class AsyncOutbox(_OutboxCore):
+    """
+    Gleiche Warteschlange wie `Outbox` (Reihenfolge, Rate-Limit, Zusammenfassen,
+    Backoff, dead letter) für einen asyncio-Loop: `send` ist eine Coroutine und
+    `workers` Tasks ersetzen die Threads. `put` ist synchron und blockiert nie;
+    alle Methoden nur aus dem Loop-Thread aufrufen.
+    """
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self._wake = asyncio.Event()
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._run(), name=f"outbox-{i}") for i in range(self.workers)]
+
+    def put(self, group_id, text, received=None, ref=None):
+        self._enqueue(group_id, text, received, ref)
+        self._wake.set()
+
+    async def _next(self):
+        while True:
+            if self._aborted:
+                return None, None
+            now = time.monotonic()
+            group, at = self._pick(now)
+            if group is None:
+                if self._stopping and not self._queued and not self._busy:
+                    return None, None
+                timeout = None
+            elif at > now:
+                timeout = at - now
+            else:
+                return group, self._take(group, self._groups[group], now)
+            self._wake.clear()
+            try:
+                async with asyncio.timeout(timeout):
+                    await self._wake.wait()
+            except TimeoutError:
+                pass
+
+    async def _run(self):
+        while True:
+            group, items = await self._next()
+            if items is None:
+                self._wake.set()   # übrige Worker ebenfalls beenden
+                return
+            text = "\n\n".join(i.text for i in items)
+            t0 = time.perf_counter()
+            try:
+                ok = await self.send(group, text)
+            except asyncio.CancelledError:
+                self._busy.discard(group)
+                self._dead(group, items, items[0].attempts + 1, "shutdown")
+                raise
+            except Exception:
+                log.exception("[OUTBOX] Fehler beim Senden")
+                ok = False
+            if self.on_sent:
+                self.on_sent(ok, items, time.perf_counter() - t0)
+            self._finished(group, items, ok)
+            self._wake.set()
+
+    async def stop(self, timeout=None):
+        """Sendet noch Eingereihtes; was nach `timeout` übrig ist (auch laufende Sends), geht in den dead letter."""
+        self._stopping = True
+        self._wake.set()
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+            self._aborted = True
+            for t in pending:
+                t.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        self._abandon()
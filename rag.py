@@ -0,0 +1,48 @@
+import re, logging
+from typing import List
+log = logging.getLogger("borgo")
+
+_MARKUP_RE = re.compile(r"\*\*|__|`")
+_SPACE_RE = re.compile(r"\s+")
+_ALIAS_RE = re.compile(r"^Alias von \*(.+?)\*\.?$")   # Konvention in FIXED_RESPONSES.txt
+
+def estimate_tokens(text: str) -> int:
+    """Grobe Schätzung (~4 Zeichen pro Token), reicht fürs Budget."""
+    return (len(text) + 3) // 4
+
+def _snippet(key: str, text: str) -> str:
+    return f"{key}: {_SPACE_RE.sub(' ', _MARKUP_RE.sub('', text)).strip()}"
+
+def _truncate(snippet: str, tokens: int) -> str:
+    cut = snippet[:tokens * 4]
+    return cut[:cut.rfind(" ")].rstrip(" ,;:") + " …" if " " in cut else cut
+
+def select_context(question: str, loader, budget: int = 400, k: int = 3, min_score: float = 0.15) -> List[str]:
+    """
+    Wählt die relevantesten FIXED-Einträge (Retrieval-Index des Loaders) und
+    packt sie in ein Token-Budget. Der letzte Eintrag wird notfalls gekürzt,
+    wenn noch ein sinnvoller Rest (≥ 32 Tokens) frei ist.
+    """
+    hits = loader.search(question, k)
+    entries, picked, seen, left = loader.entries, [], set(), budget
+    for key, score in hits:
+        if score < min_score or key not in entries:
+            break
+        alias = _ALIAS_RE.match(entries[key])
+        if alias and alias.group(1) in entries:
+            key = alias.group(1)
+        if key in seen:
+            continue
+        seen.add(key)
+        snip = _snippet(key, entries[key])
+        cost = estimate_tokens(snip) + 1
+        if cost <= left:
+            picked.append(snip)
+            left -= cost
+        elif left >= 32:
+            picked.append(_truncate(snip, left - 1))
+            break
+        else:
+            break
+    log.debug("[RAG] %d Snippets, ~%d Tokens", len(picked), budget - left)
+    return picked
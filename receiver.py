@@ -0,0 +1,251 @@
+import os, time, queue, shlex, asyncio, selectors, threading, subprocess, logging
+from metrics import counter, histogram
+from envelopes import loads, LINE_LIMIT
+log = logging.getLogger("borgo")
+
+PARSE_SECONDS = histogram("borgo_stage_seconds", "Dauer je Verarbeitungsstufe", ("stage",)).labels("parse")
+RESTARTS = counter("borgo_receiver_restarts_total", "Neustarts der Empfangsquelle", ("source",)).labels("receive")
+
+class LineFramer:
+    """Zerlegt einen Bytestrom inkrementell in Zeilen (wiederverwendeter Puffer)."""
+    __slots__ = ("buf",)
+
+    def __init__(self):
+        self.buf = bytearray()
+
+    def feed(self, data: bytes) -> list:
+        buf = self.buf
+        buf += data
+        end = buf.rfind(b"\n")
+        if end < 0:
+            return []
+        lines = bytes(buf[:end]).split(b"\n")
+        del buf[:end + 1]
+        return lines
+
+    def flush(self) -> list:
+        rest, self.buf = bytes(self.buf), bytearray()
+        return [rest] if rest else []
+
+_DONE = object()
+
+def merge_messages(sources):
+    """
+    Envelopes aller Empfänger (einer pro Bot-Konto) als ein Strom. Bei nur einer
+    Quelle direkt, sonst liest je Quelle ein Thread in eine gemeinsame Queue,
+    sodass Dedup und Filter weiterhin nur in einem Thread laufen.
+    Endet, wenn alle Quellen beendet sind.
+    """
+    if len(sources) == 1:
+        yield from sources[0].messages()
+        return
+    q = queue.SimpleQueue()
+
+    def pump(src):
+        try:
+            for obj in src.messages():
+                q.put(obj)
+        finally:
+            q.put(_DONE)
+
+    for i, src in enumerate(sources):
+        threading.Thread(target=pump, args=(src,), name=f"recv-{i}", daemon=True).start()
+    running = len(sources)
+    while running:
+        obj = q.get()
+        if obj is _DONE:
+            running -= 1
+        else:
+            yield obj
+
+class ReceiveProcess:
+    """
+    Langlaufender `signal-cli -o json receive`-Prozess mit Neustart-Backoff.
+    stdout und stderr werden per selectors gleichzeitig und nicht-blockierend
+    gelesen; stderr landet zeilenweise im Log, ohne den Empfang aufzuhalten.
+    `messages()` liefert die dekodierten JSON-Objekte (je ein Envelope).
+    """
+    def __init__(self, number, cli="signal-cli", prefilter=None):
+        self.number, self.cli = number, cli
+        self.prefilter = prefilter   # bytes -> bool; False = Zeile ohne Decode verwerfen
+        self.proc = None
+        self._stopped = False
+
+    def start(self):
+        pass   # Prozess wird beim ersten messages()-Durchlauf gestartet
+
+    def _spawn(self):
+        cmd = f"{self.cli} -u {self.number} -o json receive"
+        log.info(f"[RECV] spawn: {cmd}")
+        return subprocess.Popen(shlex.split(cmd), stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+
+    def _lines(self, proc):
+        """Liefert stdout-Zeilen, bis beide Pipes geschlossen sind."""
+        sel = selectors.DefaultSelector()
+        for f, is_err in ((proc.stdout, False), (proc.stderr, True)):
+            os.set_blocking(f.fileno(), False)
+            sel.register(f.fileno(), selectors.EVENT_READ, (LineFramer(), is_err))
+        try:
+            while sel.get_map() and not self._stopped:
+                for key, _ in sel.select(timeout=1.0):
+                    framer, is_err = key.data
+                    try:
+                        data = os.read(key.fd, 65536)
+                    except BlockingIOError:
+                        continue
+                    if data:
+                        lines = framer.feed(data)
+                    else:
+                        sel.unregister(key.fd)
+                        lines = framer.flush()
+                    for line in lines:
+                        if is_err:
+                            if line.strip():
+                                log.warning(f"[RECV:STDERR] {line.decode('utf-8', 'replace').strip()[:500]}")
+                        else:
+                            yield line
+        finally:
+            sel.close()
+
+    def messages(self):
+        backoff = 1
+        while not self._stopped:
+            proc = self.proc = self._spawn()
+            started = time.monotonic()
+            for line in self._lines(proc):
+                s = line.strip()
+                if not s:
+                    continue
+                log.debug("[RECV:LINE] %r", s[:500])
+                if self.prefilter and not self.prefilter(s):
+                    continue
+                t0 = time.perf_counter()
+                try:
+                    obj = loads(s)
+                except ValueError:
+                    log.debug("[RECV] non-json: %r", s[:120])
+                    continue
+                PARSE_SECONDS.observe(time.perf_counter() - t0)
+                yield obj
+            rc = proc.wait()
+            if self._stopped:
+                return
+            if time.monotonic() - started > 60:
+                backoff = 1
+            log.warning(f"[RECV] receiver exited rc={rc}; restarting in {backoff}s")
+            RESTARTS.inc()
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def stop(self):
+        self._stopped = True
+        try:
+            if self.proc and self.proc.poll() is None:
+                self.proc.terminate()
+        except Exception:
+            pass
+
+class AsyncReceiveProcess:
+    """
+    `signal-cli -o json receive` als asyncio-Subprozess (gleiches Verhalten wie
+    ReceiveProcess: Neustart mit Backoff, stderr ins Log, Vorfilter vor dem Decode).
+    `messages()` ist ein async Iterator; `stop()` (synchron, aus dem Loop) beendet ihn.
+    """
+    def __init__(self, number, cli="signal-cli", prefilter=None):
+        self.number, self.cli = number, cli
+        self.prefilter = prefilter
+        self.proc = None
+        self._stopped = False
+
+    async def start(self):
+        pass   # Prozess wird beim ersten messages()-Durchlauf gestartet
+
+    async def _drain_stderr(self, stream):
+        async for raw in stream:
+            line = raw.decode("utf-8", "replace").strip()
+            if line:
+                log.warning(f"[RECV:STDERR] {line[:500]}")
+
+    async def messages(self):
+        backoff = 1
+        while not self._stopped:
+            cmd = shlex.split(self.cli) + ["-u", self.number, "-o", "json", "receive"]
+            log.info(f"[RECV] spawn: {' '.join(cmd)}")
+            proc = self.proc = await asyncio.create_subprocess_exec(
+                *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, limit=LINE_LIMIT)
+            errors = asyncio.create_task(self._drain_stderr(proc.stderr))
+            started = time.monotonic()
+            try:
+                while True:
+                    try:
+                        line = await proc.stdout.readline()
+                    except ValueError as e:   # Zeile über LINE_LIMIT
+                        log.warning(f"[RECV] Zeile verworfen: {e}")
+                        continue
+                    if not line:
+                        break
+                    s = line.strip()
+                    if not s:
+                        continue
+                    log.debug("[RECV:LINE] %r", s[:500])
+                    if self.prefilter and not self.prefilter(s):
+                        continue
+                    t0 = time.perf_counter()
+                    try:
+                        obj = loads(s)
+                    except ValueError:
+                        log.debug("[RECV] non-json: %r", s[:120])
+                        continue
+                    PARSE_SECONDS.observe(time.perf_counter() - t0)
+                    yield obj
+                rc = await proc.wait()
+            finally:
+                if proc.returncode is None:
+                    proc.terminate()
+                await errors
+            if self._stopped:
+                return
+            if time.monotonic() - started > 60:
+                backoff = 1
+            log.warning(f"[RECV] receiver exited rc={rc}; restarting in {backoff}s")
+            RESTARTS.inc()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def stop(self):
+        """Empfang beenden; der laufende messages()-Iterator endet nach dem Prozess."""
+        self._stopped = True
+        try:
+            if self.proc and self.proc.returncode is None:
+                self.proc.terminate()
+        except ProcessLookupError:
+            pass
+
+    async def close(self):
+        if self.proc is not None and self.proc.returncode is None:
+            self.proc.terminate()
+            await self.proc.wait()
+
+async def merge_messages_async(sources):
+    """Wie merge_messages, mit einem Task pro Quelle und einer asyncio.Queue."""
+    if len(sources) == 1:
+        async for obj in sources[0].messages():
+            yield obj
+        return
+    q = asyncio.Queue()
+
+    async def pump(src):
+        try:
+            async for obj in src.messages():
+                q.put_nowait(obj)
+        finally:
+            q.put_nowait(_DONE)
+
+    tasks = [asyncio.create_task(pump(src), name=f"recv-{i}") for i, src in enumerate(sources)]
+    running = len(tasks)
+    while running:
+        obj = await q.get()
+        if obj is _DONE:
+            running -= 1
+        else:
+            yield obj
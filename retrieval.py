@@ -0,0 +1,92 @@
+import re, math, zlib
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:   # Standard: NumPy steht nicht in requirements.txt, dann sparse in reinem Python
+    np = None
+
+DIM = 1 << 12
+_WORD_RE = re.compile(r"\w+")
+_MARKUP_RE = re.compile(r"[*_`>•\-–]+")
+
+def _features(text: str) -> Dict[int, float]:
+    """Gehashte Wort- und Zeichen-3/4-Gramm-Zählung (stabil über Prozesse, crc32)."""
+    feats: Dict[int, float] = {}
+    for w in _WORD_RE.findall(_MARKUP_RE.sub(" ", text.lower())):
+        grams = [f"w:{w}"]
+        s = f"<{w}>"
+        for n in (3, 4):
+            grams.extend(s[i:i + n] for i in range(len(s) - n + 1))
+        for g in grams:
+            h = zlib.crc32(g.encode("utf-8")) & (DIM - 1)
+            feats[h] = feats.get(h, 0.0) + 1.0
+    return feats
+
+def _normalize(vec: Dict[int, float]) -> Dict[int, float]:
+    norm = math.sqrt(sum(v * v for v in vec.values()))
+    return {k: v / norm for k, v in vec.items()} if norm else {}
+
+class VectorIndex:
+    """
+    Lokale TF-IDF-Retrieval-Stufe über die FIXED-Einträge (Hashing-Vektorisierer,
+    kein externes Modell). Unterstützter Standard ist der reine Python-Weg über
+    die sparse Vektoren (bei ein paar hundert FIXED-Einträgen im Millisekundenbereich).
+    Ist NumPy installiert, liegen alle Dokumente in einer dichten Matrix und eine
+    Anfrage kostet ein Matrix-Vektor-Produkt plus Top-k-Auswahl – gleiche Ergebnisse.
+    """
+    def __init__(self, keys: List[str], docs: List[Dict[int, float]], idf: Dict[int, float]):
+        self.keys, self.docs, self.idf = keys, docs, idf
+        self._matrix = None
+        if np is not None and docs:
+            m = np.zeros((len(docs), DIM), dtype=np.float32)
+            for row, doc in enumerate(docs):
+                if doc:
+                    m[row, list(doc)] = list(doc.values())
+            self._matrix = m
+
+    @classmethod
+    def build(cls, entries: Dict[str, str]) -> "VectorIndex":
+        keys = list(entries)
+        # Schlüssel doppelt gewichten: er ist das prägnanteste Stichwort
+        raw = [_features(f"{k} {k} {v}") for k, v in entries.items()]
+        df: Dict[int, int] = {}
+        for feats in raw:
+            for h in feats:
+                df[h] = df.get(h, 0) + 1
+        n = len(raw)
+        idf = {h: math.log((1 + n) / (1 + c)) + 1.0 for h, c in df.items()}
+        docs = [_normalize({h: (1 + math.log(tf)) * idf[h] for h, tf in feats.items()}) for feats in raw]
+        return cls(keys, docs, idf)
+
+    def to_state(self) -> tuple:
+        return (self.keys, self.docs, self.idf)
+
+    @classmethod
+    def from_state(cls, state: tuple) -> "VectorIndex":
+        return cls(*state)
+
+    def _query(self, text: str) -> Dict[int, float]:
+        feats = _features(text)
+        return _normalize({h: (1 + math.log(tf)) * self.idf[h] for h, tf in feats.items() if h in self.idf})
+
+    def search(self, text: str, k: int = 3) -> List[Tuple[str, float]]:
+        """Top-k (key, Kosinus-Ähnlichkeit), absteigend sortiert."""
+        q = self._query(text)
+        if not q or not self.keys:
+            return []
+        if self._matrix is not None:
+            qv = np.zeros(DIM, dtype=np.float32)
+            qv[list(q)] = list(q.values())
+            scores = self._matrix @ qv
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self.keys[i], float(scores[i])) for i in top]
+        scored = [(sum(w * doc.get(h, 0.0) for h, w in q.items()), i) for i, doc in enumerate(self.docs)]
+        scored.sort(key=lambda x: (-x[0], x[1]))
+        return [(self.keys[i], s) for s, i in scored[:k]]
+
+    def best(self, text: str) -> Optional[Tuple[str, float]]:
+        top = self.search(text, 1)
+        return top[0] if top else None
@@ -0,0 +1,447 @@
+import json, time, shlex, queue, socket, asyncio, itertools, threading, subprocess, logging
+from metrics import counter, histogram
+from envelopes import loads, LINE_LIMIT
+log = logging.getLogger("borgo")
+
+PARSE_SECONDS = histogram("borgo_stage_seconds", "Dauer je Verarbeitungsstufe", ("stage",)).labels("parse")
+RESTARTS = counter("borgo_receiver_restarts_total", "Neustarts der Empfangsquelle", ("source",)).labels("rpc")
+SEND_RETRIES = counter("borgo_send_retries_total", "Wiederholte Sendeversuche")
+
+class SignalRpcError(Exception): pass
+
+class _Pending:
+    __slots__ = ("event", "result", "error")
+    def __init__(self):
+        self.event, self.result, self.error = threading.Event(), None, None
+
+class SignalRpcClient:
+    """
+    JSON-RPC-Client für einen langlebigen signal-cli-Prozess.
+    Entweder wird `signal-cli -a <number> jsonRpc` selbst gestartet (stdin/stdout)
+    oder an einen laufenden `signal-cli daemon --socket <path>` angedockt.
+    Antworten werden über die Request-ID zugeordnet; bricht die Verbindung ab,
+    wird beim nächsten Aufruf mit Backoff neu verbunden.
+    """
+    def __init__(self, number, cli="signal-cli", socket_path="", timeout=30.0,
+                 on_notification=None, on_disconnect=None, prefilter=None):
+        self.number, self.cli, self.socket_path, self.timeout = number, cli, socket_path, timeout
+        self.on_notification, self.on_disconnect = on_notification, on_disconnect
+        self.prefilter = prefilter           # bytes -> bool, nur für Notifications
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._lock = threading.Lock()        # Verbindungsaufbau + Schreiben
+        self._conn = None                    # (proc|sock, rfile, wfile)
+        self._backoff, self._next_attempt = 1.0, 0.0
+
+    # ---------- Verbindung ----------
+    def _connect(self):
+        if self.socket_path:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.socket_path)
+            conn = (sock, sock.makefile("rb"), sock.makefile("wb"))
+            log.info(f"[RPC] verbunden: {self.socket_path}")
+        else:
+            cmd = shlex.split(self.cli) + ["-a", self.number, "jsonRpc"]
+            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            conn = (proc, proc.stdout, proc.stdin)
+            threading.Thread(target=self._drain_stderr, args=(proc.stderr,), name="rpc-stderr", daemon=True).start()
+            log.info(f"[RPC] spawn: {' '.join(cmd)} (pid={proc.pid})")
+        threading.Thread(target=self._read_loop, args=(conn,), name="rpc-reader", daemon=True).start()
+        return conn
+
+    def _ensure_connected(self):
+        if self._conn is not None:
+            return self._conn
+        now = time.monotonic()
+        if now < self._next_attempt:
+            raise SignalRpcError(f"reconnect in {self._next_attempt - now:.1f}s")
+        try:
+            self._conn = self._connect()
+            self._backoff = 1.0
+            return self._conn
+        except OSError as e:
+            self._next_attempt = now + self._backoff
+            self._backoff = min(self._backoff * 2, 30.0)
+            raise SignalRpcError(f"Verbindung fehlgeschlagen: {e}") from None
+
+    def connect(self):
+        with self._lock:
+            self._ensure_connected()
+
+    @property
+    def connected(self):
+        return self._conn is not None
+
+    def _drop(self, conn, reason):
+        with self._lock:
+            if self._conn is not conn:
+                current = False
+            else:
+                self._conn, current = None, True
+            lost = [rid for rid, (c, _) in self._pending.items() if c is conn]
+            lost = [self._pending.pop(rid)[1] for rid in lost]
+        for p in lost:
+            p.error = SignalRpcError(reason)
+            p.event.set()
+        handle = conn[0]
+        try:
+            if isinstance(handle, socket.socket):
+                handle.close()
+            elif handle.poll() is None:
+                handle.terminate()
+        except Exception:
+            pass
+        if current and self.on_disconnect:
+            self.on_disconnect(reason)
+
+    def _drain_stderr(self, f):
+        for raw in f:
+            line = raw.decode("utf-8", "replace").strip()
+            if line:
+                log.warning(f"[RPC:STDERR] {line[:500]}")
+
+    def _read_loop(self, conn):
+        rfile = conn[1]
+        try:
+            for raw in rfile:
+                # Notifications ohne Bot-Relevanz gar nicht erst dekodieren
+                if self.prefilter and b'"method"' in raw and not self.prefilter(raw):
+                    continue
+                t0 = time.perf_counter()
+                try:
+                    obj = loads(raw)
+                except ValueError:
+                    log.debug("[RPC] non-json: %r", raw[:120])
+                    continue
+                PARSE_SECONDS.observe(time.perf_counter() - t0)
+                if "method" in obj:
+                    if self.on_notification:
+                        self.on_notification(obj)
+                    continue
+                with self._lock:
+                    _, p = self._pending.pop(obj.get("id"), (None, None))
+                if p is None:
+                    continue
+                if "error" in obj:
+                    p.error = SignalRpcError((obj["error"] or {}).get("message", "unbekannter Fehler"))
+                else:
+                    p.result = obj.get("result")
+                p.event.set()
+        except (OSError, ValueError):
+            pass
+        log.warning("[RPC] Verbindung beendet")
+        self._drop(conn, "Verbindung verloren")
+
+    # ---------- Aufrufe ----------
+    def call(self, method, params=None, timeout=None):
+        rid = next(self._ids)
+        p = _Pending()
+        msg = json.dumps({"jsonrpc": "2.0", "id": rid, "method": method, "params": params or {}},
+                         ensure_ascii=False).encode("utf-8") + b"\n"
+        with self._lock:
+            conn = self._ensure_connected()
+            self._pending[rid] = (conn, p)
+            try:
+                conn[2].write(msg)
+                conn[2].flush()
+            except OSError as e:
+                self._pending.pop(rid, None)
+                failed = e
+            else:
+                failed = None
+        if failed is not None:
+            self._drop(conn, str(failed))
+            raise SignalRpcError(f"Schreiben fehlgeschlagen: {failed}")
+        if not p.event.wait(timeout or self.timeout):
+            with self._lock:
+                self._pending.pop(rid, None)
+            raise SignalRpcError(f"Timeout bei {method}")
+        if p.error:
+            raise p.error
+        return p.result
+
+    def send_message(self, text, group_id=None, retry=3, wait=1.0):
+        """Wie utils.send_signal_message, aber über die bestehende Verbindung."""
+        params = {"message": text}
+        if group_id:
+            params["groupId"] = group_id
+        else:
+            params["recipient"] = [self.number]
+        for attempt in range(retry):
+            if attempt:
+                SEND_RETRIES.inc()
+            try:
+                self.call("send", params)
+                return True
+            except SignalRpcError as e:
+                log.warning(f"[SEND:RPC] {e}")
+                time.sleep(wait)
+        return False
+
+    def close(self):
+        with self._lock:
+            conn = self._conn
+        if conn is not None:
+            self._drop(conn, "geschlossen")
+
+_STOP = object()
+
+class SignalSession:
+    """
+    Eine einzige signal-cli-Sitzung (jsonRpc) für Empfang und Versand.
+    Eingehende `receive`-Notifications landen in einer Queue, die `messages()`
+    als Envelope-Objekte liefert (gleiches Format wie `-o json receive`);
+    `send_message` nutzt dieselbe Verbindung. Ein Supervisor-Thread hält die
+    Verbindung offen und startet sie nach Abbruch mit Backoff neu.
+    """
+    def __init__(self, number, cli="signal-cli", socket_path="", timeout=30.0, prefilter=None):
+        self.client = SignalRpcClient(number, cli=cli, socket_path=socket_path, timeout=timeout,
+                                      on_notification=self._on_notification, on_disconnect=self._on_disconnect,
+                                      prefilter=prefilter)
+        # unbegrenzt: der RPC-Reader darf nie blockieren, sonst hängen auch die Send-Antworten
+        self._inbox = queue.Queue()
+        self._down = threading.Event()
+        self._stop = threading.Event()
+        self._supervisor = None
+
+    def _on_notification(self, obj):
+        if obj.get("method") == "receive" and isinstance(obj.get("params"), dict):
+            self._inbox.put(obj["params"])
+
+    def _on_disconnect(self, reason):
+        self._down.set()
+
+    def start(self):
+        if self._supervisor is None:
+            self._supervisor = threading.Thread(target=self._supervise, name="rpc-session", daemon=True)
+            self._supervisor.start()
+
+    def _supervise(self):
+        backoff = 1
+        while not self._stop.is_set():
+            try:
+                self.client.connect()
+            except SignalRpcError as e:
+                log.warning(f"[RPC] Sitzung nicht verfügbar ({e}); neuer Versuch in {backoff}s")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+            up_since = time.monotonic()
+            while self.client.connected and not self._stop.is_set():
+                self._down.wait(5.0)
+                self._down.clear()
+            if self._stop.is_set():
+                return
+            if time.monotonic() - up_since > 60:
+                backoff = 1
+            log.warning(f"[RPC] Sitzung beendet; Neustart in {backoff}s")
+            RESTARTS.inc()
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def messages(self):
+        while True:
+            item = self._inbox.get()
+            if item is _STOP:
+                return
+            yield item
+
+    def send_message(self, text, group_id=None, retry=3, wait=1.0):
+        return self.client.send_message(text, group_id, retry=retry, wait=wait)
+
+    def stop(self):
+        self._stop.set()
+        self._inbox.put(_STOP)
+        self.client.close()
+        self._down.set()
+
+class AsyncSignalSession:
+    """
+    asyncio-Variante von SignalSession: eine jsonRpc-Verbindung (eigener
+    `signal-cli jsonRpc`-Subprozess oder Socket eines Daemons) für Empfang und
+    Versand. Der Supervisor-Task liest die Verbindung, ordnet Antworten per id
+    ihren Futures zu, stellt `receive`-Notifications in eine asyncio.Queue und
+    verbindet nach Abbruch mit Backoff neu. Nur aus einem Event-Loop benutzen.
+    """
+    def __init__(self, number, cli="signal-cli", socket_path="", timeout=30.0, prefilter=None):
+        self.number, self.cli, self.socket_path, self.timeout = number, cli, socket_path, timeout
+        self.prefilter = prefilter
+        self._ids = itertools.count(1)
+        self._pending = {}              # id -> Future
+        self._inbox = asyncio.Queue()   # unbegrenzt, wie bei SignalSession
+        self._conn = None               # (writer, proc|None)
+        self._up = asyncio.Event()
+        self._receiving, self._closed = True, False
+        self._supervisor = None
+
+    async def start(self):
+        if self._supervisor is None:
+            self._supervisor = asyncio.create_task(self._supervise(), name="rpc-session")
+
+    @property
+    def connected(self):
+        return self._conn is not None
+
+    # ---------- Verbindung ----------
+    async def _connect(self):
+        if self.socket_path:
+            reader, writer = await asyncio.open_unix_connection(self.socket_path, limit=LINE_LIMIT)
+            log.info(f"[RPC] verbunden: {self.socket_path}")
+            return reader, writer, None
+        cmd = shlex.split(self.cli) + ["-a", self.number, "jsonRpc"]
+        proc = await asyncio.create_subprocess_exec(*cmd, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+                                                    stderr=asyncio.subprocess.PIPE, limit=LINE_LIMIT)
+        asyncio.create_task(self._drain_stderr(proc.stderr), name="rpc-stderr")
+        log.info(f"[RPC] spawn: {' '.join(cmd)} (pid={proc.pid})")
+        return proc.stdout, proc.stdin, proc
+
+    async def _drain_stderr(self, stream):
+        async for raw in stream:
+            line = raw.decode("utf-8", "replace").strip()
+            if line:
+                log.warning(f"[RPC:STDERR] {line[:500]}")
+
+    async def _supervise(self):
+        backoff = 1
+        while not self._closed:
+            try:
+                reader, writer, proc = await self._connect()
+            except OSError as e:
+                log.warning(f"[RPC] Sitzung nicht verfügbar ({e}); neuer Versuch in {backoff}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+            self._conn = (writer, proc)
+            self._up.set()
+            up_since = time.monotonic()
+            try:
+                await self._read_loop(reader)
+            finally:
+                self._drop("Verbindung verloren")
+            if proc is not None:
+                await self._reap(proc)   # Prozess abholen, bevor ein neuer startet
+            if self._closed:
+                return
+            if time.monotonic() - up_since > 60:
+                backoff = 1
+            log.warning(f"[RPC] Sitzung beendet; Neustart in {backoff}s")
+            RESTARTS.inc()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    async def _read_loop(self, reader):
+        while True:
+            try:
+                raw = await reader.readline()
+            except ValueError as e:   # Zeile über LINE_LIMIT
+                log.warning(f"[RPC] Zeile verworfen: {e}")
+                continue
+            except OSError:
+                break
+            if not raw:
+                break
+            if self.prefilter and b'"method"' in raw and not self.prefilter(raw):
+                continue
+            t0 = time.perf_counter()
+            try:
+                obj = loads(raw)
+            except ValueError:
+                log.debug("[RPC] non-json: %r", raw[:120])
+                continue
+            PARSE_SECONDS.observe(time.perf_counter() - t0)
+            if "method" in obj:
+                if self._receiving and obj.get("method") == "receive" and isinstance(obj.get("params"), dict):
+                    self._inbox.put_nowait(obj["params"])
+                continue
+            fut = self._pending.pop(obj.get("id"), None)
+            if fut is None or fut.done():
+                continue
+            if "error" in obj:
+                fut.set_exception(SignalRpcError((obj["error"] or {}).get("message", "unbekannter Fehler")))
+            else:
+                fut.set_result(obj.get("result"))
+        log.warning("[RPC] Verbindung beendet")
+
+    @staticmethod
+    async def _reap(proc, timeout=5.0):
+        """Auf den (per _drop beendeten) Subprozess warten; hängt er, kill."""
+        try:
+            async with asyncio.timeout(timeout):
+                await proc.wait()
+        except TimeoutError:
+            proc.kill()
+            await proc.wait()
+
+    def _drop(self, reason):
+        conn, self._conn = self._conn, None
+        self._up.clear()
+        pending, self._pending = self._pending, {}
+        for fut in pending.values():
+            if not fut.done():
+                fut.set_exception(SignalRpcError(reason))
+        if conn is None:
+            return
+        writer, proc = conn
+        writer.close()
+        if proc is not None and proc.returncode is None:
+            proc.terminate()
+
+    # ---------- Aufrufe ----------
+    async def call(self, method, params=None, timeout=None):
+        rid = next(self._ids)
+        msg = json.dumps({"jsonrpc": "2.0", "id": rid, "method": method, "params": params or {}},
+                         ensure_ascii=False).encode("utf-8") + b"\n"
+        try:
+            async with asyncio.timeout(timeout or self.timeout):
+                await self._up.wait()   # während eines Neustarts auf die Verbindung warten
+                fut = self._pending[rid] = asyncio.get_running_loop().create_future()
+                writer = self._conn[0]
+                writer.write(msg)
+                await writer.drain()
+                return await fut
+        except TimeoutError:
+            raise SignalRpcError(f"Timeout bei {method}") from None
+        except (OSError, ConnectionError) as e:
+            raise SignalRpcError(f"Schreiben fehlgeschlagen: {e}") from None
+        finally:
+            self._pending.pop(rid, None)
+
+    async def send_message(self, text, group_id=None, retry=3, wait=1.0):
+        params = {"message": text}
+        if group_id:
+            params["groupId"] = group_id
+        else:
+            params["recipient"] = [self.number]
+        for attempt in range(retry):
+            if attempt:
+                SEND_RETRIES.inc()
+            try:
+                await self.call("send", params)
+                return True
+            except SignalRpcError as e:
+                log.warning(f"[SEND:RPC] {e}")
+                await asyncio.sleep(wait)
+        return False
+
+    async def messages(self):
+        while True:
+            item = await self._inbox.get()
+            if item is _STOP:
+                return
+            yield item
+
+    def stop(self):
+        """Nur den Empfang beenden; Senden über die Verbindung bleibt bis `close()` möglich."""
+        self._receiving = False
+        self._inbox.put_nowait(_STOP)
+
+    async def close(self):
+        self._closed = True
+        proc = self._conn[1] if self._conn is not None else None
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            await asyncio.gather(self._supervisor, return_exceptions=True)
+        self._drop("geschlossen")
+        self._up.clear()
+        if proc is not None:
+            await self._reap(proc)
@@ -0,0 +1,65 @@
+import re, time, threading, logging
+log = logging.getLogger("borgo")
+
+# Satzende: . ! ? … (optional gefolgt von Anführungszeichen/Klammer) + Leerraum, oder Absatz
+_BOUNDARY_RE = re.compile(r"[.!?…][\"'»“)\]]*\s+|\n\s*\n")
+
+class ChunkedReply:
+    """
+    Verschickt eine gestreamte LLM-Antwort stückweise: der erste vollständige
+    Satz geht sofort raus, danach werden fertige Sätze gesammelt und höchstens
+    alle `min_interval` Sekunden gesendet; `finish()` schickt den Rest,
+    `abort(note)` verwirft ihn (Generierung abgebrochen) und schickt stattdessen `note`.
+    """
+    def __init__(self, send, min_interval=3.0, first_min_chars=20):
+        self.send, self.min_interval, self.first_min_chars = send, min_interval, first_min_chars
+        self._buf = ""
+        self._last_send = 0.0
+        self._lock = threading.Lock()
+        self.chunks = 0
+
+    @property
+    def started(self):
+        return self.chunks > 0
+
+    def _cut(self) -> int:
+        """Position hinter der letzten Satzgrenze im Puffer (0 = keine)."""
+        end = 0
+        for m in _BOUNDARY_RE.finditer(self._buf):
+            if m.end() >= self.first_min_chars or self.chunks:
+                end = m.end()
+                if not self.chunks:
+                    break   # erstes Stück: nur der erste Satz, damit es schnell rausgeht
+        return end
+
+    def _emit(self, text):
+        text = text.strip()
+        if not text:
+            return
+        self.chunks += 1
+        self._last_send = time.monotonic()
+        self.send(text)
+
+    def feed(self, token: str):
+        with self._lock:
+            self._buf += token
+            if self.chunks and time.monotonic() - self._last_send < self.min_interval:
+                return
+            end = self._cut()
+            if end:
+                chunk, self._buf = self._buf[:end], self._buf[end:]
+                self._emit(chunk)
+
+    def finish(self):
+        with self._lock:
+            rest, self._buf = self._buf, ""
+            self._emit(rest)
+        log.debug("[STREAM] %d Teilnachrichten", self.chunks)
+
+    def abort(self, note=None):
+        """Halben Satz im Puffer verwerfen; `note` nur, wenn schon etwas gesendet wurde."""
+        with self._lock:
+            dropped, self._buf = len(self._buf), ""
+            if self.chunks and note:
+                self._emit(note)
+        log.debug("[STREAM] abgebrochen nach %d Teilnachrichten, %d Zeichen verworfen", self.chunks, dropped)
@@ -0,0 +1,127 @@
+import json, logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import Config
+from fixed_responses import FIXED_LOADER, FixedResponsesLoader
+from local_llm_interface import DEFAULT_PERSONA, Persona
+
+log = logging.getLogger("borgo")
+
+class TenantError(ValueError):
+    pass
+
+class Tenant:
+    """Ein Objekt (Ferienhaus, Borgo …): Bot-Konto, Gruppen, eigene FIXED-Datei und LLM-Persona."""
+    __slots__ = ("name", "number", "groups", "fixed", "persona")
+
+    def __init__(self, name: str, number: str, groups: List[str], fixed: FixedResponsesLoader,
+                 persona: Persona = DEFAULT_PERSONA):
+        self.name, self.number, self.groups, self.fixed, self.persona = name, number, groups, fixed, persona
+
+    def __repr__(self):
+        return f"Tenant({self.name!r}, {self.number}, {len(self.groups)} Gruppe(n))"
+
+class TenantRouter:
+    """
+    Ordnet eingehende Nachrichten per groupId (dict, O(1)) ihrem Tenant zu.
+    Höchstens ein Tenant darf "*" als Gruppe haben; er bekommt alle übrigen
+    Gruppen (und Nachrichten ohne Gruppe). Antworten gehen über das Konto des
+    Tenants an die Gruppe, aus der die Frage kam.
+    """
+    def __init__(self, tenants: List[Tenant]):
+        if not tenants:
+            raise TenantError("keine Tenants konfiguriert")
+        self.tenants = tenants
+        self.default: Optional[Tenant] = None
+        self._by_group: Dict[str, Tenant] = {}
+        names = set()
+        for t in tenants:
+            if t.name in names:
+                raise TenantError(f"Tenant {t.name!r} doppelt")
+            names.add(t.name)
+            for gid in t.groups:
+                if gid == "*":
+                    if self.default is not None:
+                        raise TenantError(f"'*' bei {self.default.name!r} und {t.name!r} – nur ein Tenant darf alle Gruppen nehmen")
+                    self.default = t
+                elif gid in self._by_group:
+                    raise TenantError(f"Gruppe {gid} bei {self._by_group[gid].name!r} und {t.name!r}")
+                else:
+                    self._by_group[gid] = t
+        self.numbers = frozenset(t.number for t in tenants)
+        self.accounts = list(dict.fromkeys(t.number for t in tenants))   # Reihenfolge der Datei
+
+    def route(self, group_id: Optional[str]) -> Optional[Tenant]:
+        return self._by_group.get(group_id, self.default) if group_id else self.default
+
+    def groups(self) -> Optional[List[str]]:
+        """Alle fest zugeordneten Gruppen (für den Vorfilter); None, wenn ein Tenant "*" hat."""
+        return None if self.default is not None else list(self._by_group)
+
+    def loaders(self) -> List[FixedResponsesLoader]:
+        return list({id(t.fixed): t.fixed for t in self.tenants}.values())
+
+def _loader(path: str, loaders: Dict[str, FixedResponsesLoader], base: Optional[Path] = None) -> FixedResponsesLoader:
+    """
+    Ein Loader pro Datei; die Standard-FIXED_FILE nutzt den globalen FIXED_LOADER.
+    Relative Pfade gelten ab `base` (Verzeichnis der TENANTS_FILE), nicht ab dem Arbeitsverzeichnis.
+    """
+    p = Path(path).expanduser()
+    if base is not None and not p.is_absolute():
+        p = base / p
+    path = str(p.resolve())
+    if path == Config.FIXED_FILE:
+        return FIXED_LOADER
+    if path not in loaders:
+        loaders[path] = FixedResponsesLoader(path, ttl=Config.FIXED_TTL, snapshot=Config.FIXED_SNAPSHOT)
+    return loaders[path]
+
+def load_tenants(path: str) -> TenantRouter:
+    """
+    TENANTS_FILE (JSON):
+        {"tenants": [{"name": "batone", "number": "+49…", "groups": ["…", "…"],
+                      "fixed_file": "FIXED_RESPONSES.txt", "display_name": "Borgo Batone",
+                      "system_prompt": "You are …"}, …]}
+    `number` und `fixed_file` sind optional (Default SIGNAL_NUMBER bzw. FIXED_FILE;
+    ein relativer `fixed_file` gilt ab dem Verzeichnis der TENANTS_FILE),
+    `groups` ist eine Liste von groupIds oder "*". `display_name` (Überschrift der
+    Fakten im LLM-Prompt) und `system_prompt` sind optional, Default ist der
+    Borgo-Batone-Text aus local_llm_interface.
+    """
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        raise TenantError(f"{path}: {e}") from None
+    entries = data.get("tenants") if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        raise TenantError(f"{path}: erwartet {{\"tenants\": [...]}}")
+    loaders, tenants = {}, []
+    for i, e in enumerate(entries):
+        if not isinstance(e, dict):
+            raise TenantError(f"{path}: Eintrag {i} ist kein Objekt")
+        name = str(e.get("name") or f"tenant-{i}")
+        number = str(e.get("number") or Config.SIGNAL_NUMBER).strip()
+        groups = e.get("groups")
+        groups = [groups] if isinstance(groups, str) else groups
+        if not number:
+            raise TenantError(f"{path}: {name}: number fehlt (und SIGNAL_NUMBER ist leer)")
+        if not groups or not all(isinstance(g, str) and g.strip() for g in groups):
+            raise TenantError(f"{path}: {name}: groups muss eine nicht-leere Liste von groupIds sein")
+        fixed = _loader(e.get("fixed_file") or Config.FIXED_FILE, loaders, Path(path).parent)
+        persona = Persona(str(e.get("system_prompt") or DEFAULT_PERSONA.system).strip(),
+                          str(e.get("display_name") or DEFAULT_PERSONA.label).strip())
+        tenants.append(Tenant(name, number, [g.strip() for g in groups], fixed, persona))
+    return TenantRouter(tenants)
+
+def default_router() -> TenantRouter:
+    """Ohne TENANTS_FILE: ein Tenant aus SIGNAL_NUMBER, SIGNAL_GROUP_ID und FIXED_FILE."""
+    return TenantRouter([Tenant("default", Config.SIGNAL_NUMBER, [Config.SIGNAL_GROUP_ID or "*"], FIXED_LOADER)])
+
+_ROUTER: Optional[TenantRouter] = None
+
+def get_router() -> TenantRouter:
+    global _ROUTER
+    if _ROUTER is None:
+        _ROUTER = load_tenants(Config.TENANTS_FILE) if Config.TENANTS_FILE else default_router()
+    return _ROUTER
@@ -0,0 +1,8 @@
+import os, sys, tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+# Module liegen flach im Repo-Root, die Fakes (signal-cli, Ollama) in bench/
+sys.path[:0] = [str(ROOT), str(ROOT / "bench")]
+# bot_v2.setup_logging() legt LOG_FILE beim Import an – nicht im Repo (logs/)
+os.environ["LOG_FILE"] = os.path.join(tempfile.mkdtemp(prefix="borgo-tests-"), "bot.log")
@@ -0,0 +1,58 @@
+"""SQLiteDedupStore: inline (Thread-Kern) und mit Schreiber-Thread (asyncio-Kern)."""
+import threading
+import time
+
+import pytest
+
+from dedup_store import SQLiteDedupStore
+
+@pytest.fixture(params=[False, True], ids=["inline", "writer"])
+def writer(request):
+    return request.param
+
+def test_seen_and_persisted(tmp_path, writer):
+    db = tmp_path / "dedup.sqlite3"
+    store = SQLiteDedupStore(str(db), batch=4, flush_interval=0.05, writer=writer)
+    for i in range(10):
+        store.add(f"m{i}")
+    assert "m3" in store and "x" not in store
+    store.close()
+    store = SQLiteDedupStore(str(db), hot=1, writer=writer)
+    try:
+        assert all(f"m{i}" in store for i in range(10))
+        assert len(store) == 10
+    finally:
+        store.close()
+
+def test_writer_commits_off_caller_thread(tmp_path, monkeypatch):
+    store = SQLiteDedupStore(str(tmp_path / "dedup.sqlite3"), batch=2, flush_interval=0.05,
+                             compact_interval=0.05, writer=True)
+    threads, commit = set(), SQLiteDedupStore._commit
+    def record(self, rows):
+        if rows:
+            threads.add(threading.current_thread().name)
+        commit(self, rows)
+    monkeypatch.setattr(SQLiteDedupStore, "_commit", record)
+    try:
+        for i in range(6):
+            store.add(f"m{i}")
+            assert f"m{i}" in store
+        deadline = time.monotonic() + 2
+        while store.stats()["pending"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert store.stats()["pending"] == 0
+        assert threads == {"dedup-writer"}
+    finally:
+        store.close()
+
+def test_expired_entries_are_compacted(tmp_path, writer):
+    store = SQLiteDedupStore(str(tmp_path / "dedup.sqlite3"), ttl=0.05, hot=1, writer=writer)
+    try:
+        store.add("alt")
+        store.flush()
+        time.sleep(0.1)
+        assert "alt" not in store
+        store.compact()
+        assert len(store) == 0
+    finally:
+        store.close()
@@ -0,0 +1,100 @@
+"""OllamaClient/AsyncOllamaClient gegen den lokalen Fake-Server (bench/fake_ollama.py)."""
+import asyncio
+import time
+
+import pytest
+
+import fake_ollama
+from local_llm_interface import OllamaClient, AsyncOllamaClient, LLMError
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(fake_ollama, "LOAD", 0.0)
+    monkeypatch.setattr(fake_ollama, "TOKEN", 0.001)
+    monkeypatch.setattr(fake_ollama, "TOKENS", 12)
+    srv, url = fake_ollama.make_server()
+    yield url
+    srv.shutdown()
+    srv.server_close()
+
+def expected_text(n):
+    return "".join(fake_ollama.tokens(n)).strip()
+
+# ---------------- OllamaClient ----------------
+def test_streams_ndjson_tokens(server):
+    client, seen = OllamaClient(server), []
+    gen = client.generate("hallo", "m", timeout=5, max_tokens=8, on_token=seen.append)
+    assert seen == list(fake_ollama.tokens(8))   # num_predict begrenzt, jedes Token einzeln
+    assert gen.text == expected_text(8)
+    assert gen.completion_tokens == 8
+    assert 0 < gen.ttft <= gen.total
+
+def test_timeout_raises_llmerror(server, monkeypatch):
+    monkeypatch.setattr(fake_ollama, "TOKEN", 0.1)
+    t0 = time.monotonic()
+    with pytest.raises(LLMError, match="Timeout"):
+        OllamaClient(server).generate("hallo", "m", timeout=0.3)
+    assert time.monotonic() - t0 < 1.0
+
+def test_pooled_connection_is_reused(server):
+    client = OllamaClient(server)
+    client.generate("eins", "m", timeout=5)
+    conn = client._pool.queue[0]
+    sock = conn.sock
+    client.generate("zwei", "m", timeout=5)
+    assert client._pool.queue == [conn] and conn.sock is sock
+
+def test_pooled_connection_after_server_close(server, monkeypatch):
+    monkeypatch.setattr(fake_ollama._Handler, "timeout", 0.1)   # Server schließt Leerlauf-Verbindungen
+    client = OllamaClient(server)
+    client.generate("eins", "m", timeout=5)
+    time.sleep(0.3)
+    assert client.generate("zwei", "m", timeout=5).text == expected_text(12)
+
+def test_non_200_raises_llmerror(server, monkeypatch):
+    monkeypatch.setattr(fake_ollama, "MODELS", ["m"])
+    client = OllamaClient(server)
+    with pytest.raises(LLMError, match="HTTP 404.*not found"):
+        client.generate("hallo", "fehlt", timeout=5)
+    assert client.generate("hallo", "m", timeout=5).text == expected_text(12)
+
+# ---------------- AsyncOllamaClient ----------------
+def test_async_streams_ndjson_tokens(server):
+    seen = []
+    gen = asyncio.run(AsyncOllamaClient(server).generate("hallo", "m", timeout=5, max_tokens=8,
+                                                         on_token=seen.append))
+    assert seen == list(fake_ollama.tokens(8))
+    assert gen.text == expected_text(8)
+    assert gen.completion_tokens == 8
+
+def test_async_timeout_raises_llmerror(server, monkeypatch):
+    monkeypatch.setattr(fake_ollama, "TOKEN", 0.1)
+    with pytest.raises(LLMError, match="Timeout"):
+        asyncio.run(AsyncOllamaClient(server).generate("hallo", "m", timeout=0.3))
+
+def test_async_pooled_connection_is_reused(server):
+    async def run():
+        client = AsyncOllamaClient(server)
+        await client.generate("eins", "m", timeout=5)
+        conn = client._pool[0]
+        await client.generate("zwei", "m", timeout=5)
+        return client._pool == [conn]
+    assert asyncio.run(run())
+
+def test_async_pooled_connection_after_server_close(server, monkeypatch):
+    monkeypatch.setattr(fake_ollama._Handler, "timeout", 0.1)
+    async def run():
+        client = AsyncOllamaClient(server)
+        await client.generate("eins", "m", timeout=5)
+        await asyncio.sleep(0.3)
+        return await client.generate("zwei", "m", timeout=5)
+    assert asyncio.run(run()).text == expected_text(12)
+
+def test_async_non_200_raises_llmerror(server, monkeypatch):
+    monkeypatch.setattr(fake_ollama, "MODELS", ["m"])
+    async def run():
+        client = AsyncOllamaClient(server)
+        with pytest.raises(LLMError, match="HTTP 404.*not found"):
+            await client.generate("hallo", "fehlt", timeout=5)
+        return await client.generate("hallo", "m", timeout=5)
+    assert asyncio.run(run()).text == expected_text(12)
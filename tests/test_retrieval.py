@@ -0,0 +1,41 @@
+"""VectorIndex: reiner Python-Weg (Standard) und, falls installiert, NumPy liefern dasselbe."""
+import pytest
+
+import retrieval
+from retrieval import VectorIndex
+
+ENTRIES = {
+    "wlan": "Das WLAN heißt Borgo-Gast, das Passwort steht am Kühlschrank.",
+    "grill": "Der Grill steht hinter dem Haus, Kohle liegt im Schuppen.",
+    "pool": "Der Pool ist von 9 bis 20 Uhr geöffnet.",
+    "müll": "Mülltonnen stehen an der Einfahrt, Abholung ist dienstags.",
+}
+
+@pytest.fixture(params=["python", "numpy"])
+def index(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(retrieval, "np", None)
+    elif retrieval.np is None:
+        pytest.skip("numpy nicht installiert (optional)")
+    return VectorIndex.build(ENTRIES)
+
+def test_best_match(index):
+    assert index.best("wie ist das wlan passwort")[0] == "wlan"
+    assert index.best("wo ist der grill")[0] == "grill"
+
+def test_search_sorted_top_k(index):
+    top = index.search("wann hat der pool geöffnet", 3)
+    assert len(top) == 3 and top[0][0] == "pool"
+    assert [s for _, s in top] == sorted((s for _, s in top), reverse=True)
+
+def test_no_overlap_is_empty(index):
+    assert index.search("", 3) == []
+
+def test_numpy_matches_pure_python(monkeypatch):
+    if retrieval.np is None:
+        pytest.skip("numpy nicht installiert (optional)")
+    dense = VectorIndex.build(ENTRIES).search("grill kohle", 4)
+    monkeypatch.setattr(retrieval, "np", None)
+    sparse = VectorIndex.build(ENTRIES).search("grill kohle", 4)
+    assert [k for k, _ in dense] == [k for k, _ in sparse]
+    assert [s for _, s in dense] == pytest.approx([s for _, s in sparse], abs=1e-5)
@@ -0,0 +1,161 @@
+"""SignalSession/AsyncSignalSession gegen den Fake-Daemon (bench/fake_signal_cli.py jsonRpc)."""
+import asyncio
+import json
+import sys
+import threading
+import time
+
+import pytest
+
+from conftest import ROOT
+from signal_rpc import SignalSession, AsyncSignalSession, SEND_RETRIES
+
+FAKE_CLI = f"{sys.executable} {ROOT / 'bench' / 'fake_signal_cli.py'}"
+NUMBER, GROUP = "+4915100000000", "R1JPVVA="
+
+def envelope(ts, text):
+    return {"envelope": {"source": "+4915111111111", "timestamp": ts,
+                         "dataMessage": {"message": text, "groupInfo": {"groupId": GROUP}}}}
+
+@pytest.fixture
+def fake(tmp_path, monkeypatch):
+    """Umgebung für den Fake; liefert die Datei, in der jeder erfolgreiche Send landet."""
+    sent = tmp_path / "sent.jsonl"
+    monkeypatch.setenv("FAKE_STARTUP", "0")
+    monkeypatch.setenv("FAKE_SEND_LATENCY", "0")
+    monkeypatch.setenv("FAKE_SIGNAL_LOG", str(sent))
+    return sent
+
+def sent_messages(path):
+    return [json.loads(l) for l in path.read_text(encoding="utf-8").splitlines()] if path.exists() else []
+
+def wait_until(pred, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not pred():
+        assert time.monotonic() < deadline, "Timeout"
+        time.sleep(0.02)
+
+@pytest.fixture
+def session(fake):
+    s = SignalSession(NUMBER, cli=FAKE_CLI, timeout=5)
+    s.start()
+    yield s
+    s.stop()
+
+# ---------------- SignalSession ----------------
+def test_send_is_acked(session, fake):
+    assert session.send_message("hallo", GROUP, retry=1)
+    assert [(m["account"], m["groupId"], m["message"]) for m in sent_messages(fake)] == [(NUMBER, GROUP, "hallo")]
+
+def test_error_response_retries_then_false(fake, monkeypatch):
+    monkeypatch.setenv("FAKE_SEND_FAIL", "1")
+    s = SignalSession(NUMBER, cli=FAKE_CLI, timeout=5)
+    s.start()
+    try:
+        before = SEND_RETRIES.labels().value
+        assert s.send_message("hallo", GROUP, retry=3, wait=0) is False
+        assert SEND_RETRIES.labels().value - before == 2
+        assert sent_messages(fake) == []
+    finally:
+        s.stop()
+
+def test_daemon_exit_reconnects(session, fake):
+    wait_until(lambda: session.client.connected)
+    old = session.client._conn[0]
+    old.kill()
+    old.wait()
+    wait_until(lambda: session.client.connected and session.client._conn[0] is not old)
+    assert session.send_message("wieder da", GROUP, retry=3, wait=0.2)
+    assert session.client._conn[0].pid != old.pid
+    assert sent_messages(fake)[-1]["message"] == "wieder da"
+
+def test_receive_notifications_are_delivered(fake, tmp_path, monkeypatch):
+    rx = tmp_path / "rx.jsonl"
+    rx.write_text("\n".join([json.dumps(envelope(1, "!Bot wlan")), "INFO kein JSON",
+                             json.dumps(envelope(2, "!Bot grill"))]) + "\n", encoding="utf-8")
+    monkeypatch.setenv("FAKE_RECEIVE_FILE", str(rx))
+    s = SignalSession(NUMBER, cli=FAKE_CLI, timeout=5)
+    got = []
+
+    def collect():
+        for obj in s.messages():
+            got.append(obj)
+            if len(got) == 2:
+                return
+    reader = threading.Thread(target=collect, daemon=True)
+    reader.start()
+    s.start()
+    try:
+        reader.join(timeout=5)
+        assert [o["envelope"]["dataMessage"]["message"] for o in got] == ["!Bot wlan", "!Bot grill"]
+    finally:
+        s.stop()
+
+# ---------------- AsyncSignalSession ----------------
+async def _open(**kw):
+    s = AsyncSignalSession(NUMBER, cli=FAKE_CLI, timeout=5, **kw)
+    await s.start()
+    return s
+
+async def _wait_until(pred, timeout=5.0):
+    async with asyncio.timeout(timeout):
+        while not pred():
+            await asyncio.sleep(0.02)
+
+def test_async_send_is_acked(fake):
+    async def run():
+        s = await _open()
+        try:
+            return await s.send_message("hallo", GROUP, retry=1)
+        finally:
+            await s.close()
+    assert asyncio.run(run())
+    assert [(m["account"], m["message"]) for m in sent_messages(fake)] == [(NUMBER, "hallo")]
+
+def test_async_error_response_retries_then_false(fake, monkeypatch):
+    monkeypatch.setenv("FAKE_SEND_FAIL", "1")
+    async def run():
+        s = await _open()
+        try:
+            return await s.send_message("hallo", GROUP, retry=3, wait=0)
+        finally:
+            await s.close()
+    before = SEND_RETRIES.labels().value
+    assert asyncio.run(run()) is False
+    assert SEND_RETRIES.labels().value - before == 2
+    assert sent_messages(fake) == []
+
+def test_async_daemon_exit_reconnects(fake):
+    async def run():
+        s = await _open()
+        try:
+            await _wait_until(lambda: s.connected)
+            old = s._conn[1]
+            old.kill()
+            await old.wait()
+            await _wait_until(lambda: s.connected and s._conn[1] is not old)
+            ok = await s.send_message("wieder da", GROUP, retry=3, wait=0.2)
+            return ok, s._conn[1].pid != old.pid
+        finally:
+            await s.close()
+    assert asyncio.run(run()) == (True, True)
+    assert sent_messages(fake)[-1]["message"] == "wieder da"
+
+def test_async_receive_notifications_are_delivered(fake, tmp_path, monkeypatch):
+    rx = tmp_path / "rx.jsonl"
+    rx.write_text("\n".join([json.dumps(envelope(1, "!Bot wlan")), "INFO kein JSON",
+                             json.dumps(envelope(2, "!Bot grill"))]) + "\n", encoding="utf-8")
+    monkeypatch.setenv("FAKE_RECEIVE_FILE", str(rx))
+    async def run():
+        s = await _open()
+        got = []
+        try:
+            async with asyncio.timeout(5):
+                async for obj in s.messages():
+                    got.append(obj["envelope"]["dataMessage"]["message"])
+                    if len(got) == 2:
+                        break
+        finally:
+            await s.close()
+        return got
+    assert asyncio.run(run()) == ["!Bot wlan", "!Bot grill"]
@@ -0,0 +1,108 @@
+"""ChunkedReply und das Streaming in _llm_reply (beide Kerne), auch bei Abbruch mitten in der Antwort."""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import bot_v2
+import bot_async
+from config import Config
+from fixed_responses import FALLBACK
+from local_llm_interface import DEFAULT_PERSONA, LLMError
+from streaming import ChunkedReply
+
+TOKENS = ["Das WLAN ", "heißt Borgo-Gast. ", "Bitte lasst ", "die Häuser"]
+
+def test_first_sentence_then_rest_on_finish():
+    sent = []
+    stream = ChunkedReply(sent.append, min_interval=0)
+    for t in TOKENS:
+        stream.feed(t)
+    assert sent == ["Das WLAN heißt Borgo-Gast."]
+    stream.finish()
+    assert sent == ["Das WLAN heißt Borgo-Gast.", "Bitte lasst die Häuser"]
+
+def test_abort_drops_buffer_and_sends_note():
+    sent = []
+    stream = ChunkedReply(sent.append, min_interval=0)
+    for t in TOKENS:
+        stream.feed(t)
+    stream.abort("abgebrochen")
+    stream.finish()   # danach ist nichts mehr im Puffer
+    assert sent == ["Das WLAN heißt Borgo-Gast.", "abgebrochen"]
+
+def test_abort_before_first_chunk_sends_nothing():
+    sent = []
+    stream = ChunkedReply(sent.append, min_interval=0)
+    stream.feed("Das WLAN")
+    stream.abort("abgebrochen")
+    assert sent == [] and not stream.started
+
+# ---------------- _llm_reply ----------------
+TENANT = SimpleNamespace(fixed=SimpleNamespace(path="fixed.txt", version=1), persona=DEFAULT_PERSONA)
+
+@pytest.fixture
+def streaming(monkeypatch):
+    """Streaming an, Sends mitschreiben: liefert die Liste der gesendeten Texte."""
+    monkeypatch.setattr(Config, "STREAM_REPLIES", True)
+    monkeypatch.setattr(Config, "STREAM_MIN_INTERVAL", 0.0)
+    monkeypatch.setattr(Config, "STREAM_PLACEHOLDER", "")
+    monkeypatch.setattr(Config, "LLM_BACKEND", "http")
+    monkeypatch.setattr(Config, "ANSWER_CACHE_SIZE", 0)
+    sent = []
+    monkeypatch.setattr(bot_v2, "send_reply", lambda gid, text, received=None, mid=None: sent.append(text))
+    return sent
+
+def failing_generate(tokens):
+    def generate(payload, timeout, on_token=None, fixed=None, persona=None):
+        for t in tokens:
+            on_token(t)
+        raise LLMError("Timeout nach 2s")
+    return generate
+
+async def failing_generate_async(payload, timeout, on_token=None, fixed=None, persona=None):
+    return failing_generate(TOKENS)(payload, timeout, on_token)
+
+def test_llm_reply_error_after_first_chunk(streaming, monkeypatch):
+    monkeypatch.setattr(bot_v2, "_generate", failing_generate(TOKENS))
+    before = bot_v2.FALLBACKS.labels().value
+    bot_v2._llm_reply(TENANT, "g", "wlan?", None, "m1", time.monotonic() + 10)
+    assert streaming == ["Das WLAN heißt Borgo-Gast.", bot_v2.CUT_OFF]
+    assert bot_v2.FALLBACKS.labels().value - before == 1
+
+def test_llm_reply_error_before_first_chunk(streaming, monkeypatch):
+    monkeypatch.setattr(bot_v2, "_generate", failing_generate(["Das WLAN"]))
+    bot_v2._llm_reply(TENANT, "g", "wlan?", None, "m1", time.monotonic() + 10)
+    assert streaming == [FALLBACK]
+
+def test_async_llm_reply_error_after_first_chunk(streaming, monkeypatch):
+    monkeypatch.setattr(bot_async, "_generate", failing_generate_async)
+    asyncio.run(bot_async._llm_reply(TENANT, "g", "wlan?", None, "m1", time.monotonic() + 10))
+    assert streaming == ["Das WLAN heißt Borgo-Gast.", bot_v2.CUT_OFF]
+
+# ---------------- gleiche Frage, ein LLM-Worker ----------------
+def test_queued_duplicates_generate_once(streaming, monkeypatch):
+    """LLM_WORKERS=1: die Mitläufer warten in der Queue, nicht im Single-Flight – Cache fängt sie ab."""
+    from answer_cache import AnswerCache
+    from llm_scheduler import LLMScheduler
+    monkeypatch.setattr(Config, "ANSWER_CACHE_SIZE", 16)
+    monkeypatch.setattr(bot_v2, "ANSWER_CACHE", AnswerCache(16))
+    calls = []
+    def generate(payload, timeout, on_token=None, fixed=None, persona=None):
+        calls.append(payload)
+        time.sleep(0.05)
+        on_token("Das WLAN heißt Borgo-Gast. ")
+        return "Das WLAN heißt Borgo-Gast."
+    monkeypatch.setattr(bot_v2, "_generate", generate)
+    before = bot_v2.QUEUED_CACHE_HITS.labels().value
+    scheduler = LLMScheduler(bot_v2._llm_job, bot_v2._llm_expired, 1, 8)
+    try:
+        for i in range(4):
+            job = (TENANT, "g", "Wie ist das WLAN?", None, f"m{i}")
+            assert scheduler.submit(f"sender-{i}", job, time.monotonic() + 10)
+    finally:
+        scheduler.stop(timeout=5)
+    assert len(calls) == 1
+    assert streaming == ["Das WLAN heißt Borgo-Gast."] * 4
+    assert bot_v2.QUEUED_CACHE_HITS.labels().value - before == 3
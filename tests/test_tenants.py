@@ -0,0 +1,27 @@
+"""TENANTS_FILE: Pfade relativ zur Datei, Tenant-Namen als Metrik-Label."""
+import json
+
+import metrics
+from tenants import load_tenants
+
+def write_tenants(path, tenants):
+    path.write_text(json.dumps({"tenants": tenants}), encoding="utf-8")
+    return str(path)
+
+def test_relative_fixed_file_is_resolved_next_to_tenants_file(tmp_path, monkeypatch):
+    conf = tmp_path / "conf"
+    conf.mkdir()
+    (conf / "casa.txt").write_text("wlan: Borgo-Gast\n", encoding="utf-8")
+    path = write_tenants(conf / "tenants.json", [
+        {"name": "casa", "number": "+49151", "groups": ["g1"], "fixed_file": "casa.txt"},
+        {"name": "abs", "number": "+49151", "groups": ["g2"], "fixed_file": str(conf / "casa.txt")},
+    ])
+    monkeypatch.chdir(tmp_path)   # Arbeitsverzeichnis ist nicht das der TENANTS_FILE
+    router = load_tenants(path)
+    assert router.route("g1").fixed.path == str((conf / "casa.txt").resolve())
+    assert router.route("g2").fixed is router.route("g1").fixed   # ein Loader pro Datei
+
+def test_tenant_name_is_escaped_in_metrics():
+    counter = metrics.counter("test_tenant_messages_total", "Test", ("tenant",))
+    counter.labels('Casa "Rossa"\\Süd\nzwei').inc()
+    assert 'test_tenant_messages_total{tenant="Casa \\"Rossa\\"\\\\Süd\\nzwei"} 1' in counter.render()
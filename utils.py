@@ -1,18 +1,133 @@
-import time, subprocess, shlex, logging
+import time, asyncio, subprocess, shlex, logging, threading
 from collections import OrderedDict
+from metrics import counter
 log = logging.getLogger("borgo")
 
+SEND_RETRIES = counter("borgo_send_retries_total", "Wiederholte Sendeversuche")
+
 class TTLCache:
+    """
+    TTL-Cache für Message-IDs. Einträge liegen in Einfügereihenfolge; bei festem
+    TTL und monotoner Uhr ist das zugleich die Ablaufreihenfolge, daher entfernt
+    `add` abgelaufene Einträge amortisiert O(1) vom Kopf her, bevor nach Größe
+    verdrängt wird. Zähler (hits/misses/evictions/expirations) über `stats()`.
+    """
+    __slots__ = ("maxsize", "ttl", "_data", "hits", "misses", "evictions", "expirations")
+
     def __init__(self, maxsize=1024, ttl=3600):
         self.maxsize, self.ttl = maxsize, ttl
         self._data = OrderedDict()
-    def add(self, key): self._data[key] = time.time(); self._data.move_to_end(key); self._evict()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def add(self, key):
+        now, data = time.monotonic(), self._data
+        if key in data:
+            data.move_to_end(key)
+        data[key] = now
+        self._expire(now)
+        while len(data) > self.maxsize:
+            data.popitem(last=False); self.evictions += 1
+
+    def _expire(self, now):
+        data, cutoff = self._data, now - self.ttl
+        while data:
+            key, ts = next(iter(data.items()))
+            if ts >= cutoff: break
+            del data[key]; self.expirations += 1
+
     def __contains__(self, key):
-        ts = self._data.get(key); now = time.time()
-        if ts and now - ts <= self.ttl: return True
-        if key in self._data: del self._data[key]; return False
-    def _evict(self): 
-        while len(self._data) > self.maxsize: self._data.popitem(last=False)
+        ts = self._data.get(key)
+        if ts is not None and time.monotonic() - ts <= self.ttl:
+            self.hits += 1; return True
+        self.misses += 1; return False
+
+    def __len__(self): return len(self._data)
+
+    def stats(self):
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "expirations": self.expirations}
+
+class _Flight:
+    __slots__ = ("event", "result", "error", "waiters")
+    def __init__(self):
+        self.event, self.result, self.error, self.waiters = threading.Event(), None, None, 0
+
+class SingleFlight:
+    """
+    Request-Coalescing: laufen gleichzeitig mehrere Aufrufe mit demselben
+    Schlüssel, führt nur der erste `fn` aus; alle anderen warten und bekommen
+    dasselbe Ergebnis (bzw. dieselbe Exception). `shared` zählt die gesparten Aufrufe.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.calls = self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.waiters += 1
+                self.shared += 1
+        if not leader:
+            log.info("[FLIGHT] warte auf laufenden Aufruf %r", key)
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.event.set()
+
+    def stats(self):
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._flights)}
+
+class AsyncSingleFlight:
+    """
+    SingleFlight für Coroutinen in einem Event-Loop: Mitläufer warten auf das
+    Future des ersten Aufrufs statt auf ein threading.Event.
+    """
+    def __init__(self):
+        self._flights = {}
+        self.calls = self.shared = 0
+
+    async def do(self, key, fn):
+        """`fn` ist eine Coroutine-Funktion ohne Argumente."""
+        self.calls += 1
+        fut = self._flights.get(key)
+        if fut is not None:
+            self.shared += 1
+            log.info("[FLIGHT] warte auf laufenden Aufruf %r", key)
+            return await asyncio.shield(fut)   # Abbruch eines Mitläufers bricht nicht den Leader ab
+        fut = self._flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()   # als abgeholt markieren, auch wenn niemand mitwartet
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            del self._flights[key]
+
+    def stats(self):
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._flights)}
 
 def run_cmd(cmd, input_text=None, timeout=None):
     proc = subprocess.Popen(shlex.split(cmd),
@@ -24,14 +139,45 @@ def run_cmd(cmd, input_text=None, timeout=None):
     except subprocess.TimeoutExpired:
         proc.kill(); return 124, "", "TIMEOUT"
 
-def send_signal_message(number, text, group_id=None, retry=3, wait=1.0):
+def send_signal_message(number, text, group_id=None, retry=3, wait=1.0, cli="signal-cli"):
     if group_id:
-        cmd = f"signal-cli -u {number} send -g {group_id} -m {shlex.quote(text)}"
+        cmd = f"{cli} -u {number} send -g {group_id} -m {shlex.quote(text)}"
     else:
-        cmd = f"signal-cli -u {number} send {number} -m {shlex.quote(text)}"
-    for _ in range(retry):
+        cmd = f"{cli} -u {number} send {number} -m {shlex.quote(text)}"
+    for attempt in range(retry):
+        if attempt:
+            SEND_RETRIES.inc()
         rc, _, err = run_cmd(cmd)
         if rc == 0: return True
-        log.warning(f"[SEND] rc={rc} err={err.strip()}")
+        log.warning("[SEND] rc=%s err=%s", rc, err.strip())
         time.sleep(wait)
-    return False
\ No newline at end of file
+    return False
+
+
+async def run_cmd_async(cmd, input_text=None, timeout=None):
+    """Wie run_cmd, aber ohne Thread: Prozess per asyncio, Timeout per asyncio.timeout."""
+    proc = await asyncio.create_subprocess_exec(*shlex.split(cmd),
+        stdin=asyncio.subprocess.PIPE if input_text else None,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    try:
+        async with asyncio.timeout(timeout):
+            out, err = await proc.communicate(input_text.encode("utf-8") if input_text else None)
+    except TimeoutError:
+        proc.kill(); await proc.wait(); return 124, "", "TIMEOUT"
+    except asyncio.CancelledError:
+        proc.kill(); raise
+    return proc.returncode, out.decode("utf-8", "replace"), err.decode("utf-8", "replace")
+
+async def send_signal_message_async(number, text, group_id=None, retry=3, wait=1.0, cli="signal-cli", timeout=60):
+    if group_id:
+        cmd = f"{cli} -u {number} send -g {group_id} -m {shlex.quote(text)}"
+    else:
+        cmd = f"{cli} -u {number} send {number} -m {shlex.quote(text)}"
+    for attempt in range(retry):
+        if attempt:
+            SEND_RETRIES.inc()
+        rc, _, err = await run_cmd_async(cmd, timeout=timeout)
+        if rc == 0: return True
+        log.warning("[SEND] rc=%s err=%s", rc, err.strip())
+        await asyncio.sleep(wait)
+    return False
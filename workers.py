@@ -0,0 +1,51 @@
+import queue, threading, logging, zlib
+log = logging.getLogger("borgo")
+
+_STOP = object()
+
+class KeyedWorkerPool:
+    """
+    Feste Anzahl Worker-Threads mit je eigener, begrenzter Queue.
+    Jobs mit gleichem Schlüssel (z. B. Gruppe+Absender) landen immer beim selben
+    Worker, so bleibt die Reihenfolge der Jobs dieses Pools pro Konversation erhalten.
+    Im Bot ist das nur der FIXED-Weg: gegenüber LLM-Antworten (Scheduler) gibt es
+    keine Reihenfolge, siehe bot_v2.make_dispatch.
+    Ist die Queue voll, blockiert `submit` den Aufrufer (Backpressure).
+    """
+    def __init__(self, name, handler, workers=2, queue_size=32):
+        self.name, self.handler = name, handler
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(max(1, workers))]
+        self._threads = [
+            threading.Thread(target=self._run, args=(q,), name=f"{name}-{i}", daemon=True)
+            for i, q in enumerate(self._queues)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, key, job):
+        q = self._queues[zlib.crc32(str(key).encode("utf-8")) % len(self._queues)]
+        try:
+            q.put_nowait(job)
+        except queue.Full:
+            log.warning(f"[POOL:{self.name}] Queue voll ({q.maxsize}) – Empfang wartet")
+            q.put(job)
+
+    def depth(self):
+        return sum(q.qsize() for q in self._queues)
+
+    def _run(self, q):
+        while True:
+            job = q.get()
+            if job is _STOP:
+                return
+            try:
+                self.handler(job)
+            except Exception:
+                log.exception(f"[POOL:{self.name}] Fehler im Handler")
+
+    def stop(self, timeout=None):
+        """Arbeitet bereits eingereihte Jobs ab und beendet die Worker."""
+        for q in self._queues:
+            q.put(_STOP)
+        for t in self._threads:
+            t.join(timeout)